@@ -1,5 +1,4 @@
 from io import BytesIO
-import requests
 import zipfile
 import warnings
 import pandas as pd
@@ -10,6 +9,10 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 import smtplib
 import DAM_Ln_Xf_Comparator
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from ercot_client import ErcotClient
 
 # Ignore warnings. Whatever.
 warnings.simplefilter("ignore")
@@ -29,7 +32,7 @@ today = date.today().strftime('%m/%d/%Y')
 tomorrow = (date.today() + timedelta(days=1)).strftime('%m/%d/%Y')
 
 # Work on pulling tomorrow's data via the website.
-r = requests.get(request_url, verify=False)
+r = ErcotClient().get(request_url)
 content = r.content
 
 # zip_data is a nested zip file - it should contain a list of historical MIS ZIP files in [lower, upper]
@@ -1,7 +1,6 @@
 # type: ignore
 
 from io import BytesIO
-import requests
 import zipfile
 import warnings
 import pandas as pd
@@ -11,6 +10,10 @@ from email.mime.multipart import MIMEMultipart
 import smtplib
 import DAM_Gn_Comparator
 import datetime 
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from ercot_client import ErcotClient
 
 """
 This Python tool aims to automate the comparison between today and yesterday's DAM Generator data 
@@ -44,7 +47,7 @@ today = date.today().strftime('%m/%d/%Y')
 tomorrow = (date.today() + timedelta(days=1)).strftime('%m/%d/%Y')
 
 # Work on pulling tomorrow's data via the website.
-r = requests.get(request_url, verify=False)
+r = ErcotClient().get(request_url)
 content = r.content
 
 # zip_data is a nested zip file - it should contain a list of historical MIS ZIP files in [lower, upper]
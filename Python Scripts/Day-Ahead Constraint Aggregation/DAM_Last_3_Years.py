@@ -12,6 +12,12 @@ import time
 from datetime import date
 from datetime import timedelta, datetime
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from constraint_resolver import ConstraintResolver
+from yes_constraint_cache import YesConstraintCache
+from sf_matrix_store import SFMatrixStore
+from mis_parquet import converted_files, read_converted_file
 
 """
 This Python task aims to summarize the day-ahead market data pulled from the Network. Furthermore,
@@ -39,14 +45,15 @@ delta_path = f"\\\\pzpwtabapp02\\Ercot\\Exposure_DAM_Last_3_Years.csv"
 credential_path = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/credentials.txt"
 mis_path = "//Pzpwuplancli01/Uplan/ERCOT"
 
-yes_energy = "https://services.yesenergy.com/PS/rest/constraint/hourly/DA/ERCOT?"
-
 # Adjust this to change how many days of historical data we want.
 days_back = 730
 
 with open(credential_path, "r") as credentials:
     auth = tuple(credentials.read().split())
 
+yes_cache = YesConstraintCache("DA", auth)
+sf_store = SFMatrixStore("55_DSF")
+
 call1 = "https://services.yesenergy.com/PS/rest/ftr/portfolio/759847/paths.csv?"
 r = requests.get(call1, auth=auth)
 df = pd.read_csv(StringIO(r.text))
@@ -72,14 +79,52 @@ def process_zip_file(zip_path: str, limit: float) -> pd.DataFrame:
             print(zip_path)
             return df
 
+def process_parquet_files(parquet_paths: List[str], limit: float) -> pd.DataFrame:
+    """
+    Same as process_zip_file, for a ZIP file already converted to the 55_DSF Parquet dataset (see mis_parquet.py).
+    """
+    spec = {
+        "columns": ["DeliveryDate", "HourEnding", "ConstraintName", "ContingencyName", "SettlementPoint", "ShiftFactor"],
+        "filters": [("SettlementPoint", "in", unique_nodes), ("ShiftFactor", "abs>", limit)],
+    }
+    df = read_converted_file(parquet_paths, spec)
+    df = df.astype({"ConstraintName": object, "ContingencyName": object, "SettlementPoint": object})
+    df['HourEnding'] = df['HourEnding'].astype(int)
+    mask = df['HourEnding'] == 24
+    df.loc[mask, 'DeliveryDate'] += pd.Timedelta(days=1)
+
+    print(parquet_paths[0])
+    return df
+
 def aggregate_network_files(year: int, limit: float) -> pd.DataFrame:
+    # Read the path nodes straight from the SF matrix store when it is current for the year, after rebuilding
+    # the months converted again since they were built (see sf_matrix_store.py). Otherwise read the ZIP files.
+    year_start = datetime(year, 1, 1)
+    year_end = min(datetime(year + 1, 1, 1), datetime.combine(date.today(), datetime.min.time()))
+    sf_store.refresh(year_start, year_end)
+
+    if sf_store.is_current(year_start, year_end):
+        aggregated_data = sf_store.matrix(year_start, year_end, unique_nodes).long_rows("SettlementPoint", "ShiftFactor")
+        aggregated_data = aggregated_data[aggregated_data['ShiftFactor'].abs() > limit]
+        aggregated_data['SettlementPoint'] = aggregated_data['SettlementPoint'].astype(object)
+        aggregated_data['HourEnding'] = aggregated_data['HourEnding'].astype(int)
+        mask = aggregated_data['HourEnding'] == 24
+        aggregated_data.loc[mask, 'DeliveryDate'] += pd.Timedelta(days=1)
+        aggregated_data.sort_values(by=['DeliveryDate', 'HourEnding'], inplace=True)
+        print(f"Finished {year} from the SF matrix store")
+        return aggregated_data
+
     yearly_base = os.path.join(mis_path, f"MIS {year}/55_DSF")
     if os.path.exists(yearly_base):
         yearly_zip_files = [os.path.join(yearly_base, file) for file in os.listdir(yearly_base) if file.endswith('.zip')]
         
+        # ZIP files already converted to Parquet are read from their Parquet files instead.
+        parquet_paths = converted_files("55_DSF", yearly_zip_files)
+
         # Use ThreadPoolExecutor to process files in parallel
         with ThreadPoolExecutor(max_workers=6) as executor:  # Adjust max_workers based on your environment
-            future_to_zip = {executor.submit(process_zip_file, zip_file, limit): zip_file for zip_file in yearly_zip_files}
+            future_to_zip = {executor.submit(process_parquet_files, parquet_paths[zip_file], limit) if zip_file in parquet_paths
+                             else executor.submit(process_zip_file, zip_file, limit): zip_file for zip_file in yearly_zip_files}
             
             results = []
             for future in as_completed(future_to_zip):
@@ -100,34 +145,13 @@ def aggregate_network_files(year: int, limit: float) -> pd.DataFrame:
 
 def grab_yes_data(start_date: str, end_date: str) -> pd.DataFrame:
     """
-    A helper method that queries Yes Energy to grab the ERCOT hourly constraint data in a certain date range.
+    A helper method that grabs the ERCOT hourly constraint data in a certain date range from the local
+    Yes Energy cache, which only queries Yes Energy for the days it does not have (see yes_constraint_cache.py).
     """
     relevant_columns = ["REPORTED_NAME", "DATETIME", "HOURENDING", "CONTINGENCY"]
-    all_years_data = pd.DataFrame()
-    current_start_date = datetime.strptime(start_date, "%m/%d/%Y")
-    end_date_obj = datetime.strptime(end_date, "%m/%d/%Y")
-
-    while current_start_date <= end_date_obj:
-        one_year_later = current_start_date + timedelta(days=250)
-        current_end_date = min(one_year_later, end_date_obj)
-
-        formatted_start_date = current_start_date.strftime("%m/%d/%Y")
-        formatted_end_date = current_end_date.strftime("%m/%d/%Y")
-
-        req_url = f"{yes_energy}startdate={formatted_start_date}&enddate={formatted_end_date}"
-        yes_req = requests.get(req_url, auth=auth)
-        print(req_url)  
-
-        if yes_req.ok and "No data" not in yes_req.text:
-            current_yes_table = pd.read_html(StringIO(yes_req.text))[0]
-            all_years_data = pd.concat([all_years_data, current_yes_table])
-            all_years_data.info()
-        else:
-            print(f"Failed to retrieve data for {formatted_start_date} to {formatted_end_date}")
-        
-        current_start_date = current_end_date + timedelta(days=1)
-        
-    return all_years_data[relevant_columns]
+    all_years_data = yes_cache.table(datetime.strptime(start_date, "%m/%d/%Y").date(),
+                                     datetime.strptime(end_date, "%m/%d/%Y").date(), columns=relevant_columns)
+    return all_years_data
     
      
 lower_bound = (date.today() - timedelta(days=days_back)).strftime('%m/%d/%Y')
@@ -144,23 +168,15 @@ yes_df['DATETIME'] = pd.to_datetime(yes_df['DATETIME'])
 network_df['DeliveryDate'] = pd.to_datetime(network_df['DeliveryDate'])
 network_df = network_df[network_df['DeliveryDate'] > lower_bound]
 
-def match_reported_name(row, yes_df):
-    constraint_name = row['ConstraintName']
-    delivery_date = row['DeliveryDate']
-    hour_ending = row['HourEnding']
-    contingency_name = row['ContingencyName']
-    
-    filtered_yes_df = yes_df[(yes_df['DATETIME'].dt.date == delivery_date.date()) &
-                             (yes_df['HOURENDING'] == hour_ending) &
-                             (yes_df['CONTINGENCY'] == contingency_name)]
-    
-    for _, yes_row in filtered_yes_df.iterrows():
-        if constraint_name in yes_row['REPORTED_NAME']:
-            return yes_row['REPORTED_NAME']
-    
-    return None
+# Resolve each MIS constraint name to the Yes reported name of the same day, hour ending and contingency
+# that contains it, for all rows at once (see constraint_resolver.py).
+resolver = ConstraintResolver(yes_df['REPORTED_NAME'])
+network_df['Day'] = network_df['DeliveryDate'].dt.normalize()
+yes_df['Day'] = yes_df['DATETIME'].dt.normalize()
 
-network_df['Constraint'] = network_df.apply(match_reported_name, args=(yes_df,), axis=1)
+network_df['Constraint'] = resolver.resolve(network_df, 'ConstraintName', yes_df, ['Day', 'HourEnding', 'ContingencyName'],
+                                            ['Day', 'HOURENDING', 'CONTINGENCY'])
+network_df = network_df.drop(columns='Day')
 
 # Output summary statistics
 end_time = time.time()
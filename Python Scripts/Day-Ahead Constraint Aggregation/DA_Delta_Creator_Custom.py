@@ -11,6 +11,10 @@ import time
 from datetime import date
 from datetime import timedelta, datetime
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from ercot_client import ErcotClient, build_url
+from constraint_resolver import ConstraintResolver
 
 """
 This Python task aims to summarize the day-ahead market data pulled from the Network. Furthermore,
@@ -42,6 +46,9 @@ credential_path = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR
 
 yes_energy = "https://services.yesenergy.com/PS/rest/constraint/hourly/DA/ERCOT?"
 
+# Pooled ERCOT API client that retries dropped connections and transient 5xx responses.
+ercot = ErcotClient()
+
 # Adjust this to change how many days of historical data we want.
 days_back = 106
 
@@ -124,11 +131,11 @@ def query_ercot_data(start_datetime, end_datetime):
     """Perform a query to the ERCOT API for the given datetime range."""
     merged = []
     file_type = "csv"
-    ercot_url = f"https://ercotapi.app.calpine.com/reports?reportId=13089&marketParticipantId=CRRAH&startTime={start_datetime.strftime('%Y-%m-%dT%H:00:00')}&endTime={end_datetime.strftime('%Y-%m-%dT%H:00:00')}&unzipFiles=false"
+    ercot_url = build_url(13089, start_datetime, end_datetime)
     
     print(ercot_url) 
     
-    response = requests.get(ercot_url, verify=False)  
+    response = ercot.get(ercot_url)
     if response.status_code == 200:
         zip_data = zipfile.ZipFile(BytesIO(response.content))
         with zip_data as z:
@@ -173,9 +180,11 @@ def findDesired(mapping: Dict, row) -> Tuple[str, str]:
     row_constraint = row['ConstraintName']
     row_contingency = row['ContingencyName'].strip()
 
+    # Walk the facilities of the hour in their own order, and look up whether each contains row_constraint
+    # instead of searching it (see constraint_resolver.py).
+    containing = set(resolver.matches(row_constraint))
     for reportedName in mapping:
-        # Parse the reportedName string, since row_constraint can be a substring.
-        if row_constraint in reportedName:
+        if reportedName in containing:
             for contingency, peak_type in mapping[reportedName]:
                 # Contingencies must match
                 if row_contingency == contingency:
@@ -212,6 +221,9 @@ def process_csv(existing_data: Dict, yes_mapping: Dict, raw_data: pd.DataFrame):
     raw_data['ShiftFactor'] = pd.to_numeric(raw_data['ShiftFactor'], errors='coerce')
     deliveryDate = raw_data.iloc[0, 0]
 
+    # Find the reported names of every constraint in this file in one pass.
+    resolver.index(raw_data['ConstraintName'].unique())
+
     for _, row in raw_data.iterrows():
         parsedHour = str(int(row['HourEnding'].split(":")[0]))
         contingency = row['ContingencyName'].strip()
@@ -346,6 +358,10 @@ else:
 """
 Now that we have the mapping, we can begin converting and aggregating the data.
 """
+# Index every reported name in the mapping once for findDesired.
+resolver = ConstraintResolver(name for hours in mapping.values() if isinstance(hours, dict)
+                              for facilities in hours.values() for name in facilities)
+
 ercot_df = grab_latest_data(lower_bound, "01", today, "01")
 existing_sum = {}
 
@@ -1,7 +1,11 @@
 import os
+import sys
 import zipfile
 import time
 import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from mis_parquet import converted_files
+from mis_sql import connect, export_csv
 
 
 """
@@ -15,7 +19,8 @@ This script will only work properly if it is ran from
 due to the File I/O.
 
 The final output CSV is enormous (could be up to 10 million lines), please give this some time
-to finish running.
+to finish running. If every ZIP file of the year has been converted to Parquet since it last changed (see
+mis_parquet.py), the output is written by one multi-threaded SQL query instead (see mis_sql.py).
 """
 
 # Global parameters & variables
@@ -65,15 +70,25 @@ def aggregate_zip(zip_path: str) -> pd.DataFrame:
     return pd.DataFrame(pd.concat(merge, axis=0))
 
 
-final_merge = []
-for zip_file in yearly_zip_files:
-    full_path = os.path.join(path_base, zip_file)
+# Only query the Parquet dataset if it holds every ZIP file, otherwise days would silently be missing.
+zip_paths = [os.path.join(path_base, zip_file) for zip_file in yearly_zip_files if zip_file.endswith(".zip")]
+all_converted = len(zip_paths) > 0 and len(converted_files("56_DPNOMASF_Gn", zip_paths)) == len(zip_paths)
 
-    final_merge.append(aggregate_zip(full_path))
+if all_converted:
+    # Same columns as the ZIP files, with the MM/DD/YYYY Date last.
+    export_csv(connect(), "SELECT * EXCLUDE (Date, year, month), strftime(Date, '%m/%d/%Y') AS Date FROM dpnomasf_gn "
+                          f"WHERE year = {year} ORDER BY Date", output_path)
 
-final_merged_df = pd.concat(final_merge, axis=0)
-final_merged_df = pd.DataFrame(final_merged_df)
-final_merged_df.to_csv(output_path, index=False)
+else:
+    final_merge = []
+    for zip_file in yearly_zip_files:
+        full_path = os.path.join(path_base, zip_file)
+
+        final_merge.append(aggregate_zip(full_path))
+
+    final_merged_df = pd.concat(final_merge, axis=0)
+    final_merged_df = pd.DataFrame(final_merged_df)
+    final_merged_df.to_csv(output_path, index=False)
 
 end_time = time.time()
 execution_time = (end_time - start_time)
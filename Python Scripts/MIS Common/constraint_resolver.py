@@ -0,0 +1,205 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+"""
+Shared resolver from MIS constraint names to Yes Energy reported names.
+
+The MIS shift-factor files carry a short constraint name (i.e. 'DCTRNH_AXFMR1') while Yes Energy reports a
+longer name that contains it. Every aggregator used to test 'name in reported_name' row by row:
+RT_Constraint_Aggregator.py::findDesired scans every facility of the hour for every row,
+SCED_Delta_New.py filters with a row-wise apply, and DAM_Last_3_Years.py::match_reported_name refilters the
+whole Yes frame once per row, which is O(N*M).
+
+ConstraintResolver is built once per Yes snapshot (the set of reported names). The first time it sees a
+batch of constraint names it builds an Aho-Corasick automaton over them and scans every reported name once,
+which finds every (constraint name, reported name) containment in time linear in the total length of the
+names plus the number of matches. The result is kept in a dictionary keyed by constraint name, so later
+lookups are exact-match dictionary hits, and it is pickled under resolver_cache keyed by a hash of the
+snapshot, so the next run on the same snapshot starts warm.
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+    from constraint_resolver import ConstraintResolver
+
+    resolver = ConstraintResolver(yes_df['REPORTED_NAME'])
+    mask = resolver.contains(merged_df['Constraint_Name'], merged_df['REPORTED_NAME'])
+    network_df['Constraint'] = resolver.resolve(network_df, 'ConstraintName', yes_df, ['Day', 'HourEnding', 'ContingencyName'],
+                                                ['Day', 'HOURENDING', 'CONTINGENCY'])
+"""
+
+# Folder holding the pickled matches of every snapshot. Set to None to keep everything in memory.
+resolver_cache = os.environ.get("MIS_RESOLVER_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "resolver_cache"))
+
+# Joins a constraint name and a reported name into one key. Never appears in either.
+pair_separator = "\x00"
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a list of patterns. search(text) returns the indices of
+    every pattern that occurs in text.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        # Build the trie of the patterns.
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for character in pattern:
+                next_state = self.goto[state].get(character)
+
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][character] = next_state
+
+                state = next_state
+
+            self.output[state].append(index)
+
+        # Breadth-first pass to fill in the failure links and merge the outputs along them.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+
+            for character, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+
+                target = self.goto[fallback].get(character, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, text: str) -> Set[int]:
+        found = set()
+        state = 0
+
+        for character in text:
+            while state and character not in self.goto[state]:
+                state = self.fail[state]
+
+            state = self.goto[state].get(character, 0)
+            found.update(self.output[state])
+
+        return found
+
+
+class ConstraintResolver:
+    """
+    Resolves MIS constraint names to the Yes Energy reported names that contain them.
+
+    Inputs:
+        - reported_names: Every reported name of the Yes snapshot, i.e. yes_df['REPORTED_NAME']. The
+          first occurrence of each name sets its order, which decides ties in resolve.
+        - cache_folder: Where the matches of the snapshot are pickled, or None.
+    """
+
+    def __init__(self, reported_names: Iterable[str], cache_folder: str = resolver_cache):
+        self.reported = list(dict.fromkeys(name for name in reported_names if isinstance(name, str)))
+        self.snapshot = hashlib.sha1("\n".join(sorted(self.reported)).encode("utf-8")).hexdigest()
+        self.cache_path = None if cache_folder is None else os.path.join(cache_folder, f"{self.snapshot}.pkl")
+
+        # Exact-match dictionary from constraint name to the reported names containing it.
+        self.matches_by_name: Dict[str, Tuple[str, ...]] = {}
+
+        if self.cache_path is not None and os.path.isfile(self.cache_path):
+            try:
+                with open(self.cache_path, "rb") as cache_file:
+                    self.matches_by_name = pickle.load(cache_file)
+            except (pickle.UnpicklingError, EOFError, OSError):
+                self.matches_by_name = {}
+
+    def index(self, constraint_names: Iterable[str]):
+        """
+        Finds the matches of every constraint name not seen before in one pass over the snapshot,
+        and saves them to the cache.
+        """
+        new_names = [name for name in dict.fromkeys(constraint_names) if isinstance(name, str) and name not in self.matches_by_name]
+        if len(new_names) == 0:
+            return
+
+        automaton = AhoCorasick(new_names)
+        found = [[] for _ in new_names]
+
+        for reported_name in self.reported:
+            for index in automaton.search(reported_name):
+                found[index].append(reported_name)
+
+        for name, reported_names in zip(new_names, found):
+            # An empty constraint name would match everything; it matches nothing instead.
+            self.matches_by_name[name] = tuple(reported_names) if name != "" else ()
+
+        self.save()
+
+    def matches(self, constraint_name: str) -> Tuple[str, ...]:
+        """
+        The reported names containing constraint_name, in snapshot order.
+        """
+        if constraint_name not in self.matches_by_name:
+            self.index([constraint_name])
+
+        return self.matches_by_name.get(constraint_name, ())
+
+    def contains(self, constraint_names: pd.Series, reported_names: pd.Series) -> np.ndarray:
+        """
+        Vectorized, element-wise 'constraint_name in reported_name' for two aligned columns.
+        """
+        constraint_names = pd.Series(constraint_names).astype(str).reset_index(drop=True)
+        reported_names = pd.Series(reported_names).astype(str).reset_index(drop=True)
+        self.index(constraint_names.unique())
+
+        pairs = {name + pair_separator + reported for name in constraint_names.unique()
+                 for reported in self.matches_by_name.get(name, ())}
+
+        return (constraint_names + pair_separator + reported_names).isin(pairs).to_numpy()
+
+    def resolve(self, left: pd.DataFrame, constraint_column: str, right: pd.DataFrame, left_on: List[str],
+                right_on: List[str], reported_column: str = "REPORTED_NAME") -> pd.Series:
+        """
+        For every row of left, finds the first row of right with equal keys whose reported name
+        contains the row's constraint name.
+
+        Inputs:
+            - left: The MIS rows, i.e. network_df.
+            - constraint_column: The column of left holding the short constraint names.
+            - right: The Yes rows, i.e. yes_df.
+            - left_on, right_on: The columns that must be equal, i.e. date, hour ending and contingency.
+            - reported_column: The column of right holding the reported names.
+
+        Output:
+            - A Series aligned with left holding the matched reported name, or None.
+        """
+        candidates = left[[constraint_column] + left_on].reset_index(drop=True)
+        candidates["_left_row"] = np.arange(len(candidates))
+        candidates = candidates.merge(right[right_on + [reported_column]].reset_index(drop=True),
+                                      left_on=left_on, right_on=right_on, how="inner", sort=False)
+
+        matched = candidates[self.contains(candidates[constraint_column], candidates[reported_column])]
+        matched = matched.drop_duplicates(subset="_left_row", keep="first")
+
+        result = pd.Series([None] * len(left), index=left.index, dtype=object)
+        result.iloc[matched["_left_row"].to_numpy()] = matched[reported_column].to_numpy()
+        return result
+
+    def save(self):
+        if self.cache_path is None:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "wb") as cache_file:
+                pickle.dump(self.matches_by_name, cache_file)
+        except OSError as exc:
+            print(f"Could not cache the constraint matches at {self.cache_path}: {exc}")
@@ -0,0 +1,189 @@
+import os
+import time
+import random
+import threading
+import requests
+from datetime import datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+"""
+Shared client for the ERCOT API at https://ercotapi.app.calpine.com/reports.
+
+The MIS scripts used to call requests.get directly, each with its own (or no) retry policy, so a single
+reset connection or transient 502 failed a whole folder and showed up in Error_Checker.py the next
+morning. ErcotClient keeps one pooled keep-alive requests.Session per process and retries transient
+failures with exponential backoff and full jitter:
+
+    - Connection errors, timeouts, 429, 502, 503 and 504 are retried.
+    - A 500 whose body reports an OutOfMemory Exception is returned immediately, since retrying the same
+      window will fail again. The downloader splits the window instead (see window_planner.py). Any
+      other 500 is retried.
+
+Every request has a connect and read timeout, and at most max_per_host requests run against one host at
+a time, no matter how many threads share the client.
+
+Usage from a script folder next to MIS Common:
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+    from ercot_client import ErcotClient
+
+    client = ErcotClient()
+    response = client.report(13089, start_datetime, end_datetime)
+"""
+
+# Base URL of the ERCOT API. ERCOT_API_URL points the scripts at the offline stand-in
+# (MIS Scheduled Downloader/Mock_ERCOT_API.py) and is never set in production.
+ercot_base = os.environ.get("ERCOT_API_URL", "https://ercotapi.app.calpine.com/reports")
+
+# Format of the startTime and endTime request parameters.
+request_format = "%Y-%m-%dT%H:00:00"
+
+# Status codes that are worth retrying as they are.
+retriable_statuses = {429, 502, 503, 504}
+
+
+def build_url(report_id, lower: datetime, upper: datetime) -> str:
+    """
+    Builds the ERCOT API request URL for a report ID and a [lower, upper] time window.
+    """
+    return (f"{ercot_base}?reportId={report_id}&marketParticipantId=CRRAH"
+            f"&startTime={lower.strftime(request_format)}&endTime={upper.strftime(request_format)}&unzipFiles=false")
+
+
+def is_out_of_memory(status_code: int, body: bytes) -> bool:
+    """
+    Returns True if a response is the API's 'System.OutOfMemory' Exception. A 500 without a body
+    is treated as one too, since that is what it almost always is.
+    """
+    return status_code == 500 and (len(body) == 0 or b"OutOfMemory" in body)
+
+
+def is_retriable(status_code: int, body: bytes) -> bool:
+    """
+    Returns True if a response is a transient failure that the same request may not hit again.
+    """
+    return status_code in retriable_statuses or (status_code == 500 and not is_out_of_memory(status_code, body))
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Seconds to wait before retry number attempt + 1: exponential backoff with full jitter,
+    so threads that failed together do not retry together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ErcotClient:
+    """
+    A pooled, retrying ERCOT API client that is safe to share between threads.
+
+    Inputs:
+        - max_per_host: The most requests allowed in flight against one host at once.
+        - retries: How many times a transient failure is retried before it is returned (or raised).
+        - backoff: The base delay, in seconds, of the exponential backoff.
+        - max_backoff: The longest delay between two attempts.
+        - timeout: The (connect, read) timeouts in seconds. The read timeout applies between bytes,
+          not to the whole body.
+        - verify: Whether to verify TLS certificates. The API's certificate does not verify.
+    """
+
+    def __init__(self, max_per_host: int = 8, retries: int = 4, backoff: float = 2.0, max_backoff: float = 60.0,
+                 timeout=(30, 600), verify: bool = False):
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.verify = verify
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.lock = threading.Lock()
+        self.host_slots = {}
+
+    def slots(self, url: str) -> threading.BoundedSemaphore:
+        """
+        The semaphore limiting concurrent requests to the host of url.
+        """
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+
+            return self.host_slots[host]
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GETs url, retrying transient failures. The body is read before the host slot is released.
+
+        Output:
+            - The final response. A connection error or timeout on the last attempt is raised.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("verify", self.verify)
+
+        for attempt in range(self.retries + 1):
+            try:
+                with self.slots(url):
+                    response = self.session.get(url, **kwargs)
+                    body = response.content
+
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt == self.retries:
+                    raise
+
+                reason = type(exc).__name__
+
+            else:
+                if attempt == self.retries or not is_retriable(response.status_code, body):
+                    return response
+
+                reason = response.status_code
+
+            delay = backoff_delay(attempt, self.backoff, self.max_backoff)
+            print(f"Retrying {url} in {delay:.1f} seconds after {reason} (attempt {attempt + 1} of {self.retries}).")
+            time.sleep(delay)
+
+    def status(self, url: str) -> int:
+        """
+        The status code of a GET of url, reading only the status line and headers. Connection errors,
+        timeouts and the retriable statuses are retried like in get. Without the body an OutOfMemory 500
+        cannot be told from a transient one, so 500s are returned at once.
+
+        Output:
+            - The final status code, or 0 if the last attempt could not connect or timed out.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                with self.slots(url):
+                    with self.session.get(url, stream=True, timeout=self.timeout, verify=self.verify) as response:
+                        status_code = response.status_code
+
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt == self.retries:
+                    return 0
+
+                reason = type(exc).__name__
+
+            else:
+                if attempt == self.retries or status_code not in retriable_statuses:
+                    return status_code
+
+                reason = status_code
+
+            delay = backoff_delay(attempt, self.backoff, self.max_backoff)
+            print(f"Retrying {url} in {delay:.1f} seconds after {reason} (attempt {attempt + 1} of {self.retries}).")
+            time.sleep(delay)
+
+    def report(self, report_id, lower: datetime, upper: datetime) -> requests.Response:
+        """
+        Requests one report for the window [lower, upper].
+        """
+        return self.get(build_url(report_id, lower, upper))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,329 @@
+import os
+import sys
+import zipfile
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Tuple
+from zip_pool import filter_rows
+
+"""
+Ingest-time conversion of MIS CSV ZIP files into Parquet, and the reader used by the aggregators.
+
+RT_Constraint_Aggregator.py and SCED_Delta_New.py (130_SSPSF), DAM_Last_3_Years.py and Exposure_MI_DA.py
+(55_DSF) and the MIS Aggregation scripts (56_DPNOMASF) all unzip and parse the same CSV files with pandas
+on every run. ingest_folder converts each downloaded ZIP file once into typed Parquet, laid out as
+
+    {parquet_root}/{dataset}/year=YYYY/month=MM/{zip name}.parquet
+
+so read_dataset only opens the months and columns a query needs. Filters on ordinary columns are pushed
+down to the Parquet row groups by pyarrow.
+
+The scheduler runs ingest_folder after the download when it is passed --parquet. Running it by hand on
+a folder converts every ZIP file that has no Parquet file yet, or whose ZIP file is newer than its
+Parquet file, so it can also backfill previous years:
+
+    python mis_parquet.py 130_SSPSF "\\\\Pzpwuplancli01\\Uplan\\ERCOT\\MIS 2023\\130_SSPSF"
+
+Reading from an aggregator:
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+    from mis_parquet import read_dataset
+
+    df = read_dataset("130_SSPSF", columns=["SCED_Time_Stamp", "Settlement_Point", "Shift_Factor"],
+                      start=datetime(2024, 1, 1), end=datetime(2024, 7, 1),
+                      filters=[("Settlement_Point", "in", unique_nodes)])
+
+Aggregators that work file by file (RT_Constraint_Aggregator.py, DAM_Last_3_Years.py) split their ZIP files
+with converted_files: the ones converted since they last changed are read from their Parquet files with
+read_converted, which takes the same spec as zip_pool.read_zip_files, and only the rest are unzipped.
+"""
+
+# Global Variables and Parameters
+parquet_root = os.environ.get("MIS_PARQUET_ROOT", "\\\\Pzpwuplancli01\\Uplan\\ERCOT\\MIS Parquet\\")
+
+# Datasets built from the MIS folders. For every dataset:
+#   - folder: The MIS folder holding the downloaded ZIP files.
+#   - suffix: Only ZIP files ending with this are converted.
+#   - member: Only CSV members containing this are read.
+#   - time_column, time_format: The timestamp column and its format in the CSV. A time_column of None
+#     takes the date from characters 3-11 (MMDDYYYY) of the member name into a new Date column.
+#   - dtypes: The type of every known column. Integer columns are nullable (Int64) so that blank cells
+#     survive. Unknown columns are kept as read by pandas.
+parquet_datasets = {
+    "130_SSPSF": {
+        "folder": "130_SSPSF",
+        "suffix": "_csv.zip",
+        "member": ".csv",
+        "time_column": "SCED_Time_Stamp",
+        "time_format": "%m/%d/%Y %H:%M:%S",
+        "dtypes": {"Repeated_Hour_Flag": "string", "Constraint_ID": "Int64", "Constraint_Name": "string",
+                   "Contingency_Name": "string", "Settlement_Point": "string", "Shift_Factor": "float64"},
+    },
+    "55_DSF": {
+        "folder": "55_DSF",
+        "suffix": ".zip",
+        "member": ".csv",
+        "time_column": "DeliveryDate",
+        "time_format": "%m/%d/%Y",
+        "dtypes": {"HourEnding": "Int64", "ConstraintID": "Int64", "ConstraintName": "string", "ContingencyName": "string",
+                   "SettlementPoint": "string", "ShiftFactor": "float64", "FromStation": "string", "FromStationKV": "float64",
+                   "ToStation": "string", "ToStationKV": "float64", "Limit": "float64", "DSTFlag": "string"},
+    },
+    "56_DPNOMASF_Gn": {
+        "folder": "56_DPNOMASF",
+        "suffix": ".zip",
+        "member": "_Gn_",
+        "time_column": None,
+        "time_format": "%m%d%Y",
+        "dtypes": {},
+    },
+    "56_DPNOMASF_Ld": {
+        "folder": "56_DPNOMASF",
+        "suffix": ".zip",
+        "member": "_Ld_",
+        "time_column": None,
+        "time_format": "%m%d%Y",
+        "dtypes": {},
+    },
+}
+
+
+def convert_zip(zip_path: str, spec: Dict) -> pd.DataFrame:
+    """
+    Reads the matching CSV members of one ZIP file into a single typed DataFrame.
+
+    Inputs:
+        - zip_path: The full path to the ZIP file.
+        - spec: The entry of parquet_datasets describing the dataset.
+
+    Output:
+        - A DataFrame with the timestamp parsed and the known columns cast, or an empty
+          DataFrame if the ZIP file has no matching member.
+    """
+    merge = []
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for member in zip_ref.namelist():
+            if spec["member"] in member and member.endswith(".csv"):
+                with zip_ref.open(member) as csv:
+                    df_csv = pd.read_csv(csv)
+
+                if spec["time_column"] is None:
+                    df_csv["Date"] = datetime.strptime(os.path.basename(member)[3:11], spec["time_format"])
+
+                merge.append(df_csv)
+
+    if len(merge) == 0:
+        return pd.DataFrame()
+
+    df = pd.concat(merge, axis=0, ignore_index=True)
+
+    if spec["time_column"] is not None:
+        df[spec["time_column"]] = pd.to_datetime(df[spec["time_column"]], format=spec["time_format"])
+
+    # The DSF hour endings arrive as '01:00' through '24:00', read as object or str depending on pandas.
+    if "HourEnding" in df.columns and not pd.api.types.is_numeric_dtype(df["HourEnding"]):
+        df["HourEnding"] = df["HourEnding"].astype(str).str.extract(r"(\d+)")[0]
+
+    for column, dtype in spec["dtypes"].items():
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype) if dtype != "string" else df[column].astype(dtype)
+
+    return df
+
+
+def parquet_files(dataset: str) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Maps the ZIP name of every converted ZIP file of a dataset to the (path, modified time) of
+    its Parquet files, one per month the ZIP file spans.
+    """
+    existing = {}
+    for root, _, names in os.walk(os.path.join(parquet_root, dataset)):
+        for name in names:
+            if name.endswith(".parquet"):
+                path = os.path.join(root, name)
+                existing.setdefault(name[:-len(".parquet")], []).append((path, os.path.getmtime(path)))
+
+    return existing
+
+
+def write_parquet(df: pd.DataFrame, dataset: str, zip_name: str, time_column: str) -> int:
+    """
+    Writes one converted ZIP file into the year/month partitions of its dataset.
+
+    Output:
+        - The number of rows written.
+    """
+    times = df[time_column]
+    for (year, month), part in df.groupby([times.dt.year, times.dt.month]):
+        partition = os.path.join(parquet_root, dataset, f"year={year}", f"month={month:02d}")
+        os.makedirs(partition, exist_ok=True)
+        part.to_parquet(os.path.join(partition, f"{zip_name}.parquet"), engine="pyarrow", index=False)
+
+    return len(df)
+
+
+def ingest_folder(dataset: str, source_folder: str, max_workers: int = 4) -> int:
+    """
+    Converts every ZIP file of a dataset's folder that has not been converted since it last changed.
+
+    Inputs:
+        - dataset: A key of parquet_datasets, i.e. '130_SSPSF'.
+        - source_folder: The folder holding the downloaded ZIP files.
+        - max_workers: The number of ZIP files converted at once.
+
+    Output:
+        - The number of ZIP files converted.
+    """
+    spec = parquet_datasets[dataset]
+    time_column = spec["time_column"] or "Date"
+    existing = parquet_files(dataset)
+    to_convert = []
+
+    for zip_file in os.listdir(source_folder):
+        if not zip_file.endswith(spec["suffix"]):
+            continue
+
+        zip_path = os.path.join(source_folder, zip_file)
+        zip_name = zip_file[:-len(".zip")]
+        written = existing.get(zip_name, [])
+
+        if len(written) == 0 or min(mtime for _, mtime in written) < os.path.getmtime(zip_path):
+            to_convert.append((zip_path, zip_name))
+
+    converted = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_zip = {executor.submit(convert_zip, zip_path, spec): zip_name for zip_path, zip_name in to_convert}
+
+        for future in as_completed(future_to_zip):
+            zip_name = future_to_zip[future]
+            try:
+                df = future.result()
+                if len(df) > 0:
+                    write_parquet(df, dataset, zip_name, time_column)
+                    converted += 1
+            except Exception as exc:
+                print(f"{zip_name} generated an exception: {exc}")
+
+    return converted
+
+
+def converted_files(dataset: str, zip_paths: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Maps every given ZIP file that has been converted since it last changed to its Parquet files. ZIP files
+    that are not converted yet, or changed after their conversion, are left out and have to be read as ZIP.
+    """
+    existing = parquet_files(dataset)
+    converted = {}
+
+    for zip_path in zip_paths:
+        written = existing.get(os.path.basename(zip_path)[:-len(".zip")], [])
+
+        if len(written) > 0 and min(mtime for _, mtime in written) >= os.path.getmtime(zip_path):
+            converted[zip_path] = sorted(path for path, _ in written)
+
+    return converted
+
+
+def read_converted_file(parquet_paths: List[str], spec: Dict) -> pd.DataFrame:
+    """
+    Reads the Parquet files of one converted ZIP file the way zip_pool.read_zip reads the ZIP file itself:
+    only the spec's columns and rows, categorical dtypes, and the File_Stamp of its first remaining
+    timestamp. Unless spec['parse_times'] is set, the timestamps go back to strings in spec['time_format'].
+    """
+    filters = [(column, op, list(value)) for column, op, value in spec.get("filters", []) if op == "in"] or None
+    merge = [pd.read_parquet(path, engine="pyarrow", columns=spec.get("columns"), filters=filters) for path in parquet_paths]
+    df = filter_rows(pd.concat(merge, ignore_index=True), spec.get("filters", []))
+
+    for column, dtype in (spec.get("dtypes") or {}).items():
+        if column in df.columns and dtype == "category":
+            df[column] = df[column].astype(object).astype("category")
+
+    stamp_column = spec.get("stamp_column")
+    if stamp_column is not None and len(df) > 0:
+        df["File_Stamp"] = df[stamp_column].iloc[0]
+
+        if not spec.get("parse_times", False):
+            df[stamp_column] = df[stamp_column].dt.strftime(spec["time_format"])
+
+    return df.reset_index(drop=True)
+
+
+def read_converted(converted: Dict[str, List[str]], spec: Dict, files_per_task: int = 32, max_workers: int = 4) -> Iterator[pd.DataFrame]:
+    """
+    Reads converted ZIP files from their Parquet files, in the batches and format of zip_pool.read_zip_files.
+
+    Inputs:
+        - converted: The Parquet files of every ZIP file to read, i.e. from converted_files, in reading order.
+        - spec: What to keep from every file (see zip_pool.py).
+        - files_per_task: How many ZIP files each yielded DataFrame holds.
+        - max_workers: The number of files read at once.
+
+    Output:
+        - One DataFrame per batch that kept any row.
+    """
+    paths = list(converted.values())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(paths), files_per_task):
+            batch = [df for df in executor.map(lambda files: read_converted_file(files, spec), paths[start:start + files_per_task]) if len(df) > 0]
+
+            if len(batch) > 0:
+                yield pd.concat(batch, ignore_index=True)
+
+
+def month_filters(start: datetime, end: datetime) -> List[List[Tuple]]:
+    """
+    Builds partition filters selecting the year/month partitions that overlap [start, end).
+    The result is in disjunctive normal form, as accepted by pandas.read_parquet.
+    """
+    clauses = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        clauses.append([("year", "=", year), ("month", "=", month)])
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return clauses
+
+
+def read_dataset(dataset: str, columns: List[str] = None, start: datetime = None, end: datetime = None,
+                 filters: List[Tuple] = None) -> pd.DataFrame:
+    """
+    Reads a converted dataset, only opening the partitions, columns and row groups needed.
+
+    Inputs:
+        - dataset: A key of parquet_datasets, i.e. '55_DSF'.
+        - columns: The columns to read. All columns by default.
+        - start, end: Only rows with start <= timestamp < end are returned. Either may be omitted.
+        - filters: Further (column, op, value) predicates, i.e. [("Settlement_Point", "in", nodes)].
+          All of them must hold.
+
+    Output:
+        - A DataFrame of the matching rows. The year and month partition columns are dropped.
+    """
+    spec = parquet_datasets[dataset]
+    time_column = spec["time_column"] or "Date"
+    predicates = list(filters or [])
+
+    if start is not None:
+        predicates.append((time_column, ">=", pd.Timestamp(start)))
+    if end is not None:
+        predicates.append((time_column, "<", pd.Timestamp(end)))
+
+    if start is not None and end is not None:
+        dnf = [clause + predicates for clause in month_filters(start, end)]
+    else:
+        dnf = predicates or None
+
+    read_columns = None if columns is None else list(dict.fromkeys(columns))
+    df = pd.read_parquet(os.path.join(parquet_root, dataset), engine="pyarrow", columns=read_columns, filters=dnf)
+
+    return df.drop(columns=[column for column in ("year", "month") if column in df.columns and column not in (columns or [])])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in parquet_datasets:
+        sys.stderr.write(f"usage: {sys.argv[0]} <{'|'.join(parquet_datasets)}> <folder of ZIP files>\n")
+        sys.exit(1)
+
+    print(f"Converted {ingest_folder(sys.argv[1], sys.argv[2])} ZIP files of {sys.argv[1]}.")
@@ -0,0 +1,230 @@
+import os
+import duckdb
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Tuple
+from mis_parquet import parquet_root
+from yes_constraint_cache import yes_cache_root
+
+"""
+Embedded SQL layer (DuckDB) over the MIS shift-factor and constraint data.
+
+The aggregators each read the MIS folders with their own pandas code. connect opens an in-process DuckDB
+database in which every converted Parquet dataset (see mis_parquet.py) and the Yes Energy constraint cache
+(see yes_constraint_cache.py) is a view with the same typed column names:
+
+    sspsf         130_SSPSF   Interval_Time, Hour_Ending, Constraint_Name, Contingency_Name, Settlement_Point, Shift_Factor
+    dsf           55_DSF      Interval_Time, Hour_Ending, Constraint_Name, Contingency_Name, Settlement_Point, Shift_Factor, ...
+    dpnomasf_gn   56_DPNOMASF Gn files as converted, with Date
+    dpnomasf_ld   56_DPNOMASF Ld files as converted, with Date
+    yes_rt        Yes Energy RT hourly constraints, Interval_Time, Hour_Ending, Constraint_Name, Contingency_Name, Shadow_Price, ...
+    yes_da        Yes Energy DA hourly constraints, in the same columns
+
+Interval_Time is the SCED timestamp or, for hourly data, the start of the delivery day, and the SSPSF Hour_Ending
+is the hour after each row's own timestamp (the aggregators use the first timestamp of each file). Every view keeps
+the year (and month) partition columns, so filters on Interval_Time together with year and month only open
+the partitions they need, and DuckDB pushes the remaining filters down to the Parquet row groups. Queries
+run on every core.
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+    from mis_sql import connect, sf_deltas
+
+    connection = connect()
+    deltas = sf_deltas(connection, "sspsf", paths_df[['SOURCE', 'SINK']], datetime(2024, 6, 1), datetime(2024, 7, 1))
+    counts = connection.execute("SELECT Constraint_Name, COUNT(*) FROM yes_rt GROUP BY 1").df()
+
+Raw ZIP files are not readable by DuckDB, so a folder is converted once with mis_parquet.ingest_folder
+(or any DataFrame registered with connection.register) before it is queried.
+"""
+
+# Global Variables and Parameters
+# Views over the converted MIS datasets: the dataset and the typed, renamed columns selected from it.
+# Datasets converted without a fixed schema are selected as they are.
+sql_views = {
+    "sspsf": {
+        "dataset": "130_SSPSF",
+        "columns": {
+            "Interval_Time": "CAST(SCED_Time_Stamp AS TIMESTAMP)",
+            "Hour_Ending": "CAST(hour(SCED_Time_Stamp) + 1 AS TINYINT)",
+            "Constraint_Name": "CAST(Constraint_Name AS VARCHAR)",
+            "Contingency_Name": "CAST(Contingency_Name AS VARCHAR)",
+            "Settlement_Point": "CAST(Settlement_Point AS VARCHAR)",
+            "Shift_Factor": "CAST(Shift_Factor AS DOUBLE)",
+        },
+    },
+    "dsf": {
+        "dataset": "55_DSF",
+        "columns": {
+            "Interval_Time": "CAST(DeliveryDate AS TIMESTAMP)",
+            "Hour_Ending": "CAST(HourEnding AS TINYINT)",
+            "Constraint_Name": "CAST(ConstraintName AS VARCHAR)",
+            "Contingency_Name": "CAST(ContingencyName AS VARCHAR)",
+            "Settlement_Point": "CAST(SettlementPoint AS VARCHAR)",
+            "Shift_Factor": "CAST(ShiftFactor AS DOUBLE)",
+            "Limit": "CAST(\"Limit\" AS DOUBLE)",
+            "DST_Flag": "CAST(DSTFlag AS VARCHAR)",
+        },
+    },
+    "dpnomasf_gn": {"dataset": "56_DPNOMASF_Gn", "columns": None},
+    "dpnomasf_ld": {"dataset": "56_DPNOMASF_Ld", "columns": None},
+}
+
+# Views over the Yes Energy constraint cache, by market.
+yes_views = {"yes_rt": "RT", "yes_da": "DA"}
+yes_columns = {
+    "Interval_Time": "CAST(date_trunc('day', CAST(DATETIME AS TIMESTAMP)) AS TIMESTAMP)",
+    "Hour_Ending": "CAST(HOURENDING AS TINYINT)",
+    "Constraint_Name": "CAST(REPORTED_NAME AS VARCHAR)",
+    "Contingency_Name": "CAST(CONTINGENCY AS VARCHAR)",
+    "Facility_Type": "CAST(FACILITYTYPE AS VARCHAR)",
+    "Peak_Type": "CAST(PEAKTYPE AS VARCHAR)",
+    "Shadow_Price": "CAST(SHADOWPRICE AS DOUBLE)",
+}
+
+
+def parquet_glob(folder: str) -> str:
+    return os.path.join(folder, "**", "*.parquet").replace("\\", "/")
+
+
+def has_parquet(folder: str) -> bool:
+    for _, _, names in os.walk(folder):
+        if any(name.endswith(".parquet") for name in names):
+            return True
+
+    return False
+
+
+def register_parquet(connection: duckdb.DuckDBPyConnection, name: str, folder: str, columns: Dict[str, str] = None,
+                     partitions: List[str] = ("year", "month")) -> bool:
+    """
+    Creates a view over the hive-partitioned Parquet files of a folder.
+
+    Inputs:
+        - connection: The DuckDB connection.
+        - name: The name of the view.
+        - folder: The folder holding the year=YYYY(/month=MM) partitions.
+        - columns: The {name: SQL expression} columns of the view, or None to select every column.
+        - partitions: The partition columns of the folder, kept in the view.
+
+    Output:
+        - True if the folder holds any Parquet file, otherwise no view is created.
+    """
+    if not has_parquet(folder):
+        return False
+
+    source = f"read_parquet('{parquet_glob(folder)}', hive_partitioning = true, union_by_name = true)"
+
+    if columns is None:
+        select = "*"
+    else:
+        select = ", ".join([f'{expression} AS "{column}"' for column, expression in columns.items()] + list(partitions))
+
+    connection.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT {select} FROM {source}")
+    return True
+
+
+def connect(database: str = ":memory:", threads: int = None) -> duckdb.DuckDBPyConnection:
+    """
+    Opens a DuckDB database with a view for every converted MIS dataset and Yes Energy market found on disk.
+
+    Inputs:
+        - database: The DuckDB database file, or ':memory:'.
+        - threads: The number of threads queries run on. Every core by default.
+
+    Output:
+        - The connection. Its registered views are listed by connection.execute("SHOW TABLES").
+    """
+    connection = duckdb.connect(database)
+    connection.execute(f"SET threads = {threads or os.cpu_count() or 1}")
+
+    for name, view in sql_views.items():
+        register_parquet(connection, name, os.path.join(parquet_root, view["dataset"]), view["columns"])
+
+    for name, market in yes_views.items():
+        register_parquet(connection, name, os.path.join(yes_cache_root, market), yes_columns, partitions=["year"])
+
+    return connection
+
+
+def range_filter(start: datetime, end: datetime, alias: str) -> Tuple[str, List]:
+    """
+    The WHERE clause selecting start <= Interval_Time < end, with the year bounds that prune partitions.
+    """
+    clause = f"{alias}.year BETWEEN ? AND ? AND {alias}.Interval_Time >= ? AND {alias}.Interval_Time < ?"
+    return clause, [start.year, end.year, start, end]
+
+
+def sf_deltas(connection: duckdb.DuckDBPyConnection, view: str, pairs: pd.DataFrame, start: datetime, end: datetime) -> pd.DataFrame:
+    """
+    The source and sink shift factors and their delta for every path, in one query.
+
+    Inputs:
+        - view: 'sspsf' or 'dsf'.
+        - pairs: A DataFrame with SOURCE and SINK columns.
+        - start, end: Only intervals with start <= Interval_Time < end.
+
+    Output:
+        - One row per (path, interval, constraint, contingency) where both nodes have a shift factor.
+    """
+    connection.register("delta_pairs", pairs[["SOURCE", "SINK"]].drop_duplicates())
+    source_filter, source_values = range_filter(start, end, "s")
+    sink_filter, sink_values = range_filter(start, end, "k")
+
+    try:
+        return connection.execute(f"""
+            SELECT p.SOURCE, p.SINK, s.Interval_Time, s.Hour_Ending, s.Constraint_Name, s.Contingency_Name,
+                   s.Shift_Factor AS SOURCE_SF, k.Shift_Factor AS SINK_SF, s.Shift_Factor - k.Shift_Factor AS SF_Delta
+            FROM delta_pairs p
+            JOIN {view} s ON s.Settlement_Point = p.SOURCE
+            JOIN {view} k ON k.Settlement_Point = p.SINK AND k.Interval_Time = s.Interval_Time AND k.Hour_Ending = s.Hour_Ending
+                         AND k.Constraint_Name = s.Constraint_Name AND k.Contingency_Name = s.Contingency_Name
+            WHERE {source_filter} AND {sink_filter}
+            ORDER BY s.Interval_Time, s.Hour_Ending, p.SOURCE, p.SINK
+        """, source_values + sink_values).df()
+    finally:
+        connection.unregister("delta_pairs")
+
+
+def average_shadow_prices(connection: duckdb.DuckDBPyConnection, view: str, start: datetime, end: datetime) -> pd.DataFrame:
+    """
+    The average, maximum and number of binding hours of every constraint and contingency, per day.
+
+    Inputs:
+        - view: 'yes_rt' or 'yes_da'.
+        - start, end: Only days with start <= Interval_Time < end.
+    """
+    where, values = range_filter(start, end, "y")
+    return connection.execute(f"""
+        SELECT y.Interval_Time AS Date, y.Constraint_Name, y.Contingency_Name,
+               AVG(y.Shadow_Price) AS Average_SP, MAX(y.Shadow_Price) AS Max_SP,
+               COUNT(DISTINCT y.Hour_Ending) FILTER (WHERE y.Shadow_Price > 0) AS Binding_Hours
+        FROM {view} y
+        WHERE {where}
+        GROUP BY ALL
+        ORDER BY Date, y.Constraint_Name, y.Contingency_Name
+    """, values).df()
+
+
+def binding_counts(connection: duckdb.DuckDBPyConnection, view: str, start: datetime, end: datetime) -> pd.DataFrame:
+    """
+    The number of intervals (or delivery hours) in which every constraint and contingency has shift factors.
+
+    Inputs:
+        - view: 'sspsf' or 'dsf'.
+        - start, end: Only intervals with start <= Interval_Time < end.
+    """
+    where, values = range_filter(start, end, "v")
+    return connection.execute(f"""
+        SELECT v.Constraint_Name, v.Contingency_Name, COUNT(DISTINCT (v.Interval_Time, v.Hour_Ending)) AS Binding_Intervals
+        FROM {view} v
+        WHERE {where}
+        GROUP BY ALL
+        ORDER BY Binding_Intervals DESC
+    """, values).df()
+
+
+def export_csv(connection: duckdb.DuckDBPyConnection, query: str, output_path: str, parameters: List = None):
+    """
+    Writes the result of a query straight to a CSV file with a header, without building a DataFrame.
+    """
+    connection.execute(f"COPY ({query}) TO '{output_path.replace(chr(92), '/')}' (HEADER, DELIMITER ',')", parameters or [])
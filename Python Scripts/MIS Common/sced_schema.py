@@ -0,0 +1,176 @@
+import os
+import json
+import threading
+import pandas as pd
+from typing import Dict, Iterable, List
+
+"""
+Compact column types for SCED shift-factor frames (130_SSPSF).
+
+Read as pandas defaults, every 130_SSPSF row holds three Python strings (constraint, contingency and
+settlement point), a timestamp string and a float64, which is why a year of SCED_Delta_New.py data did not
+fit in 32 GB. apply_schema converts a frame to:
+
+    - Constraint_Name, Contingency_Name, Settlement_Point: categoricals whose categories come from a
+      CategoryDictionary, so every frame of every run codes the same name with the same integer.
+      Frames with the same categories concatenate without falling back to object and merge and group
+      on their integer codes.
+    - Shift_Factor: float32, which keeps the ~7 significant digits ERCOT publishes.
+    - SCED_Time_Stamp: datetime64, parsed once with an explicit format. It is stored as int64 nanoseconds
+      since the epoch, so comparisons and sorting are integer operations.
+
+The dictionary is a JSON file of the known values of every column. New values are only ever appended, so
+existing codes never change between runs.
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+    from sced_schema import apply_schema, concat, footprint_mb
+
+    df = concat([apply_schema(df) for df in frames])
+    print(f"{footprint_mb(df):.1f} MB")
+"""
+
+# Global Variables and Parameters
+dictionary_path = os.environ.get("MIS_CATEGORY_DICTIONARY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_dictionary.json"))
+
+# Columns converted by apply_schema.
+category_columns = ["Constraint_Name", "Contingency_Name", "Settlement_Point"]
+float32_columns = ["Shift_Factor"]
+time_columns = {"SCED_Time_Stamp": "%m/%d/%Y %H:%M:%S"}
+
+
+class CategoryDictionary:
+    """
+    Append-only dictionary of the known values of each categorical column, persisted as JSON.
+
+    Inputs:
+        - path: The JSON file holding {column: [values in code order]}.
+    """
+
+    def __init__(self, path: str = dictionary_path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.values: Dict[str, List[str]] = self.read()
+        self.changed = False
+
+    def read(self) -> Dict[str, List[str]]:
+        try:
+            with open(self.path, "r") as dictionary_file:
+                return json.load(dictionary_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def categories(self, column: str, values: Iterable = ()) -> List[str]:
+        """
+        The categories of a column, after appending any of values not seen before.
+        """
+        with self.lock:
+            known = self.values.setdefault(column, [])
+            seen = set(known)
+            new_values = [value for value in pd.unique(pd.Series(values, dtype=object).dropna()) if value not in seen]
+
+            if len(new_values) > 0:
+                known.extend(new_values)
+                self.changed = True
+
+            return list(known)
+
+    def categorical(self, column: str, values: pd.Series) -> pd.Categorical:
+        """
+        Codes values against the column's categories, extending them with any new values first.
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            observed = values.cat.categories
+        else:
+            values = values.astype(object)
+            observed = values.unique()
+
+        return pd.Categorical(values, categories=self.categories(column, observed))
+
+    def save(self):
+        """
+        Writes the dictionary if it changed. Values another run appended meanwhile are kept in front of
+        this run's, so no value that was already on disk changes its code.
+        """
+        with self.lock:
+            if not self.changed:
+                return
+
+            merged = self.read()
+            for column, values in self.values.items():
+                on_disk = merged.setdefault(column, [])
+                seen = set(on_disk)
+                on_disk.extend(value for value in values if value not in seen)
+
+            try:
+                with open(self.path + ".tmp", "w") as dictionary_file:
+                    json.dump(merged, dictionary_file)
+                os.replace(self.path + ".tmp", self.path)
+            except OSError as exc:
+                print(f"Could not save the category dictionary at {self.path}: {exc}")
+                return
+
+            # Pick up the other run's values too, after this run's so no category of this run moves.
+            for column, values in merged.items():
+                known = self.values.setdefault(column, [])
+                seen = set(known)
+                known.extend(value for value in values if value not in seen)
+
+            self.changed = False
+
+
+# The dictionary shared by every apply_schema call of this process.
+dictionary = CategoryDictionary()
+
+
+def apply_schema(df: pd.DataFrame, categories: CategoryDictionary = None) -> pd.DataFrame:
+    """
+    Converts the known columns of a SCED frame to their compact types (see the module docstring)
+    and saves any new category values.
+
+    Inputs:
+        - df: A frame with any of the columns of category_columns, float32_columns and time_columns.
+        - categories: The dictionary to code the categorical columns with. Defaults to the shared one.
+
+    Output:
+        - The same frame, converted in place.
+    """
+    categories = categories or dictionary
+
+    for column in category_columns:
+        if column in df.columns:
+            df[column] = categories.categorical(column, df[column])
+
+    for column in float32_columns:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float32")
+
+    for column, time_format in time_columns.items():
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], format=time_format)
+
+    categories.save()
+    return df
+
+
+def concat(frames: List[pd.DataFrame], categories: CategoryDictionary = None) -> pd.DataFrame:
+    """
+    Concatenates frames converted by apply_schema. Their categories only differ by the values appended
+    in between, so every categorical column is widened to the current categories (which keeps its codes)
+    and the result stays categorical instead of falling back to object.
+    """
+    categories = categories or dictionary
+    frames = [frame for frame in frames if len(frame) > 0]
+
+    for frame in frames:
+        for column in category_columns:
+            if column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].cat.set_categories(categories.categories(column))
+
+    return pd.concat(frames, ignore_index=True) if len(frames) > 0 else pd.DataFrame()
+
+
+def footprint_mb(df: pd.DataFrame) -> float:
+    """
+    The memory used by a frame in MB, including the Python strings of object columns.
+    """
+    return df.memory_usage(deep=True).sum() / (1 << 20)
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Tuple, Union
+
+"""
+Shift-factor matrix for computing the source/sink deltas of many paths at once.
+
+SCED_Delta_New.py used to merge the shift factors of one portfolio twice, once on the source and once on the
+sink of every path, so covering another path or portfolio meant running the merges (and the script) again.
+pivot_shift_factors instead pivots the shift factors once into a matrix with one row per (interval,
+constraint, contingency) and one float32 column per settlement point. Every path is then a pair of columns:
+
+    matrix = pivot_shift_factors(sf_df, nodes)
+    deltas = matrix.path_deltas(paths_df[['SOURCE', 'SINK']])
+
+path_deltas subtracts the sink column from the source column for all pairs together, so N paths cost one
+pivot plus N column operations instead of N pairs of merges. A row of a path is kept, like in the inner
+merges, only if both its source and its sink have a shift factor for that row.
+"""
+
+# Global Variables and Parameters
+# Columns identifying one row of the matrix in the SCED (130_SSPSF) frames.
+sced_key_columns = ["SCED_Time_Stamp", "Hour_Ending", "Constraint_Name", "Contingency_Name"]
+
+# Rows of the matrix handled at once by path_deltas, which bounds its temporary (rows x paths) arrays.
+rows_per_block = 1 << 16
+
+
+class ShiftFactorMatrix:
+    """
+    Shift factors pivoted to one row per key and one column per settlement point. Missing shift factors are NaN.
+
+    Inputs:
+        - keys: A DataFrame with the key columns of every row, in row order.
+        - nodes: The settlement point of every column.
+        - values: The (rows x nodes) float32 array of shift factors.
+    """
+
+    def __init__(self, keys: pd.DataFrame, nodes: List[str], values: np.ndarray):
+        self.keys = keys.reset_index(drop=True)
+        self.nodes = list(nodes)
+        self.values = values
+        self.node_index = {node: position for position, node in enumerate(self.nodes)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def column(self, node: str) -> np.ndarray:
+        """
+        The shift factors of one settlement point, or all NaN if the node is not in the matrix.
+        """
+        if node not in self.node_index:
+            return np.full(len(self), np.nan, dtype="float32")
+
+        return self.values[:, self.node_index[node]]
+
+    def delta(self, source: str, sink: str) -> np.ndarray:
+        """
+        The source minus the sink shift factor of every row, NaN where either is missing.
+        """
+        return self.column(source) - self.column(sink)
+
+    def long_rows(self, node_column: str = "Settlement_Point", value_column: str = "Shift_Factor") -> pd.DataFrame:
+        """
+        The matrix back as long rows, one per present shift factor, ordered by row and then by node.
+        """
+        rows, columns = np.nonzero(~np.isnan(self.values))
+        long = self.keys.iloc[rows].reset_index(drop=True)
+        long[node_column] = pd.Categorical.from_codes(columns, categories=self.nodes)
+        long[value_column] = self.values[rows, columns]
+
+        return long
+
+    def path_deltas(self, pairs: Union[pd.DataFrame, Iterable[Tuple[str, str]]]) -> pd.DataFrame:
+        """
+        The source and sink shift factors of every path, for every row where both are present.
+
+        Inputs:
+            - pairs: A DataFrame with SOURCE and SINK columns, or (source, sink) tuples. Pairs with a node
+              that is not in the matrix have no rows.
+
+        Output:
+            - A DataFrame with SOURCE, SINK, the key columns, SOURCE_SF, SINK_SF and SF_Delta, ordered by
+              row and then by pair. SOURCE and SINK are categoricals of the matrix's nodes.
+        """
+        pairs = pd.DataFrame(pairs, columns=["SOURCE", "SINK"]) if not isinstance(pairs, pd.DataFrame) else pairs[["SOURCE", "SINK"]]
+        pairs = pairs.astype(object).drop_duplicates()
+        pairs = pairs[pairs["SOURCE"].isin(self.node_index) & pairs["SINK"].isin(self.node_index)]
+
+        sources = pairs["SOURCE"].map(self.node_index).to_numpy(dtype=np.int64)
+        sinks = pairs["SINK"].map(self.node_index).to_numpy(dtype=np.int64)
+
+        merge = []
+        for start in range(0, len(self), rows_per_block):
+            block = self.values[start:start + rows_per_block]
+            source_sf = block[:, sources]
+            sink_sf = block[:, sinks]
+
+            # Row-major, so the kept entries come out ordered by row and then by pair.
+            rows, paths = np.nonzero(~np.isnan(source_sf) & ~np.isnan(sink_sf))
+            if len(rows) == 0:
+                continue
+
+            part = self.keys.iloc[start + rows].reset_index(drop=True)
+            part.insert(0, "SOURCE", pd.Categorical.from_codes(sources[paths], categories=self.nodes))
+            part.insert(1, "SINK", pd.Categorical.from_codes(sinks[paths], categories=self.nodes))
+            part["SOURCE_SF"] = source_sf[rows, paths]
+            part["SINK_SF"] = sink_sf[rows, paths]
+            part["SF_Delta"] = part["SOURCE_SF"] - part["SINK_SF"]
+            merge.append(part)
+
+        if len(merge) == 0:
+            # Keep the key types, so callers can still use i.e. the .dt accessor on an empty result.
+            empty = self.keys.iloc[:0].reset_index(drop=True)
+            empty.insert(0, "SOURCE", pd.Categorical([], categories=self.nodes))
+            empty.insert(1, "SINK", pd.Categorical([], categories=self.nodes))
+            return empty.assign(SOURCE_SF=np.float32(), SINK_SF=np.float32(), SF_Delta=np.float32()).iloc[:0]
+
+        return pd.concat(merge, ignore_index=True)
+
+
+def pivot_shift_factors(sf_df: pd.DataFrame, nodes: Iterable[str] = None, key_columns: List[str] = sced_key_columns,
+                        node_column: str = "Settlement_Point", value_column: str = "Shift_Factor") -> ShiftFactorMatrix:
+    """
+    Pivots long shift-factor rows into a ShiftFactorMatrix.
+
+    Inputs:
+        - sf_df: The shift factors, one row per (key, settlement point).
+        - nodes: The settlement points to keep as columns, or every settlement point of sf_df if None.
+        - key_columns: The columns identifying a row of the matrix. Rows with a missing key are dropped.
+        - node_column, value_column: The settlement point and shift factor columns.
+
+    Output:
+        - The matrix, with its rows sorted by key_columns. Where a key and settlement point appear more
+          than once, the first shift factor is kept.
+    """
+    if nodes is None:
+        nodes = pd.unique(sf_df[node_column].astype(object).dropna())
+    nodes = list(nodes)
+
+    # Position of every row's settlement point in nodes, or -1 if it is not kept.
+    node_codes = pd.Index(nodes).get_indexer(sf_df[node_column].astype(object))
+    frame = sf_df[node_codes >= 0]
+    node_codes = node_codes[node_codes >= 0]
+
+    present = frame[key_columns].notna().all(axis=1).to_numpy()
+    frame = frame[present]
+    node_codes = node_codes[present]
+
+    if len(frame) == 0:
+        return ShiftFactorMatrix(frame[key_columns], nodes, np.empty((0, len(nodes)), dtype="float32"))
+
+    row_codes = frame.groupby(key_columns, sort=True, observed=True).ngroup().to_numpy()
+    _, first_rows = np.unique(row_codes, return_index=True)
+    keys = frame[key_columns].iloc[first_rows]
+
+    # Keep the first shift factor of every (row, node) cell.
+    unique_cells = ~pd.DataFrame({"row": row_codes, "node": node_codes}).duplicated().to_numpy()
+
+    values = np.full((len(keys), len(nodes)), np.nan, dtype="float32")
+    values[row_codes[unique_cells], node_codes[unique_cells]] = frame[value_column].to_numpy(dtype="float32")[unique_cells]
+
+    return ShiftFactorMatrix(keys, nodes, values)
@@ -0,0 +1,329 @@
+import os
+import sys
+import h5py
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+from mis_parquet import parquet_root, read_dataset
+from sf_matrix import ShiftFactorMatrix, pivot_shift_factors
+from zip_pool import hour_ending
+
+"""
+Persistent shift-factor matrices, one compressed HDF5 file per dataset and month.
+
+SCED_Delta_New.py and DAM_Last_3_Years.py re-extracted years of shift factors from the MIS ZIP files for the
+nodes of one hard-coded portfolio, so every new path meant reading them all again. SFMatrixStore keeps every
+settlement point instead, as the (interval x constraint x contingency) by settlement point matrices of
+sf_matrix.py:
+
+    {sf_store_root}/{dataset}/year=YYYY/YYYY-MM.h5
+
+        values          float32 (rows x nodes), NaN where a node has no shift factor, chunked by column
+        time            int64 nanoseconds since the epoch of every row, ascending
+        hour_ending     int8 hour ending of every row
+        constraint      int32 code of every row into constraints
+        contingency     int32 code of every row into contingencies
+        nodes, constraints, contingencies: the names behind the column and codes
+
+A month is built once from the converted Parquet dataset (see mis_parquet.py), a day at a time, and rebuilt
+when its Parquet partition changes. Readers refresh the months they need and only use the store if it is
+then current for their range, falling back to the ZIP files otherwise. Reading a path then opens two
+columns of the months it spans, never the raw files:
+
+    python sf_matrix_store.py 130_SSPSF 2024-01 2024-06
+
+    store = SFMatrixStore("130_SSPSF")
+    store.refresh(datetime(2024, 6, 1), datetime(2024, 7, 1))
+    if store.is_current(datetime(2024, 6, 1), datetime(2024, 7, 1)):
+        deltas = store.delta("HB_NORTH", "HB_HOUSTON", datetime(2024, 6, 1), datetime(2024, 7, 1))
+"""
+
+# Global Variables and Parameters
+sf_store_root = os.environ.get("MIS_SF_STORE", "\\\\Pzpwuplancli01\\Uplan\\ERCOT\\MIS SF Matrix\\")
+
+# Shift factors at or below this magnitude are not stored. The scripts filter with larger limits.
+min_shift_factor = 0.001
+
+# Rows per chunk of a column. One chunk of one column is 64 KB before compression.
+chunk_rows = 1 << 14
+
+# How every dataset maps to the matrix: the key columns (time, hour ending, constraint, contingency, in this
+# order), the settlement point and shift factor columns, and whether the hour ending is computed from the time.
+sf_matrix_datasets = {
+    "130_SSPSF": {
+        "keys": ["SCED_Time_Stamp", "Hour_Ending", "Constraint_Name", "Contingency_Name"],
+        "node_column": "Settlement_Point",
+        "value_column": "Shift_Factor",
+        "derive_hour": True,
+    },
+    "55_DSF": {
+        "keys": ["DeliveryDate", "HourEnding", "ConstraintName", "ContingencyName"],
+        "node_column": "SettlementPoint",
+        "value_column": "ShiftFactor",
+        "derive_hour": False,
+    },
+}
+
+
+def month_starts(start: datetime, end: datetime) -> List[datetime]:
+    """
+    The first day of every month overlapping [start, end).
+    """
+    months = []
+    current = datetime(start.year, start.month, 1)
+    while current < end:
+        months.append(current)
+        current = datetime(current.year + current.month // 12, current.month % 12 + 1, 1)
+
+    return months
+
+
+def append_names(names: List[str], index: Dict[str, int], values: Iterable) -> np.ndarray:
+    """
+    Codes values into names, appending the ones not seen before.
+    """
+    codes = []
+    for value in values:
+        if value not in index:
+            index[value] = len(names)
+            names.append(value)
+        codes.append(index[value])
+
+    return np.asarray(codes, dtype="int32")
+
+
+class SFMatrixStore:
+    """
+    Builder and reader of the monthly shift-factor matrices of one MIS dataset.
+
+    Inputs:
+        - dataset: A key of sf_matrix_datasets, i.e. '55_DSF'.
+        - root: The folder holding every dataset's matrices.
+    """
+
+    def __init__(self, dataset: str, root: str = sf_store_root):
+        self.dataset = dataset
+        self.spec = sf_matrix_datasets[dataset]
+        self.folder = os.path.join(root, dataset)
+
+    def month_path(self, month: datetime) -> str:
+        return os.path.join(self.folder, f"year={month.year}", f"{month.strftime('%Y-%m')}.h5")
+
+    def has_range(self, start: datetime, end: datetime) -> bool:
+        """
+        Whether every month overlapping [start, end) has been built. Built months may be stale (see is_current).
+        """
+        return all(os.path.isfile(self.month_path(month)) for month in month_starts(start, end))
+
+    def is_current(self, start: datetime, end: datetime) -> bool:
+        """
+        Whether every month overlapping [start, end) has been built since its Parquet partition last changed.
+        """
+        return not any(self.is_stale(month) for month in month_starts(start, end))
+
+    def partition_files(self, month: datetime) -> List[str]:
+        """
+        The Parquet files of a month's partition of the converted dataset.
+        """
+        partition = os.path.join(parquet_root, self.dataset, f"year={month.year}", f"month={month.month:02d}")
+        if not os.path.isdir(partition):
+            return []
+
+        return [os.path.join(partition, name) for name in os.listdir(partition) if name.endswith(".parquet")]
+
+    def partition_rows(self, month: datetime) -> int:
+        """
+        The number of rows in a month's Parquet partition, from the file footers.
+        """
+        return sum(pq.ParquetFile(path).metadata.num_rows for path in self.partition_files(month))
+
+    def is_stale(self, month: datetime) -> bool:
+        """
+        Whether a month is missing, its Parquet partition changed since it was built, or it was built from no
+        rows while its partition has rows.
+        """
+        path = self.month_path(month)
+        if not os.path.isfile(path):
+            return True
+
+        built = os.path.getmtime(path)
+        if any(os.path.getmtime(partition_file) > built for partition_file in self.partition_files(month)):
+            return True
+
+        with h5py.File(path, "r") as h5:
+            empty = h5.attrs.get("source_rows", h5["time"].shape[0]) == 0
+
+        return empty and self.partition_rows(month) > 0
+
+    def build_month(self, month: datetime) -> int:
+        """
+        Builds the matrix of one month from the converted Parquet dataset, one day at a time, and replaces
+        the month's file once it is complete. A month of which no rows were read while its partition has rows
+        was read wrong (i.e. its time column did not parse), so it is not written and any earlier file is
+        removed, leaving the month stale.
+
+        Output:
+            - The number of rows written.
+        """
+        time_column, hour_column, constraint_column, contingency_column = self.spec["keys"]
+        node_column, value_column = self.spec["node_column"], self.spec["value_column"]
+        read_columns = [column for column in self.spec["keys"] if not (column == hour_column and self.spec["derive_hour"])]
+
+        path = self.month_path(month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        names = {"nodes": [], "constraints": [], "contingencies": []}
+        indexes = {key: {} for key in names}
+        rows = source_rows = 0
+
+        with h5py.File(path + ".tmp", "w") as h5:
+            values = h5.create_dataset("values", shape=(0, 0), maxshape=(None, None), dtype="float32", chunks=(chunk_rows, 1),
+                                       fillvalue=np.nan, compression="gzip", compression_opts=4, shuffle=True)
+            keys = {name: h5.create_dataset(name, shape=(0,), maxshape=(None,), dtype=dtype, chunks=(chunk_rows,), compression="gzip")
+                    for name, dtype in [("time", "int64"), ("hour_ending", "int8"), ("constraint", "int32"), ("contingency", "int32")]}
+
+            day = month
+            next_month = month_starts(month, month + timedelta(days=32))[1]
+            while day < next_month:
+                df = read_dataset(self.dataset, columns=read_columns + [node_column, value_column], start=day, end=day + timedelta(days=1))
+                source_rows += len(df)
+                df = df[df[value_column].abs() > min_shift_factor]
+                day += timedelta(days=1)
+
+                if len(df) == 0:
+                    continue
+
+                if self.spec["derive_hour"]:
+                    df[hour_column] = hour_ending(df[time_column])
+
+                append_names(names["nodes"], indexes["nodes"], pd.unique(df[node_column].astype(object)))
+                matrix = pivot_shift_factors(df, nodes=names["nodes"], key_columns=self.spec["keys"],
+                                             node_column=node_column, value_column=value_column)
+
+                added = len(matrix)
+                values.resize((rows + added, len(names["nodes"])))
+                values[rows:rows + added, :] = matrix.values
+
+                for dataset in keys.values():
+                    dataset.resize((rows + added,))
+                keys["time"][rows:] = matrix.keys[time_column].to_numpy(dtype="datetime64[ns]").view("int64")
+                keys["hour_ending"][rows:] = matrix.keys[hour_column].to_numpy(dtype="int8")
+                keys["constraint"][rows:] = append_names(names["constraints"], indexes["constraints"], matrix.keys[constraint_column].astype(object))
+                keys["contingency"][rows:] = append_names(names["contingencies"], indexes["contingencies"], matrix.keys[contingency_column].astype(object))
+
+                rows += added
+
+            for name, values_list in names.items():
+                h5.create_dataset(name, data=np.asarray(values_list, dtype=object), dtype=h5py.string_dtype())
+            h5.attrs["source_rows"] = source_rows
+
+        if source_rows == 0 and self.partition_rows(month) > 0:
+            print(f"{self.dataset} {month.strftime('%Y-%m')}: no rows read from a non-empty partition, month not stored")
+            os.remove(path + ".tmp")
+            if os.path.isfile(path):
+                os.remove(path)
+            return 0
+
+        # Replace the month only once it is complete, so readers never see half a month.
+        os.replace(path + ".tmp", path)
+        return rows
+
+    def build(self, start: datetime, end: datetime, rebuild: bool = False) -> List[datetime]:
+        """
+        Builds every month overlapping [start, end) that is missing or stale (or every month, with rebuild).
+
+        Output:
+            - The months built.
+        """
+        built = []
+        for month in month_starts(start, end):
+            if rebuild or self.is_stale(month):
+                print(f"{self.dataset} {month.strftime('%Y-%m')}: {self.build_month(month)} rows")
+                built.append(month)
+
+        return built
+
+    def refresh(self, start: datetime, end: datetime) -> List[datetime]:
+        """
+        Rebuilds the months overlapping [start, end) that were built but are stale. Months never built are
+        left to build from the command line: their Parquet partition may not exist yet, and building it would
+        store an empty month that looks current.
+
+        Output:
+            - The months rebuilt.
+        """
+        stale = [month for month in month_starts(start, end) if os.path.isfile(self.month_path(month)) and self.is_stale(month)]
+        for month in stale:
+            print(f"{self.dataset} {month.strftime('%Y-%m')}: {self.build_month(month)} rows")
+
+        return stale
+
+    def empty_keys(self) -> pd.DataFrame:
+        time_column, hour_column, constraint_column, contingency_column = self.spec["keys"]
+        return pd.DataFrame({time_column: pd.Series([], dtype="datetime64[ns]"), hour_column: pd.Series([], dtype="int8"),
+                             constraint_column: pd.Series([], dtype=object), contingency_column: pd.Series([], dtype=object)})
+
+    def read_month(self, month: datetime, start: datetime, end: datetime, nodes: List[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        The keys and the columns of the given nodes of one month's rows within [start, end).
+        """
+        time_column, hour_column, constraint_column, contingency_column = self.spec["keys"]
+
+        with h5py.File(self.month_path(month), "r") as h5:
+            times = h5["time"][:]
+            lower, upper = np.searchsorted(times, [pd.Timestamp(start).value, pd.Timestamp(end).value])
+
+            block = np.full((upper - lower, len(nodes)), np.nan, dtype="float32")
+            if upper <= lower:
+                return self.empty_keys(), block
+
+            node_index = {node: position for position, node in enumerate(h5["nodes"].asstr()[:])}
+            for position, node in enumerate(nodes):
+                if node in node_index:
+                    block[:, position] = h5["values"][lower:upper, node_index[node]]
+
+            keys = pd.DataFrame({
+                time_column: pd.to_datetime(times[lower:upper]),
+                hour_column: h5["hour_ending"][lower:upper],
+                constraint_column: np.asarray(h5["constraints"].asstr()[:], dtype=object)[h5["constraint"][lower:upper]],
+                contingency_column: np.asarray(h5["contingencies"].asstr()[:], dtype=object)[h5["contingency"][lower:upper]],
+            })
+
+        return keys, block
+
+    def matrix(self, start: datetime, end: datetime, nodes: Iterable[str]) -> ShiftFactorMatrix:
+        """
+        The shift factors of the given settlement points for every row within [start, end), only reading
+        their columns of the months built.
+        """
+        nodes = list(pd.unique(pd.Series(list(nodes), dtype=object)))
+        merge_keys, merge_values = [], []
+
+        for month in month_starts(start, end):
+            if os.path.isfile(self.month_path(month)):
+                keys, block = self.read_month(month, start, end, nodes)
+                merge_keys.append(keys)
+                merge_values.append(block)
+
+        if len(merge_keys) == 0:
+            return ShiftFactorMatrix(self.empty_keys(), nodes, np.empty((0, len(nodes)), dtype="float32"))
+
+        return ShiftFactorMatrix(pd.concat(merge_keys, ignore_index=True), nodes, np.vstack(merge_values))
+
+    def delta(self, source: str, sink: str, start: datetime, end: datetime) -> pd.DataFrame:
+        """
+        The source and sink shift factors and their delta for one path (see ShiftFactorMatrix.path_deltas).
+        """
+        return self.matrix(start, end, [source, sink]).path_deltas([(source, sink)])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in sf_matrix_datasets:
+        sys.stderr.write(f"usage: {sys.argv[0]} <{'|'.join(sf_matrix_datasets)}> <first month YYYY-MM> <last month YYYY-MM>\n")
+        sys.exit(1)
+
+    first_month = datetime.strptime(sys.argv[2], "%Y-%m")
+    last_month = datetime.strptime(sys.argv[3], "%Y-%m")
+    print(f"Built {len(SFMatrixStore(sys.argv[1]).build(first_month, last_month + timedelta(days=1)))} months of {sys.argv[1]}.")
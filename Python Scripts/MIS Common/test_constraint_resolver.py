@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+from constraint_resolver import AhoCorasick, ConstraintResolver
+
+"""
+Behaviour tests of the constraint-name resolver. Run with pytest from this folder.
+"""
+
+reported_names = ["DCTRNH_AXFMR1 DECATUR", "SANDOW_MILAM_1", "XFMR_SANDOW", "CEDAR_HILL 345"]
+
+
+def test_aho_corasick_finds_every_contained_pattern():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+
+    assert automaton.search("ushers") == {0, 1, 3}
+    assert automaton.search("history") == {2}
+    assert automaton.search("xyz") == set()
+
+
+def test_matches_keep_snapshot_order_and_ignore_empty_names():
+    resolver = ConstraintResolver(reported_names + ["SANDOW_MILAM_1"], cache_folder=None)
+
+    assert resolver.matches("SANDOW") == ("SANDOW_MILAM_1", "XFMR_SANDOW")
+    assert resolver.matches("DCTRNH_AXFMR1") == ("DCTRNH_AXFMR1 DECATUR",)
+    assert resolver.matches("MISSING") == ()
+    assert resolver.matches("") == ()
+
+
+def test_contains_is_element_wise():
+    resolver = ConstraintResolver(reported_names, cache_folder=None)
+    constraint_names = pd.Series(["SANDOW", "SANDOW", "CEDAR", "CEDAR"], index=[10, 11, 12, 13])
+    reported = pd.Series(["XFMR_SANDOW", "CEDAR_HILL 345", "CEDAR_HILL 345", "SANDOW_MILAM_1"])
+
+    assert resolver.contains(constraint_names, reported).tolist() == [True, False, True, False]
+
+
+def test_resolve_takes_the_first_match_with_equal_keys():
+    resolver = ConstraintResolver(reported_names, cache_folder=None)
+    network_df = pd.DataFrame({"ConstraintName": ["SANDOW", "SANDOW", "CEDAR"], "HourEnding": [1, 2, 1]},
+                              index=[5, 6, 7])
+    yes_df = pd.DataFrame({"HOURENDING": [1, 1, 2], "REPORTED_NAME": ["XFMR_SANDOW", "SANDOW_MILAM_1", "CEDAR_HILL 345"]})
+
+    resolved = resolver.resolve(network_df, "ConstraintName", yes_df, ["HourEnding"], ["HOURENDING"])
+
+    assert resolved.index.tolist() == [5, 6, 7]
+    assert resolved.tolist() == ["XFMR_SANDOW", None, None]
+
+
+def test_matches_are_cached_per_snapshot(tmp_path):
+    ConstraintResolver(reported_names, cache_folder=str(tmp_path)).index(["SANDOW"])
+    assert len(os.listdir(tmp_path)) == 1
+
+    warm = ConstraintResolver(reversed(reported_names), cache_folder=str(tmp_path))
+    assert warm.matches_by_name == {"SANDOW": ("SANDOW_MILAM_1", "XFMR_SANDOW")}
+
+    other = ConstraintResolver(reported_names[:2], cache_folder=str(tmp_path))
+    assert other.matches_by_name == {}
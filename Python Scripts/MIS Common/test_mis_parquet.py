@@ -0,0 +1,101 @@
+import os
+import time
+import zipfile
+import pytest
+import pandas as pd
+from datetime import datetime
+import mis_parquet
+from zip_pool import read_zip
+
+"""
+Behaviour tests of the Parquet conversion and of reading converted ZIP files like ZIP files. Run with pytest
+from this folder.
+"""
+
+sspsf_csv = """SCED_Time_Stamp,Repeated_Hour_Flag,Constraint_ID,Constraint_Name,Contingency_Name,Settlement_Point,Shift_Factor
+06/01/2024 13:05:12,N,1,SANDOW,DSANMIL5,HB_NORTH,0.25
+06/01/2024 13:05:12,N,1,SANDOW,DSANMIL5,HB_HOUSTON,-0.1
+06/01/2024 13:05:12,N,2,CEDAR,BASE CASE,HB_NORTH,0.0005
+06/01/2024 13:05:12,N,2,CEDAR,BASE CASE,LZ_WEST,0.4
+"""
+
+dsf_csv = """DeliveryDate,HourEnding,ConstraintID,ConstraintName,ContingencyName,SettlementPoint,ShiftFactor,DSTFlag
+06/01/2024,01:00,1,SANDOW,DSANMIL5,HB_NORTH,0.25,N
+06/01/2024,24:00,1,SANDOW,DSANMIL5,HB_HOUSTON,-0.125,N
+"""
+
+spec = {
+    "columns": ["SCED_Time_Stamp", "Constraint_Name", "Contingency_Name", "Settlement_Point", "Shift_Factor"],
+    "dtypes": {"Constraint_Name": "category", "Contingency_Name": "category", "Settlement_Point": "category"},
+    "filters": [("Settlement_Point", "in", {"HB_NORTH", "HB_HOUSTON"}), ("Shift_Factor", "abs>", 0.001)],
+    "stamp_column": "SCED_Time_Stamp",
+    "time_format": "%m/%d/%Y %H:%M:%S",
+}
+
+
+@pytest.fixture
+def sspsf_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(mis_parquet, "parquet_root", os.path.join(tmp_path, "parquet"))
+    folder = os.path.join(tmp_path, "130_SSPSF")
+    os.makedirs(folder)
+
+    zip_path = os.path.join(folder, "cdr.00013069.0000000000000000.20240601.130512.SSPSF_csv.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        zip_file.writestr("cdr.00013069.0000000000000000.20240601.130512.SSPSF.csv", sspsf_csv)
+
+    return folder, zip_path
+
+
+def test_ingest_folder_converts_once_into_month_partitions(sspsf_folder):
+    folder, zip_path = sspsf_folder
+
+    assert mis_parquet.ingest_folder("130_SSPSF", folder) == 1
+    assert mis_parquet.ingest_folder("130_SSPSF", folder) == 0
+
+    df = mis_parquet.read_dataset("130_SSPSF", start=datetime(2024, 6, 1), end=datetime(2024, 6, 2))
+    assert len(df) == 4
+    assert df["SCED_Time_Stamp"].iloc[0] == pd.Timestamp(2024, 6, 1, 13, 5, 12)
+    assert mis_parquet.read_dataset("130_SSPSF", start=datetime(2024, 7, 1), end=datetime(2024, 8, 1)).empty
+
+
+def test_converted_files_leaves_out_unconverted_and_changed_zips(sspsf_folder):
+    folder, zip_path = sspsf_folder
+    assert mis_parquet.converted_files("130_SSPSF", [zip_path]) == {}
+
+    mis_parquet.ingest_folder("130_SSPSF", folder)
+    assert list(mis_parquet.converted_files("130_SSPSF", [zip_path])) == [zip_path]
+
+    # A ZIP file downloaded again after its conversion is read from the ZIP until it is converted again.
+    later = time.time() + 60
+    os.utime(zip_path, (later, later))
+    assert mis_parquet.converted_files("130_SSPSF", [zip_path]) == {}
+
+
+def test_read_converted_matches_reading_the_zip(sspsf_folder):
+    folder, zip_path = sspsf_folder
+    mis_parquet.ingest_folder("130_SSPSF", folder)
+
+    from_zip = read_zip(zip_path, spec)
+    from_parquet = pd.concat(mis_parquet.read_converted(mis_parquet.converted_files("130_SSPSF", [zip_path]), spec))
+
+    assert list(from_parquet.columns) == list(from_zip.columns)
+    assert from_parquet["SCED_Time_Stamp"].tolist() == from_zip["SCED_Time_Stamp"].tolist() == ["06/01/2024 13:05:12"] * 2
+    assert from_parquet["Settlement_Point"].astype(object).tolist() == ["HB_NORTH", "HB_HOUSTON"]
+    assert from_parquet["Shift_Factor"].tolist() == from_zip["Shift_Factor"].tolist()
+    assert from_parquet["File_Stamp"].tolist() == from_zip["File_Stamp"].tolist()
+    assert isinstance(from_parquet["Constraint_Name"].dtype, pd.CategoricalDtype)
+
+
+def test_dsf_hour_endings_are_converted_to_integers(tmp_path, monkeypatch):
+    monkeypatch.setattr(mis_parquet, "parquet_root", os.path.join(tmp_path, "parquet"))
+    folder = os.path.join(tmp_path, "55_DSF")
+    os.makedirs(folder)
+    with zipfile.ZipFile(os.path.join(folder, "cdr.00012345.0000000000000000.20240531.123456.DSF.zip"), "w") as zip_file:
+        zip_file.writestr("cdr.00012345.0000000000000000.20240531.123456.DSF.csv", dsf_csv)
+
+    assert mis_parquet.ingest_folder("55_DSF", folder) == 1
+
+    df = mis_parquet.read_dataset("55_DSF", start=datetime(2024, 6, 1), end=datetime(2024, 6, 2))
+    assert df["HourEnding"].tolist() == [1, 24]
+    assert df["DeliveryDate"].tolist() == [pd.Timestamp(2024, 6, 1)] * 2
+    assert df["ShiftFactor"].tolist() == [0.25, -0.125]
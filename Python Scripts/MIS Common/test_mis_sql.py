@@ -0,0 +1,88 @@
+import os
+import zipfile
+import pytest
+import pandas as pd
+from datetime import datetime
+import mis_parquet
+import mis_sql
+from yes_constraint_cache import type_columns
+
+"""
+Behaviour tests of the DuckDB views and queries over an ingested 130_SSPSF file and a cached Yes Energy day.
+Run with pytest from this folder.
+"""
+
+sspsf_csv = """SCED_Time_Stamp,Repeated_Hour_Flag,Constraint_ID,Constraint_Name,Contingency_Name,Settlement_Point,Shift_Factor
+06/01/2024 13:05:12,N,1,SANDOW,DSANMIL5,HB_NORTH,0.25
+06/01/2024 13:05:12,N,1,SANDOW,DSANMIL5,HB_HOUSTON,-0.125
+06/01/2024 13:05:12,N,2,CEDAR,BASE CASE,HB_NORTH,0.5
+06/01/2024 13:05:12,N,2,CEDAR,BASE CASE,LZ_WEST,0.75
+"""
+
+yes_rows = pd.DataFrame({
+    "DATETIME": ["06/01/2024 00:00:00"] * 4,
+    "HOURENDING": [14, 15, 16, 14],
+    "REPORTED_NAME": ["SANDOW_MILAM_1", "SANDOW_MILAM_1", "SANDOW_MILAM_1", "CEDAR_CREEK"],
+    "CONTINGENCY": ["DSANMIL5", "DSANMIL5", "DSANMIL5", "BASE CASE"],
+    "FACILITYTYPE": ["LINE"] * 4,
+    "PEAKTYPE": ["WDPEAK"] * 4,
+    "SHADOWPRICE": [10.0, 30.0, 0.0, 5.0],
+})
+
+june = datetime(2024, 6, 1)
+july = datetime(2024, 7, 1)
+
+
+@pytest.fixture
+def connection(tmp_path, monkeypatch):
+    parquet_root = os.path.join(tmp_path, "parquet")
+    yes_cache_root = os.path.join(tmp_path, "yes_cache")
+    monkeypatch.setattr(mis_parquet, "parquet_root", parquet_root)
+    monkeypatch.setattr(mis_sql, "parquet_root", parquet_root)
+    monkeypatch.setattr(mis_sql, "yes_cache_root", yes_cache_root)
+
+    folder = os.path.join(tmp_path, "130_SSPSF")
+    os.makedirs(folder)
+    with zipfile.ZipFile(os.path.join(folder, "cdr.00013069.0000000000000000.20240601.130512.SSPSF_csv.zip"), "w") as zip_file:
+        zip_file.writestr("cdr.00013069.0000000000000000.20240601.130512.SSPSF.csv", sspsf_csv)
+    mis_parquet.ingest_folder("130_SSPSF", folder)
+
+    yes_path = os.path.join(yes_cache_root, "RT", "year=2024", "2024-06-01.parquet")
+    os.makedirs(os.path.dirname(yes_path))
+    type_columns(yes_rows.copy()).to_parquet(yes_path, engine="pyarrow", index=False)
+
+    connection = mis_sql.connect(threads=1)
+    yield connection
+    connection.close()
+
+
+def test_connect_only_creates_views_of_the_data_on_disk(connection):
+    assert sorted(name for (name,) in connection.execute("SHOW TABLES").fetchall()) == ["sspsf", "yes_rt"]
+
+    sspsf = connection.execute("SELECT Interval_Time, Hour_Ending, Constraint_Name, Settlement_Point, Shift_Factor, year "
+                               "FROM sspsf ORDER BY Settlement_Point, Constraint_Name").fetchall()
+    assert sspsf[0] == (datetime(2024, 6, 1, 13, 5, 12), 14, "SANDOW", "HB_HOUSTON", -0.125, 2024)
+    assert len(sspsf) == 4
+
+    yes = connection.execute("SELECT DISTINCT Interval_Time FROM yes_rt").fetchall()
+    assert yes == [(june,)]
+
+
+def test_sf_deltas_join_sources_and_sinks_on_the_same_keys(connection):
+    pairs = pd.DataFrame({"SOURCE": ["HB_NORTH", "HB_NORTH", "HB_NORTH"], "SINK": ["HB_HOUSTON", "LZ_WEST", "UNKNOWN"]})
+
+    deltas = mis_sql.sf_deltas(connection, "sspsf", pairs, june, july)
+
+    assert deltas[["SINK", "Constraint_Name", "SF_Delta"]].values.tolist() == [["HB_HOUSTON", "SANDOW", 0.375],
+                                                                               ["LZ_WEST", "CEDAR", -0.25]]
+    assert deltas["Hour_Ending"].tolist() == [14, 14]
+    assert mis_sql.sf_deltas(connection, "sspsf", pairs, july, datetime(2024, 8, 1)).empty
+
+
+def test_average_shadow_prices_count_the_binding_hours(connection):
+    averages = mis_sql.average_shadow_prices(connection, "yes_rt", june, july)
+
+    assert averages[["Constraint_Name", "Contingency_Name", "Max_SP", "Binding_Hours"]].values.tolist() == [
+        ["CEDAR_CREEK", "BASE CASE", 5.0, 1], ["SANDOW_MILAM_1", "DSANMIL5", 30.0, 2]]
+    assert averages["Average_SP"].tolist() == pytest.approx([5.0, 40.0 / 3])
+    assert averages["Date"].tolist() == [pd.Timestamp(june)] * 2
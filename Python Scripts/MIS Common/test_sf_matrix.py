@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from sf_matrix import pivot_shift_factors
+
+"""
+Behaviour tests of the shift-factor matrix and its path deltas. Run with pytest from this folder.
+"""
+
+key_columns = ["SCED_Time_Stamp", "Constraint_Name"]
+
+sf_df = pd.DataFrame({
+    "SCED_Time_Stamp": ["13:10", "13:05", "13:05", "13:05", "13:10", "13:05", None],
+    "Constraint_Name": ["CEDAR", "SANDOW", "SANDOW", "SANDOW", "CEDAR", "SANDOW", "SANDOW"],
+    "Settlement_Point": ["HB_NORTH", "HB_NORTH", "HB_HOUSTON", "LZ_WEST", "LZ_WEST", "HB_NORTH", "HB_NORTH"],
+    "Shift_Factor": [0.5, 0.25, -0.125, 0.75, 0.0, 0.9, 0.3],
+})
+
+
+def test_pivot_sorts_rows_keeps_first_values_and_drops_missing_keys():
+    matrix = pivot_shift_factors(sf_df, key_columns=key_columns)
+
+    assert matrix.keys.values.tolist() == [["13:05", "SANDOW"], ["13:10", "CEDAR"]]
+    assert matrix.nodes == ["HB_NORTH", "HB_HOUSTON", "LZ_WEST"]
+    assert matrix.values.dtype == np.float32
+    np.testing.assert_array_equal(matrix.values, np.array([[0.25, -0.125, 0.75], [0.5, np.nan, 0.0]], dtype="float32"))
+
+
+def test_path_deltas_only_keep_rows_where_both_nodes_are_present():
+    matrix = pivot_shift_factors(sf_df, key_columns=key_columns)
+    paths = pd.DataFrame({"SOURCE": ["HB_NORTH", "HB_HOUSTON", "HB_NORTH", "HB_NORTH"],
+                          "SINK": ["LZ_WEST", "HB_NORTH", "UNKNOWN", "LZ_WEST"]})
+
+    deltas = matrix.path_deltas(paths)
+
+    assert deltas[["SOURCE", "SINK", "SCED_Time_Stamp"]].astype(object).values.tolist() == [
+        ["HB_NORTH", "LZ_WEST", "13:05"], ["HB_HOUSTON", "HB_NORTH", "13:05"], ["HB_NORTH", "LZ_WEST", "13:10"]]
+    assert deltas["SF_Delta"].tolist() == [-0.5, -0.375, 0.5]
+
+
+def test_path_deltas_of_unknown_nodes_are_empty_but_typed():
+    matrix = pivot_shift_factors(sf_df, key_columns=key_columns)
+
+    deltas = matrix.path_deltas([("UNKNOWN", "HB_NORTH")])
+
+    assert deltas.empty
+    assert list(deltas.columns) == ["SOURCE", "SINK"] + key_columns + ["SOURCE_SF", "SINK_SF", "SF_Delta"]
+
+
+def test_long_rows_round_trip_the_present_shift_factors():
+    matrix = pivot_shift_factors(sf_df, nodes=["LZ_WEST", "HB_NORTH"], key_columns=key_columns)
+
+    long = matrix.long_rows()
+
+    assert long[["SCED_Time_Stamp", "Settlement_Point", "Shift_Factor"]].astype(object).values.tolist() == [
+        ["13:05", "LZ_WEST", 0.75], ["13:05", "HB_NORTH", 0.25], ["13:10", "LZ_WEST", 0.0], ["13:10", "HB_NORTH", 0.5]]
+    assert np.isnan(matrix.column("HB_HOUSTON")).all()
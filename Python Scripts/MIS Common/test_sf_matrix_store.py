@@ -0,0 +1,123 @@
+import os
+import time
+import zipfile
+import pytest
+from datetime import datetime
+import mis_parquet
+import sf_matrix_store
+from sf_matrix_store import SFMatrixStore
+
+"""
+Behaviour tests of the monthly HDF5 shift-factor matrices, built from a converted 130_SSPSF file. Run with
+pytest from this folder.
+"""
+
+sspsf_csv = """SCED_Time_Stamp,Repeated_Hour_Flag,Constraint_ID,Constraint_Name,Contingency_Name,Settlement_Point,Shift_Factor
+06/01/2024 13:05:12,N,1,SANDOW,DSANMIL5,HB_NORTH,0.25
+06/01/2024 13:05:12,N,1,SANDOW,DSANMIL5,HB_HOUSTON,-0.125
+06/01/2024 13:05:12,N,2,CEDAR,BASE CASE,HB_NORTH,0.0005
+06/01/2024 13:05:12,N,2,CEDAR,BASE CASE,LZ_WEST,0.5
+"""
+
+dsf_csv = """DeliveryDate,HourEnding,ConstraintID,ConstraintName,ContingencyName,SettlementPoint,ShiftFactor,DSTFlag
+06/01/2024,01:00,1,SANDOW,DSANMIL5,HB_NORTH,0.25,N
+06/01/2024,01:00,1,SANDOW,DSANMIL5,HB_HOUSTON,-0.125,N
+06/01/2024,24:00,2,CEDAR,BASE CASE,HB_NORTH,0.5,N
+"""
+
+june = datetime(2024, 6, 1)
+july = datetime(2024, 7, 1)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    parquet_root = os.path.join(tmp_path, "parquet")
+    monkeypatch.setattr(mis_parquet, "parquet_root", parquet_root)
+    monkeypatch.setattr(sf_matrix_store, "parquet_root", parquet_root)
+
+    folder = os.path.join(tmp_path, "130_SSPSF")
+    os.makedirs(folder)
+    with zipfile.ZipFile(os.path.join(folder, "cdr.00013069.0000000000000000.20240601.130512.SSPSF_csv.zip"), "w") as zip_file:
+        zip_file.writestr("cdr.00013069.0000000000000000.20240601.130512.SSPSF.csv", sspsf_csv)
+    mis_parquet.ingest_folder("130_SSPSF", folder)
+
+    return SFMatrixStore("130_SSPSF", root=os.path.join(tmp_path, "store"))
+
+
+@pytest.fixture
+def dsf_store(tmp_path, monkeypatch):
+    parquet_root = os.path.join(tmp_path, "parquet")
+    monkeypatch.setattr(mis_parquet, "parquet_root", parquet_root)
+    monkeypatch.setattr(sf_matrix_store, "parquet_root", parquet_root)
+
+    folder = os.path.join(tmp_path, "55_DSF")
+    os.makedirs(folder)
+    with zipfile.ZipFile(os.path.join(folder, "cdr.00012345.0000000000000000.20240531.123456.DSF.zip"), "w") as zip_file:
+        zip_file.writestr("cdr.00012345.0000000000000000.20240531.123456.DSF.csv", dsf_csv)
+    mis_parquet.ingest_folder("55_DSF", folder)
+
+    return SFMatrixStore("55_DSF", root=os.path.join(tmp_path, "store"))
+
+
+def test_a_built_month_reads_back_the_shift_factors(store):
+    assert not store.is_current(june, july)
+    assert store.build(june, july) == [june]
+    assert store.is_current(june, july)
+
+    deltas = store.delta("HB_NORTH", "HB_HOUSTON", june, july)
+
+    assert deltas["SCED_Time_Stamp"].tolist() == [datetime(2024, 6, 1, 13, 5, 12)]
+    assert deltas["Hour_Ending"].tolist() == [14]
+    assert deltas["Constraint_Name"].tolist() == ["SANDOW"]
+    assert deltas["SF_Delta"].tolist() == [0.375]
+
+    # Shift factors at or below min_shift_factor are not stored.
+    long = store.matrix(june, july, ["HB_NORTH", "LZ_WEST"]).long_rows()
+    assert long[["Constraint_Name", "Settlement_Point", "Shift_Factor"]].astype(object).values.tolist() == [
+        ["CEDAR", "LZ_WEST", 0.5], ["SANDOW", "HB_NORTH", 0.25]]
+
+
+def test_reads_outside_the_built_months_are_empty(store):
+    store.build(june, july)
+
+    assert store.delta("HB_NORTH", "HB_HOUSTON", datetime(2024, 6, 2), july).empty
+    assert len(store.matrix(july, datetime(2024, 8, 1), ["HB_NORTH"])) == 0
+    assert not store.is_current(june, datetime(2024, 8, 1))
+
+
+def test_refresh_only_rebuilds_built_months_whose_partition_changed(store):
+    assert store.refresh(june, july) == []
+    assert not store.has_range(june, july)
+
+    store.build(june, july)
+    assert store.refresh(june, july) == []
+
+    # The month was built before its partition last changed.
+    earlier = time.time() - 60
+    os.utime(store.month_path(june), (earlier, earlier))
+
+    assert store.has_range(june, july)
+    assert not store.is_current(june, july)
+    assert store.refresh(june, july) == [june]
+    assert store.is_current(june, july)
+
+
+def test_a_dsf_month_reads_back_every_hour(dsf_store):
+    assert dsf_store.build(june, july) == [june]
+    assert dsf_store.is_current(june, july)
+
+    long = dsf_store.matrix(june, july, ["HB_NORTH", "HB_HOUSTON"]).long_rows("SettlementPoint", "ShiftFactor")
+
+    assert long[["HourEnding", "ConstraintName", "SettlementPoint", "ShiftFactor"]].astype(object).values.tolist() == [
+        [1, "SANDOW", "HB_NORTH", 0.25], [1, "SANDOW", "HB_HOUSTON", -0.125], [24, "CEDAR", "HB_NORTH", 0.5]]
+
+
+def test_a_month_read_empty_from_a_non_empty_partition_is_never_current(dsf_store, monkeypatch):
+    dsf_store.build(june, july)
+
+    # A reader that finds no rows, as when the DSF hour endings did not parse.
+    monkeypatch.setattr(sf_matrix_store, "read_dataset", lambda *args, **kwargs: mis_parquet.read_dataset(*args, **kwargs).iloc[:0])
+
+    assert dsf_store.build(june, july, rebuild=True) == [june]
+    assert not dsf_store.has_range(june, july)
+    assert not dsf_store.is_current(june, july)
@@ -0,0 +1,176 @@
+import os
+import requests
+import pandas as pd
+from io import StringIO
+from datetime import date, timedelta
+from typing import List, Tuple
+
+"""
+Day-partitioned local cache of the Yes Energy hourly constraint tables.
+
+The aggregators used to pull https://services.yesenergy.com/PS/rest/constraint/hourly/{RT|DA}/ERCOT as an
+HTML table, parse it with pd.read_html (one of the slowest pandas readers) and keep it, at best, in one
+JSON file per year, so any gap meant fetching the whole year again. YesConstraintCache keeps one typed
+Parquet file per market and day:
+
+    {yes_cache_root}/{market}/year=YYYY/YYYY-MM-DD.parquet
+
+and only requests the days it does not have, as CSV, in as few contiguous requests as possible. Days
+within refresh_days of today are requested again on every run, since Yes Energy keeps filling them in.
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+    from yes_constraint_cache import YesConstraintCache
+
+    yes_cache = YesConstraintCache("RT", auth)
+    yes_df = yes_cache.table(date(2024, 1, 1), date(2024, 12, 31), columns=["REPORTED_NAME", "DATETIME", "HOURENDING", "CONTINGENCY"])
+"""
+
+# Global Variables and Parameters
+yes_cache_root = os.environ.get("MIS_YES_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "yes_cache"))
+
+# Hourly constraint table of each market, requested as CSV.
+yes_urls = {
+    "RT": "https://services.yesenergy.com/PS/rest/constraint/hourly/RT/ERCOT.csv?",
+    "DA": "https://services.yesenergy.com/PS/rest/constraint/hourly/DA/ERCOT.csv?",
+}
+
+# Format of the startdate and enddate request parameters, and of the day in the partition file names.
+request_format = "%m/%d/%Y"
+day_format = "%Y-%m-%d"
+
+# The most days requested at once. Longer ranges are split, like the aggregators did before.
+max_request_days = 250
+
+# Types of the known columns. DATETIME is parsed separately; unknown columns are kept as read.
+yes_dtypes = {"REPORTED_NAME": "category", "CONTINGENCY": "category", "FACILITYTYPE": "category",
+              "PEAKTYPE": "category", "HOURENDING": "Int8", "SHADOWPRICE": "float64"}
+
+
+def day_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def contiguous_runs(days: List[date], max_days: int = max_request_days) -> List[Tuple[date, date]]:
+    """
+    Groups sorted days into [first, last] runs of consecutive days, at most max_days long.
+    """
+    runs = []
+    for day in days:
+        if len(runs) > 0 and day == runs[-1][1] + timedelta(days=1) and (day - runs[-1][0]).days < max_days:
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+
+    return runs
+
+
+def type_columns(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Casts the known columns of a Yes Energy constraint table to their types.
+    """
+    if "DATETIME" in table.columns:
+        table["DATETIME"] = pd.to_datetime(table["DATETIME"], errors="coerce")
+
+    for column, dtype in yes_dtypes.items():
+        if column in table.columns:
+            table[column] = pd.to_numeric(table[column], errors="coerce").astype(dtype) if dtype != "category" else table[column].astype(dtype)
+
+    return table
+
+
+class YesConstraintCache:
+    """
+    Reader of the Yes Energy hourly constraint table of one market, backed by a local day-partitioned cache.
+
+    Inputs:
+        - market: 'RT' or 'DA'.
+        - auth: The Yes Energy (user, password) credentials.
+        - root: The folder holding the cache of every market.
+        - refresh_days: Days within this many days of today are requested again on every run.
+    """
+
+    def __init__(self, market: str, auth: Tuple[str, str], root: str = yes_cache_root, refresh_days: int = 2):
+        self.market = market
+        self.url = yes_urls[market]
+        self.auth = auth
+        self.folder = os.path.join(root, market)
+        self.refresh_days = refresh_days
+        self.session = requests.Session()
+
+    def day_path(self, day: date) -> str:
+        return os.path.join(self.folder, f"year={day.year}", f"{day.strftime(day_format)}.parquet")
+
+    def missing_days(self, start: date, end: date) -> List[date]:
+        """
+        The days within [start, end] that are not cached or are recent enough to be refreshed.
+        """
+        refresh_from = date.today() - timedelta(days=self.refresh_days)
+        return [day for day in day_range(start, end) if day >= refresh_from or not os.path.isfile(self.day_path(day))]
+
+    def fetch(self, start: date, end: date) -> bool:
+        """
+        Requests [start, end] as CSV and caches it day by day. Days without rows are cached empty, so
+        they are not requested again.
+
+        Output:
+            - True if the request succeeded.
+        """
+        req_url = f"{self.url}startdate={start.strftime(request_format)}&enddate={end.strftime(request_format)}"
+        yes_req = self.session.get(req_url, auth=self.auth)
+        print(req_url)
+
+        if not yes_req.ok:
+            print(f"Failed to retrieve data for {start.strftime(request_format)} to {end.strftime(request_format)}")
+            return False
+
+        if "No data" in yes_req.text[:100] or yes_req.text.strip() == "":
+            table = pd.DataFrame()
+        else:
+            table = type_columns(pd.read_csv(StringIO(yes_req.text)))
+
+        days = table["DATETIME"].dt.normalize() if "DATETIME" in table.columns else pd.Series([], dtype="datetime64[ns]")
+
+        for day in day_range(start, end):
+            part = table[(days == pd.Timestamp(day)).to_numpy()] if len(table) > 0 else table
+            path = self.day_path(day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # Write next to the partition first, so readers never see half a day.
+            part.reset_index(drop=True).to_parquet(path + ".tmp", engine="pyarrow", index=False)
+            os.replace(path + ".tmp", path)
+
+        return True
+
+    def table(self, start: date, end: date, columns: List[str] = None) -> pd.DataFrame:
+        """
+        The Yes Energy constraint table for every day within [start, end], requesting the missing days first.
+
+        Inputs:
+            - start, end: The inclusive range of days.
+            - columns: Only read these columns, or all if None.
+
+        Output:
+            - The rows of every cached day of the range, oldest day first, with the known columns typed.
+        """
+        for run_start, run_end in contiguous_runs(self.missing_days(start, end)):
+            self.fetch(run_start, run_end)
+
+        parts = []
+        for day in day_range(start, end):
+            if os.path.isfile(self.day_path(day)):
+                part = pd.read_parquet(self.day_path(day), engine="pyarrow")
+                if len(part) > 0:
+                    parts.append(part if columns is None else part[columns])
+
+        if len(parts) == 0:
+            return pd.DataFrame(columns=columns)
+
+        # Categories differ between days, so combine them as strings and type the result again.
+        table = pd.concat([part.astype({column: object for column in part.select_dtypes("category").columns}) for part in parts],
+                          ignore_index=True)
+
+        for column, dtype in yes_dtypes.items():
+            if column in table.columns and dtype == "category":
+                table[column] = table[column].astype(dtype)
+
+        return table
@@ -0,0 +1,256 @@
+import os
+import sys
+import queue
+import zipfile
+import multiprocessing
+from collections import deque
+from itertools import islice
+import pandas as pd
+import pyarrow as pa
+from datetime import timedelta
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Tuple
+
+"""
+Process-pool reader for folders of MIS CSV ZIP files, i.e. a year of 130_SSPSF shift factors.
+
+SCED_Delta_New.py read its ZIP files on a thread pool and RT_Constraint_Aggregator.py read them one by one,
+but pd.read_csv holds the GIL for most of its work, so neither used more than about one core. read_zip_files
+spreads the files over a pool of worker processes. Every worker reads only the columns a script needs,
+applies its filters, and writes the surviving rows of a whole task (files_per_task files) as one Arrow
+stream into a shared memory block. The parent only receives the block's name over the pool's pipe, copies
+the stream out of shared memory and tells the worker to release the block.
+
+A spec describes what a worker keeps from every file:
+    - member: Only CSV members containing this are read.
+    - columns: The columns to read, or None for all.
+    - dtypes: The types to read the columns as, i.e. 'category' for repeated names.
+    - filters: (column, op, value) tuples that rows must all pass. op is 'in', '>' or 'abs>'.
+    - stamp_column, time_format: The first remaining timestamp of every file is parsed with time_format into
+      a File_Stamp column (see hour_ending). Optional.
+    - parse_times: Whether to also parse the whole stamp_column into datetimes.
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+    from zip_pool import read_zip_files
+
+    for df in read_zip_files(zip_paths, spec):
+        ...
+
+The aggregators run their work at module level, without an if __name__ == "__main__" guard, so the workers
+are started without re-running the calling script (see detached_main).
+"""
+
+# Global Variables and Parameters
+default_workers = max(1, (os.cpu_count() or 2) - 1)
+
+# Shared memory blocks a worker created and the parent has not released yet, by name.
+held_blocks: Dict[str, shared_memory.SharedMemory] = {}
+
+# The index of this worker and the queue of the names the parent has copied out, set by init_worker.
+worker_index = None
+released_blocks = None
+
+
+def hour_ending(stamps: pd.Series) -> pd.Series:
+    """
+    The hour ending (1 to 24) of the hour after each timestamp, the way the aggregators compute it
+    from the first timestamp of a file.
+    """
+    hours = (stamps + timedelta(hours=1)).dt.hour
+    return hours.where(hours != 0, 24).astype("int8")
+
+
+def filter_rows(df: pd.DataFrame, filters: List[Tuple]) -> pd.DataFrame:
+    for column, op, value in filters:
+        if op == "in":
+            df = df[df[column].isin(value)]
+        elif op == ">":
+            df = df[df[column] > value]
+        elif op == "abs>":
+            df = df[df[column].abs() > value]
+        else:
+            raise ValueError(f"Unknown filter operation {op}")
+
+    return df
+
+
+def read_zip(zip_path: str, spec: Dict) -> pd.DataFrame:
+    """
+    Reads the matching CSV members of one ZIP file, keeping only the spec's columns and rows.
+    """
+    merge = []
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for member in zip_ref.namelist():
+            if spec.get("member", ".csv") in member and member.endswith(".csv"):
+                with zip_ref.open(member) as csv:
+                    df = pd.read_csv(csv, usecols=spec.get("columns"), dtype=spec.get("dtypes"))
+
+                merge.append(filter_rows(df, spec.get("filters", [])))
+
+    df = pd.concat(merge, ignore_index=True) if len(merge) > 0 else pd.DataFrame()
+    stamp_column = spec.get("stamp_column")
+
+    if stamp_column is not None and len(df) > 0:
+        if spec.get("parse_times", False):
+            df[stamp_column] = pd.to_datetime(df[stamp_column], format=spec["time_format"])
+            df["File_Stamp"] = df[stamp_column].iloc[0]
+        else:
+            df["File_Stamp"] = pd.to_datetime(df[stamp_column].iloc[0], format=spec["time_format"])
+
+    return df
+
+
+def init_worker(release_queues: List, counter):
+    """
+    Gives every worker its own index and release queue, since a block can only be closed by the
+    worker holding it.
+    """
+    global worker_index, released_blocks
+    with counter.get_lock():
+        worker_index = counter.value
+        counter.value += 1
+
+    released_blocks = release_queues[worker_index]
+
+
+def release_blocks():
+    """
+    Closes the blocks of this worker that the parent has copied out.
+    """
+    while True:
+        try:
+            name = released_blocks.get_nowait()
+        except queue.Empty:
+            return
+
+        block = held_blocks.pop(name, None)
+        if block is not None:
+            try:
+                block.close()
+            except BufferError:
+                # Still exported to Arrow; the handle is closed when the worker exits.
+                pass
+
+
+def read_task(zip_paths: List[str], spec: Dict):
+    """
+    Reads one task's ZIP files inside a worker and writes the kept rows into a new shared memory block.
+
+    Output:
+        - (block name, stream size, worker index), or None if no row was kept.
+    """
+    release_blocks()
+
+    merge = []
+    for zip_path in zip_paths:
+        try:
+            df = read_zip(zip_path, spec)
+        except Exception as exc:
+            print(f"{zip_path} generated an exception: {exc}")
+            continue
+
+        if len(df) > 0:
+            merge.append(df)
+
+    if len(merge) == 0:
+        return None
+
+    table = pa.Table.from_pandas(pd.concat(merge, ignore_index=True), preserve_index=False)
+
+    # Size the block exactly, then write the stream straight into it.
+    mock = pa.MockOutputStream()
+    with pa.ipc.new_stream(mock, table.schema) as writer:
+        writer.write_table(table)
+    size = mock.size()
+
+    block = shared_memory.SharedMemory(create=True, size=size)
+    target = pa.py_buffer(block.buf)
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(target), table.schema) as writer:
+        writer.write_table(table)
+    del target, writer
+
+    # Windows frees a block with its last handle, so keep it open until the parent has copied it.
+    held_blocks[block.name] = block
+    return block.name, size, worker_index
+
+
+def load_block(name: str, size: int) -> pd.DataFrame:
+    """
+    Copies a worker's Arrow stream out of shared memory into a DataFrame and unlinks the block.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        data = bytes(block.buf[:size])
+    finally:
+        block.close()
+        block.unlink()
+
+    with pa.ipc.open_stream(pa.py_buffer(data)) as reader:
+        return reader.read_all().to_pandas()
+
+
+@contextmanager
+def detached_main():
+    """
+    Hides the calling script from multiprocessing while the workers start. Spawned workers otherwise
+    re-run the __main__ script to find its functions, which for the aggregators means re-running them.
+    The workers only need this module.
+    """
+    main = sys.modules["__main__"]
+    saved = {name: main.__dict__[name] for name in ("__file__", "__spec__") if name in main.__dict__}
+
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+def read_zip_files(zip_paths: List[str], spec: Dict, max_workers: int = default_workers,
+                   files_per_task: int = 32) -> Iterator[pd.DataFrame]:
+    """
+    Reads ZIP files on a process pool, yielding the kept rows of every task in the order of zip_paths.
+    At most two tasks per worker are in flight, so the workers never run far ahead of the caller.
+
+    Inputs:
+        - zip_paths: The full paths of the ZIP files.
+        - spec: What to keep from every file (see the module docstring).
+        - max_workers: The number of worker processes.
+        - files_per_task: How many ZIP files each task reads. Larger tasks send fewer, larger blocks.
+
+    Output:
+        - One DataFrame per task that kept any row. A file that fails to read is reported and skipped.
+    """
+    tasks = [zip_paths[start:start + files_per_task] for start in range(0, len(zip_paths), files_per_task)]
+    if len(tasks) == 0:
+        return
+
+    workers = min(max_workers, len(tasks))
+    context = multiprocessing.get_context("spawn")
+    release_queues = [context.Queue() for _ in range(workers)]
+
+    with detached_main():
+        pool = context.Pool(workers, initializer=init_worker, initargs=(release_queues, context.Value("i", 0)))
+
+    try:
+        remaining = iter(tasks)
+        pending = deque(pool.apply_async(read_task, (task, spec)) for task in islice(remaining, 2 * workers))
+
+        while len(pending) > 0:
+            result = pending.popleft().get()
+
+            for task in islice(remaining, 1):
+                pending.append(pool.apply_async(read_task, (task, spec)))
+
+            if result is not None:
+                name, size, index = result
+                df = load_block(name, size)
+                release_queues[index].put(name)
+                yield df
+
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from Mock_ERCOT_API import MockSettings, start_server
+
+"""
+Throughput benchmark for the MIS Scheduled Downloader, runnable on any machine without access to
+the ERCOT API.
+
+The benchmark starts Mock_ERCOT_API.py on a free local port and runs each download mode against it
+in a fresh child process, so every mode starts from an empty destination folder, manifest and window
+history, and its peak RSS is measured on its own. The children import MIS_Download_Scheduler.py and
+mis_async.py unchanged; the ERCOT_API_URL, MIS_DESTINATION, MIS_REQUEST_SUMMARY, MIS_MANIFEST,
+MIS_WINDOW_HISTORY and MIS_TELEMETRY environment variables redirect them to the stand-in and a
+temporary folder.
+
+The synthetic mapping has --folders folders, the first --heavy of which are --heavy-factor times
+larger, like 34_TC, 83_CTOR and 130_SSPSF. Set --oom-hours below 24 to exercise the OOM splitting.
+
+For each mode the benchmark reports:
+    - files/s: Extracted files per second of makespan.
+    - MB/s: Extracted megabytes per second of makespan.
+    - Peak RSS: The maximum resident set size of the child process.
+    - Makespan: Wall-clock seconds from the first request to the last extracted file.
+
+Usage:
+    python Downloader_Benchmark.py --modes threaded async --folders 20 --file-kb 64 --oom-hours 12 --json results.json
+"""
+
+# Global Variables and Parameters
+script_folder = os.path.dirname(os.path.abspath(__file__))
+
+# Report IDs of the synthetic folders start here.
+first_report_id = 90000
+
+
+def synthetic_mapping(folders: int) -> dict:
+    """
+    Builds a folder mapping in the same {folder: (reportID, Type)} form as the Excel sheet.
+    """
+    return {f"{index:03d}_BENCH": (str(first_report_id + index), "csv") for index in range(folders)}
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of the current process in MB. The resource module only exists on
+    Unix, which is where the benchmark is meant to run.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def folder_totals(folder: str):
+    """
+    Returns the number of files and total bytes below a folder.
+    """
+    files, size = 0, 0
+    for root, _, names in os.walk(folder):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+
+    return files, size
+
+
+def run_child(mode: str, folders: int, workers: int):
+    """
+    Runs one download mode inside this (child) process and prints its measurements as JSON.
+    The environment variables are set by run_mode before the process starts.
+    """
+    sys.path.append(script_folder)
+    import MIS_Download_Scheduler as scheduler
+
+    mapping = synthetic_mapping(folders)
+    destination = os.environ["MIS_DESTINATION"]
+
+    for folder in mapping:
+        os.makedirs(f"{destination}{folder}", exist_ok=True)
+
+    scheduler.open_summary(scheduler.request_summary_path)
+    start = time.time()
+
+    if mode == "async":
+        downloader = scheduler.AsyncDownloader(mapping, destination, scheduler.invalid_rid, scheduler.planner,
+                                               scheduler.manifest, scheduler.days_back, workers, telemetry=scheduler.telemetry)
+        downloader.run([(folder, scheduler.yesterday, "06", scheduler.today, "06") for folder in mapping])
+
+    else:
+        downloader = scheduler.folder_downloader
+        downloader.jobs = scheduler.JobQueue(workers)
+        for folder in mapping:
+            downloader.jobs.submit(0, downloader.download_folder, mapping, folder, scheduler.yesterday, "06", scheduler.today, "06")
+
+        downloader.run()
+
+    makespan = time.time() - start
+    scheduler.invalid_rid.flush()
+    files, size = folder_totals(destination)
+
+    print(json.dumps({"mode": mode, "files": files, "bytes": size, "makespan": makespan, "peak_rss_mb": peak_rss_mb()}))
+
+
+def run_mode(mode: str, url: str, args) -> dict:
+    """
+    Runs one download mode in a child process pointed at the stand-in and returns its results.
+    """
+    with tempfile.TemporaryDirectory() as work:
+        env = dict(os.environ)
+        env.update({
+            "ERCOT_API_URL": url,
+            "MIS_DESTINATION": os.path.join(work, "MIS") + os.sep,
+            "MIS_REQUEST_SUMMARY": os.path.join(work, "request_summary.txt"),
+            "MIS_MANIFEST": os.path.join(work, "download_manifest.db"),
+            "MIS_WINDOW_HISTORY": os.path.join(work, "window_history.json"),
+            "MIS_TELEMETRY": os.path.join(work, "download_telemetry.db"),
+        })
+
+        command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--folders", str(args.folders), "--workers", str(args.workers)]
+        child = subprocess.run(command, env=env, cwd=script_folder, capture_output=True, text=True)
+
+    if child.returncode != 0:
+        sys.stderr.write(child.stdout + child.stderr)
+        raise RuntimeError(f"The {mode} benchmark exited with code {child.returncode}.")
+
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result["files_per_second"] = result["files"] / result["makespan"]
+    result["mb_per_second"] = result["bytes"] / (1 << 20) / result["makespan"]
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the MIS downloader against the offline ERCOT API stand-in.")
+    parser.add_argument("--modes", nargs="+", default=["threaded", "async"], choices=["threaded", "async"])
+    parser.add_argument("--folders", type=int, default=20, help="Number of synthetic folders.")
+    parser.add_argument("--workers", type=int, default=5, help="Worker threads (threaded) or concurrent requests (async).")
+    parser.add_argument("--file-kb", type=int, default=64, help="Size of each inner CSV in KB.")
+    parser.add_argument("--files-per-hour", type=int, default=12)
+    parser.add_argument("--heavy", type=int, default=3, help="Number of folders with a larger payload.")
+    parser.add_argument("--heavy-factor", type=int, default=8)
+    parser.add_argument("--oom-hours", type=int, default=24, help="Windows longer than this are answered with a 500.")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    parser.add_argument("--json", help="Also write the results to this file, e.g. for CI.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.folders, args.workers)
+        sys.exit(0)
+
+    heavy = {report_id for report_id, _ in list(synthetic_mapping(args.folders).values())[:args.heavy]}
+    settings = MockSettings(args.file_kb, args.files_per_hour, args.oom_hours, args.error_rate, args.latency_ms, heavy, args.heavy_factor)
+    server = start_server(settings)
+    url = f"http://127.0.0.1:{server.server_address[1]}/reports"
+
+    results = []
+    for mode in args.modes:
+        before = settings.requests
+        result = run_mode(mode, url, args)
+        result["requests"] = settings.requests - before
+        results.append(result)
+
+        print(f"{mode:>8}: {result['files']} files, {result['bytes'] / (1 << 20):.1f} MB in {result['makespan']:.2f} s "
+              f"({result['files_per_second']:.1f} files/s, {result['mb_per_second']:.1f} MB/s), "
+              f"peak RSS {result['peak_rss_mb']:.1f} MB, {result['requests']} requests")
+
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"settings": vars(args), "results": results}, json_file, indent=4)
@@ -1,12 +1,14 @@
 from datetime import date, datetime, timedelta
 import os
 import pandas as pd
-import requests
 import re
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import smtplib
 import warnings
+from download_manifest import DownloadManifest, hours_between, time_format
+from report_probe import probe_all
+from report_catalog import ReportCatalog
 
 # Ignore warnings
 warnings.simplefilter("ignore")
@@ -22,29 +24,33 @@ days_back = 1
 chunk_size = 6
 
 log_file = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Python Scripts/MIS Scheduled Downloader/request_summary.txt"
-freqs = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Python Scripts/MIS Scheduled Downloader/frequencies.txt"
 offset = 0
 yesterday = (date.today() - timedelta(days=days_back+offset)).strftime('%Y-%m-%d')
 today = (date.today() - timedelta(days=offset)).strftime('%Y-%m-%d')
 
 # Reference Excel Sheet for all the web data and requirements
 excel_path = "\\\\Pzpwuplancli01\\APP-DATA\\Task Scheduler\\MIS_Download_210125a_v3_via_API.xlsm"
-df_excel = pd.read_excel(excel_path, sheet_name="List of Webpage", usecols=['Folder Name', 'Type Id', 'New Table Name'])
-full_mapping = dict(zip(df_excel['Folder Name'], zip(df_excel['Type Id'], df_excel['New Table Name'])))
 
-# Read from the invalid requests error log
-with open(log_file, "r") as log:
-    rows = log.read().split("\n")
-
-with open(freqs, "r") as f:
-    frequencies = f.read().split("\n")
+# Descriptions and expected frequencies come from the cached report catalog (see report_catalog.py).
+catalog = ReportCatalog(excel_path)
+descriptions_by_folder = catalog.descriptions()
 
 hour = "06"
-intended_chunks = days_back * 24 / chunk_size
 
-# Build the result table by parsing the request summary text file
+# Build the result table by querying the download manifest for the latest nightly run
+manifest = DownloadManifest()
+last_run = manifest.last_run()
+
+# Without a recorded nightly run (first deployment, or only -r/-p runs so far), check the range the nightly run requests.
+if last_run is None:
+    run_lower = datetime.strptime(f"{yesterday}T{hour}:00:00", time_format)
+    run_upper = datetime.strptime(f"{today}T{hour}:00:00", time_format)
+    runtime = "an unknown number of"
+else:
+    run_lower, run_upper, runtime = last_run
+
+intended_hours = hours_between(run_lower, run_upper)
 result_df = pd.DataFrame()
-runtime = 0.0
 
 folders = []
 reportIDs = []
@@ -53,29 +59,18 @@ codes = []
 handled_500 = {}
 successes = 0
 
-for row in rows:
-    row_data = row.split(" ")
-    if not "to" in row and row != "":
-        folders.append(row_data[1])
-        reportIDs.append(row_data[0])
-        codes.append(row_data[2])
+for folder_name, report_id, code, covered_hours in manifest.folder_summary(run_lower, run_upper):
+    folders.append(folder_name)
+    reportIDs.append(report_id)
+    codes.append(code)
+    descriptions.append(descriptions_by_folder.get(folder_name))
 
-        if row_data[2] == "200":
-            successes += 1
+    if code == "200":
+        successes += 1
 
-        descriptions.append(full_mapping[row_data[1]][1])
-    
-    if "seconds" in row:
-        for i in range(len(row_data)):
-            if row_data[i] == "seconds":
-                runtime = float(row_data[i-1])
-    
-    if "Folder" in row_data:
-        f_name = row_data[1]
-        if f_name not in handled_500:
-            handled_500[f_name] = 1
-        else:
-            handled_500[f_name] += 1
+    # OOM windows are split adaptively, so track how many hours the successful windows covered.
+    if code == "500":
+        handled_500[folder_name] = covered_hours
 
 result_df['Folder Name'] = folders
 result_df['Report ID'] = reportIDs
@@ -86,7 +81,7 @@ result_df = result_df.drop_duplicates(subset=['Folder Name'])
 result_df['sort_key'] = result_df[result_df.columns[0]].str.split('_', expand=True)[0].astype(int)
 result_df = result_df.sort_values(by='sort_key')
 result_df = result_df.drop(columns='sort_key')
-result_df['Expected Frequency'] = frequencies
+result_df['Expected Frequency'] = result_df['Folder Name'].map(catalog.frequency)
 
 status_count = {}
 for _, row in result_df.iterrows():
@@ -96,17 +91,37 @@ for _, row in result_df.iterrows():
         status_count[row['Status Code']] += 1
 
 caught_404 = []
-folders_502 = []
-# Do the Double-Checking.
-for _, row in result_df.iterrows():
-    if row['Status Code'] == "404":
-        req_url = f"https://ercotapi.app.calpine.com/reports?reportId={row['Report ID']}&marketParticipantId=CRRAH&startTime={yesterday}T{hour}:00:00&endTime={today}T{hour}:00:00&unzipFiles=false"
-        response = requests.get(req_url, verify=False)
-        if response.status_code == 200:
-            caught_404.append(row['Folder Name'])
-    
-    if row['Status Code'] == "502":
-        folders_502.append(row['Folder Name'])
+folders_502 = list(result_df.loc[result_df['Status Code'] == "502", 'Folder Name'])
+
+# Do the Double-Checking. Every 404 folder and every window still missing from an incompletely handled
+# 500 folder is probed concurrently, reading only the status line of each response.
+probe_urls = {}
+for _, row in result_df[result_df['Status Code'] == "404"].iterrows():
+    req_url = f"https://ercotapi.app.calpine.com/reports?reportId={row['Report ID']}&marketParticipantId=CRRAH&startTime={yesterday}T{hour}:00:00&endTime={today}T{hour}:00:00&unzipFiles=false"
+    probe_urls[req_url] = ("404", row['Folder Name'])
+
+for folder_name in handled_500:
+    if handled_500[folder_name] < intended_hours:
+        report_id = result_df.loc[result_df['Folder Name'] == folder_name, 'Report ID'].iloc[0]
+        for lower, upper in manifest.missing_windows(folder_name, run_lower, run_upper):
+            req_url = f"https://ercotapi.app.calpine.com/reports?reportId={report_id}&marketParticipantId=CRRAH&startTime={lower.strftime(time_format)}&endTime={upper.strftime(time_format)}&unzipFiles=false"
+            probe_urls[req_url] = ("500", folder_name)
+
+manifest.close()
+
+# Missing windows of 500 folders, split by whether they now respond with a 200.
+available_500 = {}
+unavailable_500 = {}
+
+for req_url, status_code in probe_all(list(probe_urls.keys())).items():
+    original_code, folder_name = probe_urls[req_url]
+
+    if original_code == "404" and status_code == 200:
+        caught_404.append(folder_name)
+
+    elif original_code == "500":
+        target = available_500 if status_code == 200 else unavailable_500
+        target[folder_name] = target.get(folder_name, 0) + 1
 
 missing_folder_strings = []
 html_result = "<ul>\n"
@@ -123,11 +138,12 @@ for folder_name in caught_404:
         html_result += f"<li><strong>{folder_name} was found to have uncaught data. Please add it manually.</strong></li>\n"
 
 for folder_name in handled_500:
-    if handled_500[folder_name] >= intended_chunks * 3 // 4 or (folder_name == "51_4DASECR" and handled_500[folder_name] == 2):
+    if handled_500[folder_name] >= intended_hours * 3 // 4 or (folder_name == "51_4DASECR" and handled_500[folder_name] == 2 * chunk_size):
         html_result += f"<li>{folder_name} had an OutOfMemory Exception that was handled successfully.</li>\n"
     else:
         missing_folders.append(folder_name)
-        missing_folder_strings.append(f"<li><strong>{folder_name} had an OutOfMemory Exception that was NOT handled successfully. {int(intended_chunks)} of {chunk_size}-hour data chunks were expected and only {handled_500[folder_name]} were found.</strong></li>\n")
+        missing_folder_strings.append(f"<li><strong>{folder_name} had an OutOfMemory Exception that was NOT handled successfully. {intended_hours} hours of data were expected and only {handled_500[folder_name]} were found. "
+                                      f"Of the missing windows, {available_500.get(folder_name, 0)} now respond successfully and {unavailable_500.get(folder_name, 0)} still fail.</strong></li>\n")
 
 html_result += "".join(missing_folder_strings)
 html_result += "</ul>"
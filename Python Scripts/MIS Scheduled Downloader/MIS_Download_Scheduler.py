@@ -1,14 +1,19 @@
-import requests
 import warnings
-import concurrent.futures
 import time
 import sys
-import zipfile
 import os
-from typing import Dict, Tuple
-import pandas as pd
-from io import BytesIO
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from typing import Dict, TextIO, Tuple
 from datetime import date, datetime, timedelta
+from mis_async import AsyncDownloader
+from folder_downloader import FolderDownloader
+from window_planner import WindowPlanner, to_datetime, to_strings
+from download_manifest import DownloadManifest, hours_between
+from job_scheduler import JobQueue, lpt_order, plan_makespan
+from extract_pipeline import ExtractionPipeline
+from report_catalog import ReportCatalog
+from download_telemetry import TelemetryStore
+from ercot_client import ErcotClient
 
 """
 This script aims to automate the MIS downloading process via the ERCOT API.
@@ -16,6 +21,26 @@ This script aims to automate the MIS downloading process via the ERCOT API.
 Currently, the process is sped up through futures and thread-lock synchronization. Running
 the script will extract all new files for the current day into the targeted directory
 in about nine minutes on a 4-core CPU.
+
+Passing -a switches to the asynchronous mode in mis_async.py, which streams each report body
+to a temporary file instead of holding it in memory and shares one keep-alive session across
+all requests. The number of concurrent requests in that mode is set with -n (default 8).
+
+Folders are scheduled longest-processing-time-first using their average cost in recent runs (see
+job_scheduler.py), and OOM sub-windows go back onto the same work queue so idle workers pick them up.
+Passing --plan prints the predicted schedule and makespan without downloading anything.
+
+Downloaded bodies are handed to a bounded extraction pipeline (see extract_pipeline.py), so slow
+writes to the share never hold a network slot, and members identical to the files already on disk
+are not rewritten.
+
+Passing -p <folder-names> runs a polling daemon instead of the nightly download. Every poll_interval
+minutes (or -i <minutes>) it requests the hours since each folder's high-water mark, so requests for
+the SCED-level reports stay small and rarely hit the OutOfMemory 500s of the 24-hour window.
+
+Passing --parquet converts the downloaded folders listed in mis_parquet.parquet_datasets (130_SSPSF,
+55_DSF, 56_DPNOMASF) into partitioned Parquet once the download is done, so the aggregators can read
+typed columns instead of unzipping and parsing the CSVs again. It needs pyarrow.
 """
 # Ignore warnings. Whatever.
 warnings.simplefilter("ignore")
@@ -26,20 +51,40 @@ start_time = time.time()
 # Maximum number of concurrent operations.
 max_workers = 5
 
+# Extractor threads writing to the share, and downloaded bodies allowed to wait for them.
+extract_workers = 3
+extract_queue_size = 6
+
+# Maximum number of concurrent requests in asynchronous (-a) mode.
+async_concurrency = 8
+
 # How many days we look back for data collection.
 days_back = 1
 
-# How many hours to look back for OOM Exception Handling.
+# Default window size, in hours, for manual re-downloads with -r.
 chunk_size = 6
 
+# Reports without a learned window whose typical nightly payload is larger than this many bytes
+# start with proportionally smaller windows instead of a full-range request.
+max_request_bytes = 512 * 1024 * 1024
+
+# Polling (-p) mode: minutes between polls, how many hours behind real time each polled window ends,
+# how many hours the first poll of a folder reaches back, and how long a missing hour is retried.
+poll_interval = 15
+poll_lag_hours = 1
+poll_initial_hours = 6
+poll_retry_hours = 6
+
 # Yesterday and today's date
 offset = 1
 yesterday = (date.today() - timedelta(days=offset+days_back)).strftime('%Y-%m-%d')
 today = (date.today() - timedelta(days=offset)).strftime('%Y-%m-%d')
 
+# The environment variables below, and ERCOT_API_URL in ercot_client.py, point the downloader at the
+# offline stand-in used by Downloader_Benchmark.py and are never set in production.
 # Current storage for downloaded files
 current_year = date.today().year
-destination_folder = f"\\\\Pzpwuplancli01\\Uplan\\ERCOT\\MIS {current_year}\\"
+destination_folder = os.environ.get("MIS_DESTINATION", f"\\\\Pzpwuplancli01\\Uplan\\ERCOT\\MIS {current_year}\\")
 
 # Should only happen on the new year
 if not os.path.exists(destination_folder):
@@ -48,151 +93,139 @@ if not os.path.exists(destination_folder):
 # Folder to use for testing
 # destination_folder = "\\\\pzpwcmfs01\\CA\\11_Transmission Analysis\\ERCOT\\101 - Misc\\CRR Limit Aggregates\\Data\\MIS Scheduled Downloads\\"
 
-# Text file for invalid request numbers
-invalid_rid = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Python Scripts/MIS Scheduled Downloader/request_summary.txt"
+# Text file for invalid request numbers, read by Error_Checker.py. Polls write their own, next to it, so
+# they never overwrite the nightly run's.
+request_summary_path = os.environ.get("MIS_REQUEST_SUMMARY", "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Python Scripts/MIS Scheduled Downloader/request_summary.txt")
+poll_summary_path = os.environ.get("MIS_POLL_SUMMARY", os.path.join(os.path.dirname(request_summary_path), "poll_summary.txt"))
 
 # Reference Excel Sheet for all the web data and requirements
 excel_path = "\\\\Pzpwuplancli01\\APP-DATA\\Task Scheduler\\MIS_Download_210125a_v3_via_API.xlsm"
 
-# Assume these folders will throw OOM error when querying back a day. More optimal to give up immediately.
-if days_back == 2:
-    give_up = ["34_TC", "83_CTOR", "20_RTDRD", "58_RILBRNLZAH", "16_LBEB"]
+# Pooled ERCOT API client shared by the worker threads. Transient failures (dropped connections,
+# 502s) are retried with backoff; OutOfMemory 500s are returned at once so the window can be split.
+client = ErcotClient(max_per_host=max_workers)
+
+# Learned window sizes per report ID. Folders whose learned window is smaller than the full range
+# skip the full-range request and split immediately, replacing the old hand-edited give_up list.
+planner = WindowPlanner(full_hours=24 * days_back)
+
+# SQLite manifest of every requested window. Re-downloads only request the windows that are still missing.
+manifest = DownloadManifest()
+
+# Per-request latency, bytes, split depth and extraction/write times (see download_telemetry.py). Only
+# nightly runs predict the cost of a nightly run, so polls and reruns are recorded as such.
+telemetry = TelemetryStore(run_kind="poll" if "-p" in sys.argv else "rerun" if "-r" in sys.argv else "nightly")
+
+# Shared work queue drained longest-job-first by max_workers threads. folder_costs holds the
+# expected seconds of work per folder for a full nightly range, filled in from the manifest.
+jobs = JobQueue(max_workers)
+folder_costs = {}
 
-else:
-    give_up = ["34_TC", "83_CTOR"]
+# Downloaded bodies wait here for the extractor threads. folder_downloader.run() drains jobs, then the pipeline.
+pipeline = ExtractionPipeline(extract_workers, extract_queue_size)
 
-give_up.append("03_ASC")
-give_up.append("02_AAFRWP")
-give_up.append("130_SSPSF")
+# The open request summary. Only runs that download open it (see open_summary), so importing this module or
+# a --plan dry run never truncates it.
+invalid_rid = None
 
-invalid_rid = open(invalid_rid, "w")
+# Threaded folder downloads (see folder_downloader.py). OOM sub-windows go back onto jobs.
+folder_downloader = FolderDownloader(destination_folder, invalid_rid, planner, manifest, client, jobs, pipeline, days_back,
+                                     telemetry, folder_costs)
 
-def convert(hour: int) -> str:
+
+def open_summary(path: str) -> TextIO:
     """
-    Simple helper method to convert an input hour.
-        - 9 -> "09"
-        - 13 -> "13"
+    Opens the request summary of a run that downloads, replacing the previous run's, and hands it to the
+    threaded downloader.
     """
-    if hour < 10:
-        return "0" + str(hour)
-    else:
-        return str(hour)
+    global invalid_rid
+    invalid_rid = open(path, "w")
+    folder_downloader.summary = invalid_rid
 
-def handle_oom_error(mapping: Dict, folder: str, request: str, start_date: str, start_hour: int, hours_left: int, back: int):
-    """
-    This method handles a caught 500 HTTP response. In practice, this is almost guaranteed to be
-    a 'System.OutOfMemory' Exception from the ERCOT Calpine API. To address this, we split up 
-    the original queried time into smaller chunks, typically 6 or 8 hours at a time. The
-    received contents are then downloaded into the desired folder.
+    return invalid_rid
 
-    This method is purely sequential. Not really worth the hassle to parallelize.
 
-    Inputs:
-        - folder: The name of the folder to download to, i.e. '83_CTOR'
-        - request: The 5-digit ID of the request for that folder
-        - start_date: The starting date in YYYY-MM-DD format.
-        - start_hour: The starting hour in [0, 24]
-        - hours_left: How many hours left to query.
-        - back: How many hours we look back at a time. 6-8 hours is reasonable.
-    
-    Output:
-        Returns nothing, but downloads to the appropriate folder.
+def poll_folders(mapping: Dict[str, Tuple[str, str]], folders_to_poll):
     """
-    if hours_left == 0:
-        return
-    
-    # Calculate the new upper and lower bounds
-    upper_date = start_date
-    upper_hour = start_hour
-    lower_date = start_date
-    lower_hour = int(start_hour) - back
-
-    if int(lower_hour) < 0:
-        lower_date = (datetime.strptime(start_date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
-        lower_hour += 24
-
-    lower_hour = convert(lower_hour)
-    
-    # Download the contents for this new bound.
-    download_folder(mapping, folder, lower_date, lower_hour, upper_date, upper_hour, handle=False)
-    handle_oom_error(mapping, folder, request, lower_date, lower_hour, hours_left - back, back)
-
-
-def download_folder(mapping: Dict[str, Tuple[str, str]], folder_name: str, l_d: str, l_h: str, u_d: str, u_h: str, handle=True, destination_folder=destination_folder):
+    Performs one poll: requests every hour between each folder's high-water mark and the
+    current hour (minus poll_lag_hours), then advances the high-water marks.
+
+    A folder's high-water mark stops at its oldest missing hour so that the hour is retried on
+    the next poll, unless the hour is older than poll_retry_hours. Abandoned hours are left for
+    the nightly run and Error_Checker.py.
+    """
+    upper = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=poll_lag_hours)
+    lowers = {}
+
+    for folder in folders_to_poll:
+        lowers[folder] = manifest.high_water(folder) or upper - timedelta(hours=poll_initial_hours)
+
+        if upper > lowers[folder]:
+            hours = hours_between(lowers[folder], upper)
+            folder_downloader.handle_oom_error(mapping, folder, mapping[folder][0], *to_strings(upper), hours, hours)
+
+    folder_downloader.run()
+
+    for folder in folders_to_poll:
+        gaps = [gap for gap in manifest.missing_windows(folder, lowers[folder], upper) if gap[1] > upper - timedelta(hours=poll_retry_hours)]
+        manifest.set_high_water(folder, gaps[0][0] if gaps else max(upper, lowers[folder]))
+
+    invalid_rid.flush()
+    planner.save()
+
+
+def ingest_parquet(downloaded):
     """
-    Given a mapping of folder names to (reportID, Type) tuples, a requested folder name,
-    and an input date in YYYY-MM-DD or today - x format, this helper method
-    queries ERCOT API and extracts the contents in the received ZIP file for the input
-    date into the destination folder.
+    Converts the new ZIP files of every downloaded folder that has a Parquet dataset (see
+    mis_parquet.py). pyarrow is only imported when this stage is requested.
 
     Inputs:
-        - mapping: A dictionary mapping folder names to an ordered pair of corresponding
-          report IDs and Types
-        - folder_name: The requested folder name to extract.
-        - lower_date, lower_hour: The lower-bound date in YYYY-MM-DD format and hour in '05' or '23' format.
-        - upper_date, upper_hour: Analogous to above.
-        - handle: Boolean flag that determines if invalid requests should be handled. True by default.
-
-    Output:
-        - Returns nothing, but downloads files to appropriate folder. 
+        - downloaded: The names of the folders downloaded in this run.
     """
-    sub_folder = f"{destination_folder}{folder_name}"
-    reportID, file_type = mapping[folder_name]
-
-    # Give up on some folders and immediately handle an OOM error.
-    if folder_name in give_up and handle:
-        print(f"Handling assumed Exception for folder {folder_name}...")
-        invalid_rid.write(f"{reportID} {folder_name} 500\n")
-        handle_oom_error(mapping, folder_name, reportID, u_d, u_h, 24 * days_back, chunk_size)
-    
-    else:
-        ercot_url = f"https://ercotapi.app.calpine.com/reports?reportId={reportID}&marketParticipantId=CRRAH&startTime={l_d}T{l_h}:00:00&endTime={u_d}T{u_h}:00:00&unzipFiles=false"
-        response = requests.get(ercot_url, verify=False)
-
-        # If the request was successful, extract the received files
-        if response.status_code == 200:
-            # This statement will execute if an OOM Handler successfully worked on a folder.
-            if u_h != l_h:
-                invalid_rid.write(f"Folder {folder_name} written to successfully from {l_d} Hour {l_h} to {u_d} Hour {u_h}.\n")
-            
-            else:
-                invalid_rid.write(f"{reportID} {folder_name} {response.status_code}\n")
+    from mis_parquet import parquet_datasets, ingest_folder
 
-            zip_file = zipfile.ZipFile(BytesIO(response.content))
-            filtered_files = [filename for filename in zip_file.namelist() if file_type == 'all' or file_type in filename]
+    for dataset, spec in parquet_datasets.items():
+        if spec["folder"] in downloaded:
+            converted = ingest_folder(dataset, f"{destination_folder}{spec['folder']}")
+            print(f"Converted {converted} ZIP files of {spec['folder']} into the {dataset} Parquet dataset.")
 
-            for filename in filtered_files:
-                if filename != "errorLog.txt":
-                    zip_file.extract(filename, sub_folder)
 
-        # Handle the Internal Server Error Exception here. Most likely an OutOfMemory issue.
-        elif response.status_code == 500:
-            invalid_rid.write(f"{reportID} {folder_name} {response.status_code}\n")
+def parse_folders(arguments, flag: str):
+    """
+    Returns the folder names listed after a command-line flag, up to the next flag.
+    """
+    folder_names = []
+    index = arguments.index(flag)
 
-            if handle:
-                print(f"Handling Exception for folder {folder_name}...")
-                handle_oom_error(mapping, folder_name, reportID, u_d, u_h, 24 * days_back, chunk_size)
+    while index < len(arguments) - 1:
+        if arguments[index + 1].startswith("-"):
+            break
+
+        folder_names.append(arguments[index + 1])
+        index += 1
+
+    return folder_names
 
-        # Most likely a 404 error code - no data is available for today. 
-        else:
-            invalid_rid.write(f"{reportID} {folder_name} {response.status_code}\n")
-        
-    return
 
 if __name__ == "__main__":
-    # Create the folder mapping by reading the Excel sheet.
-    webpage_partial = pd.read_excel(excel_path, sheet_name="List of Webpage", usecols=['Folder Name', 'Type Id', 'New Table Name'])
-    webpage_complete = pd.read_excel(excel_path, sheet_name="List of Webpage_complete", usecols=['Folder Name', 'Type of file'])
+    # Create the folder mapping from the cached report catalog. The Excel sheet is only read when it changed.
+    catalog = ReportCatalog(excel_path)
+    full_mapping = catalog.mapping()
 
-    condition = webpage_partial['New Table Name'] != ""
-    dict_partial = dict(zip(webpage_partial.loc[condition, 'Folder Name'], webpage_partial.loc[condition, 'Type Id']))
-    dict_complete = dict(zip(webpage_complete['Folder Name'], webpage_complete['Type of file']))
+    # Reports without a learned window whose typical payload is too large start with smaller windows.
+    for folder, size in catalog.payload_bytes(manifest).items():
+        if folder in full_mapping and size > max_request_bytes:
+            planner.seed(full_mapping[folder][0], int(24 * days_back * max_request_bytes // size))
 
-    full_mapping = {a: (dict_partial[a], dict_complete[a]) for a in dict_partial.keys() & dict_complete.keys()}
-    full_mapping.pop("48_3MRCR")
+    # Expected cost of each folder from recent runs. Folders without history are assumed to be
+    # as expensive as the most expensive known folder, so they are scheduled early.
+    folder_costs.update({folder: cost[0] for folder, cost in manifest.folder_costs().items() if folder in full_mapping})
 
-    # List of folders to process
-    folders = full_mapping.keys()
+    # Telemetry also counts the extraction time of each folder, so prefer it where it exists.
+    folder_costs.update({folder: cost for folder, cost in telemetry.folder_costs().items() if folder in full_mapping})
+
+    # List of folders to process, longest expected job first
+    folders = lpt_order({folder: folder_costs.get(folder, max(folder_costs.values(), default=0.0)) for folder in full_mapping})
 
     # First, create the subfolders if necessary.
     for folder in folders:
@@ -205,8 +238,27 @@ if __name__ == "__main__":
     # Parse the command-line arguments to determine what actions should be taken.
     arguments = sys.argv
     valid_flag = True
+    use_async = "-a" in arguments
+    downloaded = folders
+
+    if "-n" in arguments:
+        async_concurrency = int(arguments[arguments.index("-n") + 1])
+
+    if "--plan" in arguments:
+        # Print the predicted LPT schedule and makespan without downloading anything.
+        workers = async_concurrency if use_async else max_workers
+        costs = {folder: folder_downloader.window_cost(folder, to_datetime(yesterday, "06"), to_datetime(today, "06")) for folder in folders}
+        makespan, assignments = plan_makespan(costs, workers)
 
-    if "-r" in arguments:
+        for worker, assigned in enumerate(assignments):
+            print(f"Worker {worker + 1} ({sum(costs[f] for f in assigned):.1f} seconds): {' '.join(assigned)}")
+
+        print(f"Total work: {sum(costs.values()):.1f} seconds across {len(costs)} folders.")
+        print(f"Lower bound (total work / {workers} workers): {sum(costs.values()) / workers:.1f} seconds.")
+        print(f"Predicted makespan: {makespan:.1f} seconds.")
+        valid_flag = False
+
+    elif "-r" in arguments:
         if arguments[-1] != "-r":
             # Set the chunk size based on if it is given or not.
             if "-c" in arguments:
@@ -217,42 +269,81 @@ if __name__ == "__main__":
                 c_size = chunk_size
 
             # Parse all the requested folders.
-            folders_to_download = []
-            index = arguments.index("-r")
-
-            while index < len(arguments) - 1:
-                if arguments[index + 1] == "-c":
-                    break
-                
-                folders_to_download.append(arguments[index+1])
-                index += 1
+            folders_to_download = parse_folders(arguments, "-r")
+            downloaded = folders_to_download
+            open_summary(request_summary_path)
 
             # Submit the folders for processing.
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = [executor.submit(handle_oom_error, full_mapping, folder, full_mapping[folder][0], today, "06", 24, c_size) for folder in folders_to_download]
+            if use_async:
+                downloader = AsyncDownloader(full_mapping, destination_folder, invalid_rid, planner, manifest, days_back, async_concurrency, telemetry=telemetry)
+                downloader.run([("oom", folder, today, "06", 24, c_size) for folder in folders_to_download])
 
-                # Wait for all futures to complete
-                concurrent.futures.wait(futures)
+            else:
+                for folder in folders_to_download:
+                    folder_downloader.handle_oom_error(full_mapping, folder, full_mapping[folder][0], today, "06", 24, c_size)
+
+                # Drain the queued windows, longest first
+                folder_downloader.run()
 
         else:
-            sys.stderr.write(f"usage: {sys.argv[0]} [-c <integer>] [-r] <input folder-names>\n")
+            sys.stderr.write(f"usage: {sys.argv[0]} [--plan] [--parquet] [-a] [-n <integer>] [-c <integer>] [-r] <input folder-names>\n")
             valid_flag = False
 
+    elif "-p" in arguments:
+        folders_to_poll = parse_folders(arguments, "-p")
+
+        if "-i" in arguments:
+            poll_interval = int(arguments[arguments.index("-i") + 1])
+
+        if len(folders_to_poll) == 0:
+            sys.stderr.write(f"usage: {sys.argv[0]} [-i <minutes>] -p <input folder-names>\n")
+            valid_flag = False
+
+        # Poll until the process is stopped.
+        if valid_flag:
+            open_summary(poll_summary_path)
+
+        while valid_flag:
+            poll_folders(full_mapping, folders_to_poll)
+            print(f"Polled {len(folders_to_poll)} folders at {datetime.now().strftime('%Y-%m-%d %H:%M')}.")
+            time.sleep(poll_interval * 60)
+
+    elif use_async:
+        # Stream every folder through one pooled session.
+        open_summary(request_summary_path)
+        downloader = AsyncDownloader(full_mapping, destination_folder, invalid_rid, planner, manifest, days_back, async_concurrency, telemetry=telemetry)
+        downloader.run([(folder, yesterday, "06", today, "06") for folder in folders])
+
     else:
-        # Create a ThreadPoolExecutor with the specified number of workers
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit each folder for processing
-            futures = [executor.submit(download_folder, full_mapping, folder, yesterday, "06", today, "06") for folder in folders]
+        # Queue each folder longest-job-first and let max_workers threads drain the queue,
+        # including any OOM sub-windows the folders submit along the way.
+        open_summary(request_summary_path)
+        for folder in folders:
+            # Folders kept fresh by polling mode only need the hours the polls have not covered.
+            if manifest.high_water(folder) is not None:
+                folder_downloader.handle_oom_error(full_mapping, folder, full_mapping[folder][0], today, "06", 24 * days_back, 24 * days_back)
+            else:
+                jobs.submit(folder_downloader.window_cost(folder, to_datetime(yesterday, "06"), to_datetime(today, "06")),
+                            folder_downloader.download_folder, full_mapping, folder, yesterday, "06", today, "06")
 
-            # Wait for all futures to complete
-            concurrent.futures.wait(futures)
+        folder_downloader.run()
 
 
+    # Optional post-download stage: convert the downloaded CSV ZIP files into Parquet.
+    if valid_flag and "--parquet" in arguments:
+        ingest_parquet(downloaded)
+
     # Output Summary Statistics
     if valid_flag:
         end_time = time.time()
         execution_time = (end_time - start_time)
+        planner.save()
+
+        if "-r" not in arguments:
+            manifest.record_run(to_datetime(yesterday, "06"), to_datetime(today, "06"), execution_time)
+
         print("Downloading Complete")
         invalid_rid.write(f"The script took {execution_time:.2f} seconds to run.")
 
-    invalid_rid.close()
+    if invalid_rid is not None:
+        invalid_rid.close()
@@ -1,23 +1,39 @@
-from MIS_Download_Scheduler import download_folder
-import pandas as pd
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from datetime import date
+from ercot_client import ErcotClient
+from folder_downloader import FolderDownloader
+from window_planner import WindowPlanner
+from download_manifest import DownloadManifest
+from job_scheduler import JobQueue
+from extract_pipeline import ExtractionPipeline
+from report_catalog import ReportCatalog
 
 # Reference Excel Sheet for all the web data and requirements
 excel_path = "\\\\Pzpwuplancli01\\APP-DATA\\Task Scheduler\\MIS_Download_210125a_v3_via_API.xlsm"
 # d_folder = "\\\\pzpwcmfs01\\CA\\11_Transmission Analysis\\ERCOT\\101 - Misc\\CRR Limit Aggregates\\Data\\MIS Scheduled Downloads\\"
 
-# Create the folder mapping by reading the Excel sheet.
-webpage_partial = pd.read_excel(excel_path, sheet_name="List of Webpage", usecols=['Folder Name', 'Type Id', 'New Table Name'])
-webpage_complete = pd.read_excel(excel_path, sheet_name="List of Webpage_complete", usecols=['Folder Name', 'Type of file'])
+# Current storage for downloaded files
+destination_folder = os.environ.get("MIS_DESTINATION", f"\\\\Pzpwuplancli01\\Uplan\\ERCOT\\MIS {date.today().year}\\")
 
-condition = webpage_partial['New Table Name'] != ""
-dict_partial = dict(zip(webpage_partial.loc[condition, 'Folder Name'], webpage_partial.loc[condition, 'Type Id']))
-dict_complete = dict(zip(webpage_complete['Folder Name'], webpage_complete['Type of file']))
+# Maximum number of concurrent requests
+max_workers = 5
 
-full_mapping = {a: (dict_partial[a], dict_complete[a]) for a in dict_partial.keys() & dict_complete.keys()}
-full_mapping.pop("48_3MRCR")
+# Create the folder mapping from the cached report catalog.
+full_mapping = ReportCatalog(excel_path).mapping()
 
 folders = full_mapping.keys()
 
+# Learned window sizes per report ID, shared with the nightly run.
+planner = WindowPlanner()
+
+# Request outcomes are printed rather than written over the nightly run's request_summary.txt.
+downloader = FolderDownloader(destination_folder, sys.stdout, planner, DownloadManifest(), ErcotClient(max_per_host=max_workers),
+                              JobQueue(max_workers), ExtractionPipeline())
+
 #%%
-download_folder(full_mapping, "130_SSPSF", "2023-11-23", "06", "2023-11-24", "06", False)
+# Only the hours of the range that the download manifest has no successful window for are requested.
+downloader.handle_oom_error(full_mapping, "130_SSPSF", full_mapping["130_SSPSF"][0], "2023-11-24", "06", 24, 24)
+downloader.run()
+planner.save()
@@ -0,0 +1,175 @@
+import sys
+import time
+import random
+import zipfile
+import argparse
+import threading
+from io import BytesIO
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+Offline stand-in for the ERCOT API at https://ercotapi.app.calpine.com/reports.
+
+Serves /reports?reportId=...&startTime=...&endTime=... with synthetic nested ZIP files shaped like the
+real responses: an outer ZIP holding one inner _csv.zip and one _xml.zip per interval of the requested
+window. The payload is deterministic per (reportId, interval), so reruns receive byte-identical members.
+
+The stand-in can also misbehave like the real API:
+    - Windows longer than --oom-hours are answered with a 500 (the OutOfMemory Exception).
+    - --error-rate of the requests are answered with a random 404 or 502.
+    - Every response is delayed by --latency-ms.
+
+Reports listed with --heavy are --heavy-factor times larger than the others, like 130_SSPSF.
+
+Usage:
+    python Mock_ERCOT_API.py --port 8765 --file-kb 64 --files-per-hour 12 --oom-hours 12 --heavy 10130
+
+Point the downloader at it with ERCOT_API_URL=http://127.0.0.1:8765/reports.
+"""
+
+time_format = "%Y-%m-%dT%H:%M:%S"
+
+
+class MockSettings:
+    """
+    Behaviour of the stand-in, shared by all request handler threads.
+    """
+
+    def __init__(self, file_kb: int = 64, files_per_hour: int = 12, oom_hours: int = 24, error_rate: float = 0.0,
+                 latency_ms: int = 0, heavy: set = None, heavy_factor: int = 8, seed: int = 0):
+        self.file_kb = file_kb
+        self.files_per_hour = files_per_hour
+        self.oom_hours = oom_hours
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.heavy = heavy or set()
+        self.heavy_factor = heavy_factor
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        # Counters reported by the benchmark.
+        self.requests = 0
+        self.status_counts = {}
+
+
+def build_payload(settings: MockSettings, report_id: str, lower: datetime, upper: datetime) -> bytes:
+    """
+    Builds the outer ZIP for one window. Each interval gets an inner CSV ZIP and XML ZIP whose
+    contents only depend on the report ID and the interval start.
+    """
+    size = settings.file_kb * 1024 * (settings.heavy_factor if report_id in settings.heavy else 1)
+    step = timedelta(minutes=60 / settings.files_per_hour)
+    outer = BytesIO()
+
+    with zipfile.ZipFile(outer, "w", zipfile.ZIP_STORED) as outer_zip:
+        interval = lower
+        while interval < upper:
+            stamp = interval.strftime("%Y%m%d.%H%M%S")
+            rows = random.Random(f"{report_id}.{stamp}")
+            body = "SCED_Time_Stamp,Repeated_Hour_Flag,Constraint_ID,Constraint_Name,Contingency_Name,Settlement_Point,Shift_Factor\n"
+            lines = []
+
+            while len(body) + sum(len(line) for line in lines) < size:
+                lines.append(f"{interval.strftime('%m/%d/%Y %H:%M:%S')},N,{rows.randint(1, 999)},CONSTRAINT_{rows.randint(1, 400)},"
+                             f"CONTINGENCY_{rows.randint(1, 400)},NODE_{rows.randint(1, 2000)},{rows.uniform(-1, 1):.6f}\n")
+
+            for kind, content in (("csv", body + "".join(lines)), ("xml", f"<report id='{report_id}' start='{stamp}'/>")):
+                inner = BytesIO()
+                with zipfile.ZipFile(inner, "w", zipfile.ZIP_DEFLATED) as inner_zip:
+                    inner_zip.writestr(f"{report_id}.{stamp}_{kind}.{kind}", content)
+
+                info = zipfile.ZipInfo(f"cdr.{report_id}.{stamp}_{kind}.zip", date_time=(1980, 1, 1, 0, 0, 0))
+                outer_zip.writestr(info, inner.getvalue())
+
+            interval += step
+
+    return outer.getvalue()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status: int, body: bytes = b"", content_type: str = "text/plain"):
+        with self.settings.lock:
+            self.settings.requests += 1
+            self.settings.status_counts[status] = self.settings.status_counts.get(status, 0) + 1
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        settings = self.settings
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if settings.latency_ms > 0:
+            time.sleep(settings.latency_ms / 1000)
+
+        if url.path != "/reports" or "reportId" not in query:
+            return self.respond(404, b"Not Found")
+
+        try:
+            lower = datetime.strptime(query["startTime"][0], time_format)
+            upper = datetime.strptime(query["endTime"][0], time_format)
+        except (KeyError, ValueError):
+            return self.respond(400, b"Bad Request")
+
+        with settings.lock:
+            roll = settings.random.random()
+
+        if roll < settings.error_rate:
+            return self.respond(404 if roll < settings.error_rate / 2 else 502, b"Injected error")
+
+        if (upper - lower) > timedelta(hours=settings.oom_hours):
+            return self.respond(500, b"System.OutOfMemoryException")
+
+        self.respond(200, build_payload(settings, query["reportId"][0], lower, upper), "application/zip")
+
+    do_HEAD = do_GET
+
+
+def start_server(settings: MockSettings, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Starts the stand-in on a background thread. Port 0 picks a free port; the chosen port
+    is available as server.server_address[1].
+    """
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"settings": settings})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in for the ERCOT API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--file-kb", type=int, default=64, help="Size of each inner CSV in KB.")
+    parser.add_argument("--files-per-hour", type=int, default=12, help="Intervals per hour, 12 for 5-minute SCED data.")
+    parser.add_argument("--oom-hours", type=int, default=24, help="Windows longer than this are answered with a 500.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 404 or 502.")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay added to every response.")
+    parser.add_argument("--heavy", nargs="*", default=[], help="Report IDs whose payload is --heavy-factor times larger.")
+    parser.add_argument("--heavy-factor", type=int, default=8)
+    args = parser.parse_args()
+
+    mock_settings = MockSettings(args.file_kb, args.files_per_hour, args.oom_hours, args.error_rate, args.latency_ms,
+                                 set(args.heavy), args.heavy_factor)
+    mock_server = start_server(mock_settings, args.port)
+    print(f"Serving the ERCOT API stand-in at http://127.0.0.1:{mock_server.server_address[1]}/reports")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock_server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,228 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+"""
+SQLite manifest of every window requested by the MIS Scheduled Downloader.
+
+Each row of the windows table describes one (report ID, folder, start, end) request with its status
+code, the number of bytes received, the CRC32 of every extracted member and the elapsed time. The
+runs table stores the range and duration of each nightly run, and the watermarks table stores the
+high-water mark of every folder downloaded in polling mode.
+
+MIS_Download_Scheduler.py -r and Manual_Folder_Downloader.py use missing_windows to request only the
+parts of a range that have not already succeeded, and Error_Checker.py builds its report from
+folder_summary instead of parsing request_summary.txt.
+"""
+
+manifest_path = os.environ.get("MIS_MANIFEST", os.path.join(os.path.dirname(os.path.abspath(__file__)), "download_manifest.db"))
+
+# Format of the window bounds stored in the manifest. Sorts chronologically as text.
+time_format = "%Y-%m-%dT%H:00:00"
+
+schema = """
+CREATE TABLE IF NOT EXISTS windows (
+    report_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    member_crcs TEXT NOT NULL DEFAULT '{}',
+    elapsed REAL NOT NULL DEFAULT 0,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (report_id, folder, start, end)
+);
+CREATE INDEX IF NOT EXISTS windows_by_folder ON windows (folder, start, end);
+CREATE TABLE IF NOT EXISTS runs (
+    started TEXT NOT NULL,
+    lower TEXT NOT NULL,
+    upper TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    folder TEXT PRIMARY KEY,
+    high_water TEXT NOT NULL
+);
+"""
+
+
+def hours_between(lower: datetime, upper: datetime) -> int:
+    """
+    Returns the number of whole hours in [lower, upper).
+    """
+    return int((upper - lower).total_seconds() // 3600)
+
+
+class DownloadManifest:
+    """
+    Thread-safe wrapper around the manifest database. One connection is shared by all the
+    worker threads of the scheduler and guarded by a lock.
+    """
+
+    def __init__(self, path: str = manifest_path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self.lock, self.connection:
+            self.connection.executescript(schema)
+
+    def record(self, report_id, folder: str, lower: datetime, upper: datetime, status: int,
+               size: int = 0, member_crcs: Dict[str, int] = None, elapsed: float = 0.0):
+        """
+        Inserts or replaces the row for one requested window.
+        """
+        row = (str(report_id), folder, lower.strftime(time_format), upper.strftime(time_format), status, size,
+               json.dumps(member_crcs or {}), elapsed, datetime.now().strftime("%Y-%m-%dT%H:%M:%S"))
+
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def record_run(self, lower: datetime, upper: datetime, seconds: float):
+        """
+        Records the range and duration of a completed download run.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO runs VALUES (?, ?, ?, ?)",
+                                    (datetime.now().strftime("%Y-%m-%dT%H:%M:%S"), lower.strftime(time_format),
+                                     upper.strftime(time_format), seconds))
+
+    def last_run(self) -> Tuple[datetime, datetime, float]:
+        """
+        Returns (lower, upper, seconds) of the most recent run, or None if there is none.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT lower, upper, seconds FROM runs ORDER BY started DESC LIMIT 1").fetchone()
+
+        if row is None:
+            return None
+
+        return datetime.strptime(row[0], time_format), datetime.strptime(row[1], time_format), row[2]
+
+    def covered_hours(self, folder: str, lower: datetime, upper: datetime) -> set:
+        """
+        Returns the set of hour starts in [lower, upper) covered by a successful window.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT start, end FROM windows WHERE folder = ? AND status = 200 AND start < ? AND end > ?",
+                (folder, upper.strftime(time_format), lower.strftime(time_format))).fetchall()
+
+        covered = set()
+        for start, end in rows:
+            hour = max(datetime.strptime(start, time_format), lower)
+            end = min(datetime.strptime(end, time_format), upper)
+
+            while hour < end:
+                covered.add(hour)
+                hour += timedelta(hours=1)
+
+        return covered
+
+    def missing_windows(self, folder: str, lower: datetime, upper: datetime) -> List[Tuple[datetime, datetime]]:
+        """
+        Returns the contiguous gaps of [lower, upper) that no successful window covers yet.
+        """
+        covered = self.covered_hours(folder, lower, upper)
+        gaps = []
+        hour = lower
+
+        while hour < upper:
+            if hour not in covered:
+                if gaps and gaps[-1][1] == hour:
+                    gaps[-1] = (gaps[-1][0], hour + timedelta(hours=1))
+                else:
+                    gaps.append((hour, hour + timedelta(hours=1)))
+            hour += timedelta(hours=1)
+
+        return gaps
+
+    def folder_summary(self, lower: datetime, upper: datetime) -> List[Tuple[str, str, str, int]]:
+        """
+        Summarizes every folder requested inside [lower, upper).
+
+        Output:
+            - A list of (folder, report_id, status, covered_hours) tuples. The status is the one of the
+              full-range request if it was made. Folders only requested in smaller windows are '500' if
+              any window ran out of memory, '200' if the windows cover the whole range (as for polled
+              folders), and the worst status seen otherwise. covered_hours counts the hours covered
+              by successful windows.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT folder, report_id, start, end, status FROM windows WHERE start >= ? AND end <= ? ORDER BY folder",
+                (lower.strftime(time_format), upper.strftime(time_format))).fetchall()
+
+        full_range = (lower.strftime(time_format), upper.strftime(time_format))
+        report_ids, full_status, statuses = {}, {}, {}
+
+        for folder, report_id, start, end, status in rows:
+            report_ids[folder] = report_id
+            statuses.setdefault(folder, set()).add(status)
+
+            if (start, end) == full_range:
+                full_status[folder] = status
+
+        summary = []
+        for folder, report_id in report_ids.items():
+            covered = len(self.covered_hours(folder, lower, upper))
+
+            if folder in full_status:
+                status = full_status[folder]
+            elif 500 in statuses[folder]:
+                status = 500
+            elif covered == hours_between(lower, upper):
+                status = 200
+            else:
+                status = max(statuses[folder])
+
+            summary.append((folder, report_id, str(status), covered))
+
+        return summary
+
+    def folder_costs(self, runs: int = 10) -> Dict[str, Tuple[float, float]]:
+        """
+        Averages the work done per folder over the most recent nightly runs.
+
+        Output:
+            - A dictionary mapping each folder to (seconds, bytes): the average total request time
+              and the average total payload of the folder in one run, summed over all its windows.
+        """
+        query = """
+            SELECT folder, AVG(seconds), AVG(size) FROM (
+                SELECT w.folder AS folder, SUM(w.elapsed) AS seconds, SUM(w.bytes) AS size
+                FROM windows w
+                JOIN (SELECT lower, upper FROM runs ORDER BY started DESC LIMIT ?) r
+                    ON w.start >= r.lower AND w.end <= r.upper
+                GROUP BY w.folder, r.lower, r.upper)
+            GROUP BY folder
+        """
+        with self.lock:
+            rows = self.connection.execute(query, (runs,)).fetchall()
+
+        return {folder: (seconds, size) for folder, seconds, size in rows}
+
+    def high_water(self, folder: str) -> datetime:
+        """
+        Returns the time up to which a polled folder is fully downloaded, or None if the
+        folder has never been polled.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT high_water FROM watermarks WHERE folder = ?", (folder,)).fetchone()
+
+        return None if row is None else datetime.strptime(row[0], time_format)
+
+    def set_high_water(self, folder: str, high_water: datetime):
+        """
+        Moves the high-water mark of a polled folder.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?)", (folder, high_water.strftime(time_format)))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,198 @@
+import os
+import sys
+import math
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+"""
+Per-request telemetry for the MIS Scheduled Downloader.
+
+Every request made by MIS_Download_Scheduler.py (threaded or -a) appends one row to a small SQLite
+time series: the request latency, the bytes received, the split depth of the window (0 for the full
+range, 1 for a half, ...), the time spent extracting the body and, within that, the time spent writing
+members to the share. Rows are grouped by the start time and kind of the run that made them: 'nightly',
+'poll' (-p) or 'rerun' (-r).
+
+The scheduler uses the history of the nightly runs to order folders longest-job-first, since the request
+latency alone (stored in the download manifest) ignores the extraction time of the large folders. A polling
+daemon is one run lasting days and a rerun only covers some folders, so their totals are left out.
+
+Running this module prints p50/p95 per report ID and a daily trend:
+
+    python download_telemetry.py --days 30
+    python download_telemetry.py --days 90 --folder 130_SSPSF --trend
+"""
+
+telemetry_path = os.environ.get("MIS_TELEMETRY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "download_telemetry.db"))
+
+# Format of the timestamps stored in the telemetry. Sorts chronologically as text.
+time_format = "%Y-%m-%dT%H:%M:%S"
+
+schema = """
+CREATE TABLE IF NOT EXISTS requests (
+    run_started TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    report_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    split_depth INTEGER NOT NULL DEFAULT 0,
+    extract_seconds REAL NOT NULL DEFAULT 0,
+    write_seconds REAL NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    run_kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_by_report ON requests (report_id, recorded_at);
+CREATE INDEX IF NOT EXISTS requests_by_run ON requests (run_started, folder);
+"""
+
+
+def split_depth(hours: int, full_hours: int) -> int:
+    """
+    How many times the full range was halved to reach a window of this many hours.
+    """
+    return max(0, round(math.log2(full_hours / hours))) if hours > 0 else 0
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    The q-th percentile (0 <= q <= 100) of values, by linear interpolation.
+    """
+    if len(values) == 0:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class TelemetryStore:
+    """
+    Thread-safe writer and reader of the telemetry database, in the same style as DownloadManifest.
+
+    Inputs:
+        - path: The SQLite file.
+        - run_started: The start of the run the recorded requests belong to. Defaults to now.
+        - run_kind: The kind of that run, 'nightly', 'poll' or 'rerun'.
+    """
+
+    def __init__(self, path: str = telemetry_path, run_started: datetime = None, run_kind: str = "nightly"):
+        self.path = path
+        self.run_started = (run_started or datetime.now()).strftime(time_format)
+        self.run_kind = run_kind
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self.lock, self.connection:
+            self.connection.executescript(schema)
+
+            # Rows recorded before runs were told apart could belong to any kind of run.
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(requests)")]
+            if "run_kind" not in columns:
+                self.connection.execute("ALTER TABLE requests ADD COLUMN run_kind TEXT NOT NULL DEFAULT 'unknown'")
+
+    def record(self, report_id, folder: str, lower: datetime, upper: datetime, status: int, latency: float,
+               size: int = 0, depth: int = 0, extract_seconds: float = 0.0, write_seconds: float = 0.0, skipped: int = 0):
+        """
+        Appends the metrics of one request.
+        """
+        row = (self.run_started, datetime.now().strftime(time_format), str(report_id), folder, lower.strftime(time_format),
+               upper.strftime(time_format), status, latency, size, depth, extract_seconds, write_seconds, skipped, self.run_kind)
+
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def rows(self, since: datetime, folder: str = None) -> List[tuple]:
+        """
+        Returns (recorded_at, report_id, folder, status, latency, bytes, split_depth, extract_seconds,
+        write_seconds) for every request recorded since the given time.
+        """
+        query = ("SELECT recorded_at, report_id, folder, status, latency, bytes, split_depth, extract_seconds, write_seconds "
+                 "FROM requests WHERE recorded_at >= ?")
+        parameters = [since.strftime(time_format)]
+
+        if folder is not None:
+            query += " AND folder = ?"
+            parameters.append(folder)
+
+        with self.lock:
+            return self.connection.execute(query, parameters).fetchall()
+
+    def folder_costs(self, runs: int = 10) -> Dict[str, float]:
+        """
+        The average seconds of request and extraction work per folder in one nightly run, over the most
+        recent nightly runs.
+        """
+        query = """
+            SELECT folder, AVG(seconds) FROM (
+                SELECT folder, run_started, SUM(latency + extract_seconds) AS seconds FROM requests
+                WHERE run_kind = 'nightly' AND run_started IN (
+                    SELECT DISTINCT run_started FROM requests WHERE run_kind = 'nightly' ORDER BY run_started DESC LIMIT ?)
+                GROUP BY folder, run_started)
+            GROUP BY folder
+        """
+        with self.lock:
+            return dict(self.connection.execute(query, (runs,)).fetchall())
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def print_report(store: TelemetryStore, since: datetime, folder: str = None, trend: bool = False):
+    """
+    Prints the p50/p95 latency, payload and extraction time per report ID since the given time,
+    and optionally the daily p50/p95 latency of each report.
+    """
+    by_report = {}
+    for recorded_at, report_id, folder_name, status, latency, size, depth, extract, write in store.rows(since, folder):
+        by_report.setdefault((report_id, folder_name), []).append((recorded_at, status, latency, size, depth, extract, write))
+
+    print(f"{'Report':>7} {'Folder':<16} {'Reqs':>5} {'500s':>5} {'Lat p50':>8} {'Lat p95':>8} {'MB p50':>8} {'MB p95':>8} "
+          f"{'Ext p50':>8} {'Ext p95':>8} {'Wrt p95':>8} {'Depth':>5}")
+
+    ordered = sorted(by_report.items(), key=lambda item: -percentile([r[2] for r in item[1]], 95))
+    for (report_id, folder_name), rows in ordered:
+        latencies = [r[2] for r in rows]
+        megabytes = [r[3] / (1 << 20) for r in rows if r[1] == 200]
+        extracts = [r[5] for r in rows if r[1] == 200]
+        writes = [r[6] for r in rows if r[1] == 200]
+
+        print(f"{report_id:>7} {folder_name:<16} {len(rows):>5} {sum(1 for r in rows if r[1] == 500):>5} "
+              f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} {percentile(megabytes, 50):>8.1f} "
+              f"{percentile(megabytes, 95):>8.1f} {percentile(extracts, 50):>8.1f} {percentile(extracts, 95):>8.1f} "
+              f"{percentile(writes, 95):>8.1f} {max(r[4] for r in rows):>5}")
+
+    if trend:
+        for (report_id, folder_name), rows in ordered:
+            print(f"\n{folder_name} ({report_id}): daily latency p50 / p95 in seconds")
+
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(row[0][:10], []).append(row[2])
+
+            for day in sorted(by_day):
+                print(f"    {day}: {percentile(by_day[day], 50):>7.1f} / {percentile(by_day[day], 95):>7.1f} ({len(by_day[day])} requests)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report per-report download telemetry.")
+    parser.add_argument("--days", type=int, default=30, help="How many days of telemetry to include.")
+    parser.add_argument("--folder", help="Only report this folder, i.e. 130_SSPSF.")
+    parser.add_argument("--trend", action="store_true", help="Also print the daily latency trend of every report.")
+    args = parser.parse_args()
+
+    if not os.path.exists(telemetry_path):
+        sys.stderr.write(f"No telemetry found at {telemetry_path}.\n")
+        sys.exit(1)
+
+    telemetry = TelemetryStore()
+    print_report(telemetry, datetime.now() - timedelta(days=args.days), args.folder, args.trend)
+    telemetry.close()
@@ -0,0 +1,134 @@
+import os
+import time
+import zlib
+import queue
+import zipfile
+import threading
+from io import BytesIO
+from typing import Callable, Dict, Tuple, Union
+
+"""
+Producer/consumer ZIP extraction for the MIS Scheduled Downloader.
+
+Network workers used to download, decompress and write every member before they could start the
+next request, so slow writes to \\\\Pzpwuplancli01\\Uplan\\ERCOT\\MIS {year} held network slots. With
+ExtractionPipeline, fetchers push completed bodies onto a bounded queue and go back to the network,
+while a separate pool of extractor threads unpacks them. A full queue blocks the fetchers, which keeps
+memory bounded.
+
+Before writing a member, extract_zip compares its CRC32 with the file already on disk and skips
+identical files, so reruns stop rewriting thousands of unchanged files on the share.
+"""
+
+# Bytes read at a time when computing the CRC32 of an existing file.
+crc_block = 1 << 20
+
+
+def file_crc(path: str) -> int:
+    """
+    Computes the CRC32 of a file on disk, in the same form as ZipInfo.CRC.
+    """
+    crc = 0
+    with open(path, "rb") as existing:
+        for block in iter(lambda: existing.read(crc_block), b""):
+            crc = zlib.crc32(block, crc)
+
+    return crc
+
+
+def is_unchanged(info: zipfile.ZipInfo, target: str) -> bool:
+    """
+    Returns True if target already holds exactly the contents of the ZIP member. The size is
+    compared first so that most changed files are detected without reading them.
+    """
+    return os.path.isfile(target) and os.path.getsize(target) == info.file_size and file_crc(target) == info.CRC
+
+
+def extract_zip(source: Union[bytes, str], sub_folder: str, file_type: str, timings: Dict[str, float] = None) -> Tuple[Dict[str, int], int]:
+    """
+    Extracts the members of a downloaded ZIP file that match the folder's file type, skipping
+    members whose file on disk is already identical.
+
+    Inputs:
+        - source: The ZIP file, either as the raw response body or as a path on disk.
+        - sub_folder: The folder to extract to.
+        - file_type: Only members containing this string are extracted, or 'all'.
+        - timings: If given, timings['write'] is increased by the seconds spent decompressing and
+          writing members to sub_folder.
+
+    Output:
+        - A dictionary mapping every matching member to its CRC32.
+        - The number of members skipped because they were unchanged.
+    """
+    member_crcs = {}
+    skipped = 0
+
+    with zipfile.ZipFile(BytesIO(source) if isinstance(source, bytes) else source) as zip_file:
+        for info in zip_file.infolist():
+            if (file_type == 'all' or file_type in info.filename) and info.filename != "errorLog.txt":
+                member_crcs[info.filename] = info.CRC
+
+                if is_unchanged(info, os.path.join(sub_folder, info.filename)):
+                    skipped += 1
+                else:
+                    write_start = time.time()
+                    zip_file.extract(info, sub_folder)
+
+                    if timings is not None:
+                        timings['write'] = timings.get('write', 0.0) + time.time() - write_start
+
+    return member_crcs, skipped
+
+
+class ExtractionPipeline:
+    """
+    A bounded queue of downloaded bodies drained by a pool of extractor threads.
+
+    Inputs:
+        - workers: The number of extractor threads.
+        - max_pending: The number of downloaded bodies allowed to wait for extraction before
+          submit blocks the fetcher.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 4):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.threads = [threading.Thread(target=self.consume, daemon=True) for _ in range(workers)]
+
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, body: bytes, sub_folder: str, file_type: str, callback: Callable[[Dict[str, int], Dict[str, float]], None] = None):
+        """
+        Queues a downloaded body for extraction. Once the body has been extracted, callback receives
+        the member CRCs and the timings {'extract': seconds, 'write': seconds, 'skipped': count}.
+        """
+        self.queue.put((body, sub_folder, file_type, callback))
+
+    def consume(self):
+        while True:
+            body, sub_folder, file_type, callback = self.queue.get()
+
+            try:
+                timings = {'write': 0.0}
+                extract_start = time.time()
+                member_crcs, skipped = extract_zip(body, sub_folder, file_type, timings)
+                timings['extract'] = time.time() - extract_start
+                timings['skipped'] = skipped
+
+                if skipped > 0:
+                    print(f"Skipped {skipped} unchanged files in {sub_folder}.")
+
+                if callback is not None:
+                    callback(member_crcs, timings)
+
+            except Exception as exc:
+                print(f"Extraction into {sub_folder} generated an exception: {exc}")
+
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """
+        Blocks until every queued body has been extracted.
+        """
+        self.queue.join()
@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, TextIO, Tuple
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from ercot_client import ErcotClient
+from window_planner import WindowPlanner, to_datetime, to_strings, window_hours
+from download_manifest import DownloadManifest
+from job_scheduler import JobQueue
+from extract_pipeline import ExtractionPipeline
+from download_telemetry import TelemetryStore, split_depth
+
+"""
+Threaded folder downloads shared by MIS_Download_Scheduler.py and Manual_Folder_Downloader.py.
+
+Manual_Folder_Downloader.py used to import these helpers from MIS_Download_Scheduler.py, which ran the
+scheduler's module-level setup on import: truncating request_summary.txt and opening the manifest and
+telemetry of the nightly run. FolderDownloader holds everything the helpers share (the summary file,
+window planner, manifest, API client, job queue and extraction pipeline) and importing this module
+creates none of them, so every script builds its own:
+
+    downloader = FolderDownloader(destination_folder, summary, planner, manifest, ErcotClient(), JobQueue(5), ExtractionPipeline())
+    downloader.handle_oom_error(full_mapping, "130_SSPSF", full_mapping["130_SSPSF"][0], "2023-11-24", "06", 24, 24)
+    downloader.run()
+"""
+
+
+def convert(hour: int) -> str:
+    """
+    Simple helper method to convert an input hour.
+        - 9 -> "09"
+        - 13 -> "13"
+    """
+    if hour < 10:
+        return "0" + str(hour)
+    else:
+        return str(hour)
+
+
+class FolderDownloader:
+    """
+    Downloads MIS folders on a shared job queue and hands the bodies to an extraction pipeline.
+
+    Inputs:
+        - destination_folder: The folder holding one sub-folder per MIS folder, ending in a separator.
+        - summary: The text file the request outcomes are written to (request_summary.txt).
+        - planner: The learned window sizes per report ID.
+        - manifest: The download manifest every requested window is recorded in.
+        - client: The pooled ERCOT API client.
+        - jobs: The work queue the folders and their OOM sub-windows run on.
+        - pipeline: The extractor threads the downloaded bodies are handed to.
+        - days_back: How many days a full nightly request covers.
+        - telemetry: The per-request telemetry store, or None to record nothing.
+        - folder_costs: The expected seconds of work per folder for a full nightly range.
+    """
+
+    def __init__(self, destination_folder: str, summary: TextIO, planner: WindowPlanner, manifest: DownloadManifest,
+                 client: ErcotClient, jobs: JobQueue, pipeline: ExtractionPipeline, days_back: int = 1,
+                 telemetry: TelemetryStore = None, folder_costs: Dict[str, float] = None):
+        self.destination_folder = destination_folder
+        self.summary = summary
+        self.planner = planner
+        self.manifest = manifest
+        self.client = client
+        self.jobs = jobs
+        self.pipeline = pipeline
+        self.days_back = days_back
+        self.full_hours = 24 * days_back
+        self.telemetry = telemetry
+        self.folder_costs = folder_costs if folder_costs is not None else {}
+
+    def run(self):
+        """
+        Drains the queued windows, longest first, and waits for their extraction.
+        """
+        self.jobs.run()
+        self.pipeline.join()
+
+    def window_cost(self, folder: str, lower: datetime, upper: datetime) -> float:
+        """
+        Expected seconds of work for one window of a folder, proportional to its share of the
+        folder's historical cost for a full nightly range.
+        """
+        default = max(self.folder_costs.values(), default=0.0)
+        return self.folder_costs.get(folder, default) * (upper - lower).total_seconds() / (3600 * self.full_hours)
+
+    def handle_oom_error(self, mapping: Dict, folder: str, request: str, start_date: str, start_hour: str, hours_left: int, back: int):
+        """
+        This method handles a caught 500 HTTP response. In practice, this is almost guaranteed to be
+        a 'System.OutOfMemory' Exception from the ERCOT Calpine API. To address this, we split up
+        the original queried time into smaller windows, starting at the largest window size that
+        previously worked for this report (see window_planner.py), and request them concurrently.
+        Any window that still fails is split in half again by split_window.
+
+        The windows are submitted to the shared job queue, so they only run once run() is
+        draining it. Hours that already have a successful window in the download manifest are skipped, so manual
+        re-downloads (-r) only request what is actually missing.
+
+        Inputs:
+            - folder: The name of the folder to download to, i.e. '83_CTOR'
+            - request: The 5-digit ID of the request for that folder
+            - start_date: The upper-bound date in YYYY-MM-DD format.
+            - start_hour: The upper-bound hour in [0, 24]
+            - hours_left: How many hours to query, ending at the upper bound.
+            - back: The largest window, in hours, to start with.
+
+        Output:
+            Returns nothing, but queues the downloads to the appropriate folder.
+        """
+        upper = to_datetime(start_date, convert(int(start_hour)))
+        gaps = self.manifest.missing_windows(folder, upper - timedelta(hours=hours_left), upper)
+        windows = [window for gap in gaps for window in self.planner.initial_windows(request, *gap, cap=back)]
+
+        if len(windows) == 0:
+            print(f"Folder {folder} is already downloaded for this range.")
+
+        for lower, upper in windows:
+            self.jobs.submit(self.window_cost(folder, lower, upper), self.split_window, mapping, folder, lower, upper)
+
+    def split_window(self, mapping: Dict, folder: str, lower: datetime, upper: datetime):
+        """
+        Downloads a single window for a folder. If the API answers with a 500, the window is split
+        in half and both halves are queued, until requests succeed or the window is a single hour.
+        """
+        status_code = self.download_folder(mapping, folder, *to_strings(lower), *to_strings(upper), handle=False)
+        halves = self.planner.split(lower, upper) if status_code == 500 else []
+
+        for l, u in halves:
+            self.jobs.submit(self.window_cost(folder, l, u), self.split_window, mapping, folder, l, u)
+
+    def download_folder(self, mapping: Dict[str, Tuple[str, str]], folder_name: str, l_d: str, l_h: str, u_d: str, u_h: str, handle=True, destination_folder=None):
+        """
+        Given a mapping of folder names to (reportID, Type) tuples, a requested folder name,
+        and an input date in YYYY-MM-DD or today - x format, this helper method
+        queries ERCOT API and extracts the contents in the received ZIP file for the input
+        date into the destination folder.
+
+        Inputs:
+            - mapping: A dictionary mapping folder names to an ordered pair of corresponding
+              report IDs and Types
+            - folder_name: The requested folder name to extract.
+            - lower_date, lower_hour: The lower-bound date in YYYY-MM-DD format and hour in '05' or '23' format.
+            - upper_date, upper_hour: Analogous to above.
+            - handle: Boolean flag that determines if invalid requests should be handled. True by default.
+            - destination_folder: Overrides the downloader's destination folder.
+
+        Output:
+            - Returns the HTTP status code of the request, and downloads files to appropriate folder.
+        """
+        sub_folder = f"{destination_folder or self.destination_folder}{folder_name}"
+        reportID, file_type = mapping[folder_name]
+        full_hours = self.full_hours
+
+        # Give up on folders whose learned window is smaller than a day and immediately handle an OOM error.
+        if self.planner.learned_hours(reportID) < full_hours and handle:
+            print(f"Handling assumed Exception for folder {folder_name}...")
+            self.summary.write(f"{reportID} {folder_name} 500\n")
+            self.handle_oom_error(mapping, folder_name, reportID, u_d, u_h, full_hours, full_hours)
+            return 500
+
+        else:
+            lower, upper = to_datetime(l_d, l_h), to_datetime(u_d, u_h)
+            request_start = time.time()
+            response = self.client.report(reportID, lower, upper)
+            elapsed = time.time() - request_start
+            self.planner.record(reportID, window_hours(l_d, l_h, u_d, u_h), response.status_code)
+            depth = split_depth(window_hours(l_d, l_h, u_d, u_h), full_hours)
+
+            # If the request was successful, extract the received files
+            if response.status_code == 200:
+                # This statement will execute if an OOM Handler successfully worked on a folder.
+                if u_h != l_h:
+                    self.summary.write(f"Folder {folder_name} written to successfully from {l_d} Hour {l_h} to {u_d} Hour {u_h}.\n")
+
+                else:
+                    self.summary.write(f"{reportID} {folder_name} {response.status_code}\n")
+
+                # Hand the body to the extractor threads. The window is recorded once it is on disk.
+                size = len(response.content)
+
+                def record_extracted(member_crcs, timings):
+                    self.manifest.record(reportID, folder_name, lower, upper, 200, size, member_crcs, elapsed)
+                    if self.telemetry is not None:
+                        self.telemetry.record(reportID, folder_name, lower, upper, 200, elapsed, size, depth,
+                                              timings['extract'], timings['write'], timings['skipped'])
+
+                self.pipeline.submit(response.content, sub_folder, file_type, record_extracted)
+
+            # Handle the Internal Server Error Exception here. Most likely an OutOfMemory issue.
+            elif response.status_code == 500:
+                self.summary.write(f"{reportID} {folder_name} {response.status_code}\n")
+
+            # Most likely a 404 error code - no data is available for today.
+            else:
+                self.summary.write(f"{reportID} {folder_name} {response.status_code}\n")
+
+            if response.status_code != 200:
+                self.manifest.record(reportID, folder_name, lower, upper, response.status_code, len(response.content), {}, elapsed)
+                if self.telemetry is not None:
+                    self.telemetry.record(reportID, folder_name, lower, upper, response.status_code, elapsed, len(response.content), depth)
+
+            # Handle the OutOfMemory Exception once the failed request itself is recorded.
+            if response.status_code == 500 and handle:
+                print(f"Handling Exception for folder {folder_name}...")
+                self.handle_oom_error(mapping, folder_name, reportID, u_d, u_h, full_hours, full_hours // 2)
+
+        return response.status_code
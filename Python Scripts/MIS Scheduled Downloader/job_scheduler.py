@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, List, Tuple
+
+"""
+Longest-processing-time-first (LPT) scheduling for the MIS Scheduled Downloader.
+
+Folders used to be submitted in dictionary order, so the 500-prone giants (34_TC, 83_CTOR, 130_SSPSF)
+could start last and set the wall-clock time on their own. JobQueue always hands the most expensive
+pending job to the next idle worker, and jobs may submit more jobs while they run. OOM sub-windows are
+submitted back to the same queue, so idle workers pick them up instead of one worker grinding through
+a busy folder alone.
+
+The expected cost of each folder comes from the download manifest (see DownloadManifest.folder_costs).
+"""
+
+
+class JobQueue:
+    """
+    A priority work queue drained by a fixed number of worker threads. Jobs with the
+    highest cost run first; ties run in submission order.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.heap = []
+        self.counter = itertools.count()
+        self.active = 0
+        self.condition = threading.Condition()
+
+    def submit(self, cost: float, fn: Callable, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) with the given expected cost in seconds.
+        """
+        with self.condition:
+            heapq.heappush(self.heap, (-cost, next(self.counter), fn, args, kwargs))
+            self.condition.notify()
+
+    def worker(self):
+        """
+        Runs jobs until the queue is empty and no running job can submit more.
+        """
+        while True:
+            with self.condition:
+                while len(self.heap) == 0 and self.active > 0:
+                    self.condition.wait()
+
+                if len(self.heap) == 0:
+                    self.condition.notify_all()
+                    return
+
+                _, _, fn, args, kwargs = heapq.heappop(self.heap)
+                self.active += 1
+
+            try:
+                fn(*args, **kwargs)
+            except Exception as exc:
+                print(f"{fn.__name__}{args[1:]} generated an exception: {exc}")
+            finally:
+                with self.condition:
+                    self.active -= 1
+                    self.condition.notify_all()
+
+    def run(self):
+        """
+        Starts the workers and blocks until every job, including jobs submitted by
+        other jobs, has finished.
+        """
+        threads = [threading.Thread(target=self.worker) for _ in range(self.workers)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+
+def lpt_order(costs: Dict[str, float]) -> List[str]:
+    """
+    Returns the folders ordered from the longest to the shortest expected cost.
+    """
+    return sorted(costs, key=lambda folder: -costs[folder])
+
+
+def plan_makespan(costs: Dict[str, float], workers: int) -> Tuple[float, List[List[str]]]:
+    """
+    Simulates LPT scheduling of the folders on the given number of workers.
+
+    Output:
+        - The predicted makespan in seconds.
+        - The folders assigned to each worker, in the order they would run.
+    """
+    loads = [(0.0, worker) for worker in range(workers)]
+    assignments = [[] for _ in range(workers)]
+
+    for folder in lpt_order(costs):
+        load, worker = heapq.heappop(loads)
+        assignments[worker].append(folder)
+        heapq.heappush(loads, (load + costs[folder], worker))
+
+    return max(load for load, _ in loads), assignments
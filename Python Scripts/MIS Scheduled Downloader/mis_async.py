@@ -0,0 +1,236 @@
+import asyncio
+import os
+import sys
+import time
+import tempfile
+import concurrent.futures
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, TextIO
+
+import aiohttp
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from ercot_client import ercot_base, is_retriable, backoff_delay
+from window_planner import WindowPlanner, to_datetime, to_strings, window_hours
+from download_manifest import DownloadManifest
+from extract_pipeline import extract_zip
+from download_telemetry import TelemetryStore, split_depth
+
+"""
+Asynchronous download mode for the MIS Scheduled Downloader.
+
+The threaded downloader holds every response in memory as BytesIO(response.content) before
+extracting it, so peak memory tracks the largest report (130_SSPSF in practice). This module
+instead streams each report body to a temporary file in fixed-size chunks and hands the finished
+file to a small extraction pool, while a single pooled keep-alive session keeps the network busy.
+The network slot is released as soon as the body is on disk, and members identical to the files
+already on the share are not rewritten (see extract_pipeline.py). Transient failures are retried with
+the same backoff policy as the threaded mode (see ercot_client.py).
+
+Usage from MIS_Download_Scheduler.py:
+    downloader = AsyncDownloader(full_mapping, destination_folder, invalid_rid, planner, manifest, concurrency=8)
+    downloader.run([(folder, yesterday, "06", today, "06") for folder in folders])
+"""
+
+# Size of each streamed read from the response body.
+chunk_bytes = 1 << 20
+
+
+def build_url(reportID: str, l_d: str, l_h: str, u_d: str, u_h: str) -> str:
+    """
+    Builds the ERCOT API request URL for a report ID and a [lower, upper] time window.
+    """
+    return (f"{ercot_base}?reportId={reportID}&marketParticipantId=CRRAH"
+            f"&startTime={l_d}T{l_h}:00:00&endTime={u_d}T{u_h}:00:00&unzipFiles=false")
+
+
+class AsyncDownloader:
+    """
+    Downloads MIS folders over one pooled aiohttp session. At most `concurrency` requests are
+    in flight at once, and at most `extract_workers` ZIP files are being unpacked at once.
+
+    Lines are written to `summary` in the same format as download_folder, so Error_Checker.py
+    works unchanged on the resulting request_summary.txt.
+    """
+
+    def __init__(self, mapping: Dict[str, Tuple[str, str]], destination_folder: str, summary: TextIO,
+                 planner: WindowPlanner, manifest: DownloadManifest, days_back: int = 1, concurrency: int = 8,
+                 extract_workers: int = 2, retries: int = 4, backoff: float = 2.0, telemetry: TelemetryStore = None):
+        self.mapping = mapping
+        self.destination_folder = destination_folder
+        self.summary = summary
+        self.planner = planner
+        self.manifest = manifest
+        self.full_hours = 24 * days_back
+        self.concurrency = concurrency
+        self.extract_workers = extract_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.telemetry = telemetry
+
+        self.session = None
+        self.semaphore = None
+        self.extractor = None
+
+    async def fetch_to_disk(self, url: str) -> Tuple[int, str]:
+        """
+        Streams the response body for url into a temporary file. Dropped connections, timeouts and
+        transient 5xx responses are retried with exponential backoff and jitter.
+
+        Output:
+            - (status_code, path). The path is None unless the status code is 200.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    async with self.session.get(url) as response:
+                        if response.status != 200:
+                            body = await response.read()
+                            if attempt == self.retries or not is_retriable(response.status, body):
+                                return response.status, None
+
+                            reason = response.status
+
+                        else:
+                            fd, path = tempfile.mkstemp(suffix=".zip")
+                            try:
+                                with os.fdopen(fd, "wb") as out:
+                                    async for chunk in response.content.iter_chunked(chunk_bytes):
+                                        out.write(chunk)
+                            except BaseException:
+                                os.remove(path)
+                                raise
+
+                            return response.status, path
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                if attempt == self.retries:
+                    raise
+
+                reason = type(exc).__name__
+
+            delay = backoff_delay(attempt, self.backoff)
+            print(f"Retrying {url} in {delay:.1f} seconds after {reason} (attempt {attempt + 1} of {self.retries}).")
+            await asyncio.sleep(delay)
+
+    async def download_folder(self, folder_name: str, l_d: str, l_h: str, u_d: str, u_h: str, handle=True):
+        """
+        Asynchronous counterpart of download_folder in MIS_Download_Scheduler.py.
+
+        Inputs:
+            - folder_name: The requested folder name to extract.
+            - l_d, l_h: The lower-bound date in YYYY-MM-DD format and hour in '05' or '23' format.
+            - u_d, u_h: Analogous to above.
+            - handle: Boolean flag that determines if invalid requests should be handled. True by default.
+
+        Output:
+            - The HTTP status code of the request.
+        """
+        sub_folder = f"{self.destination_folder}{folder_name}"
+        reportID, file_type = self.mapping[folder_name]
+
+        # Give up on folders whose learned window is smaller than a day and immediately handle an OOM error.
+        if self.planner.learned_hours(reportID) < self.full_hours and handle:
+            print(f"Handling assumed Exception for folder {folder_name}...")
+            self.summary.write(f"{reportID} {folder_name} 500\n")
+            await self.handle_oom_error(folder_name, u_d, u_h, self.full_hours, self.full_hours)
+            return 500
+
+        request_start = time.time()
+        status, path = await self.fetch_to_disk(build_url(reportID, l_d, l_h, u_d, u_h))
+        latency = time.time() - request_start
+        self.planner.record(reportID, window_hours(l_d, l_h, u_d, u_h), status)
+        size, member_crcs, skipped = 0, {}, 0
+        timings = {'write': 0.0}
+
+        if status == 200:
+            try:
+                size = os.path.getsize(path)
+                loop = asyncio.get_running_loop()
+                extract_start = time.time()
+                member_crcs, skipped = await loop.run_in_executor(self.extractor, extract_zip, path, sub_folder, file_type, timings)
+                timings['extract'] = time.time() - extract_start
+            finally:
+                os.remove(path)
+
+            # This statement will execute if an OOM Handler successfully worked on a folder.
+            if u_h != l_h:
+                self.summary.write(f"Folder {folder_name} written to successfully from {l_d} Hour {l_h} to {u_d} Hour {u_h}.\n")
+            else:
+                self.summary.write(f"{reportID} {folder_name} {status}\n")
+
+        # Most likely an OutOfMemory issue.
+        elif status == 500:
+            self.summary.write(f"{reportID} {folder_name} {status}\n")
+
+        # Most likely a 404 error code - no data is available for today.
+        else:
+            self.summary.write(f"{reportID} {folder_name} {status}\n")
+
+        self.manifest.record(reportID, folder_name, to_datetime(l_d, l_h), to_datetime(u_d, u_h), status, size,
+                             member_crcs, time.time() - request_start)
+
+        if self.telemetry is not None:
+            self.telemetry.record(reportID, folder_name, to_datetime(l_d, l_h), to_datetime(u_d, u_h), status, latency, size,
+                                  split_depth(window_hours(l_d, l_h, u_d, u_h), self.full_hours),
+                                  timings.get('extract', 0.0), timings['write'], skipped)
+
+        # Handle the OutOfMemory Exception once the failed request itself is recorded.
+        if status == 500 and handle:
+            print(f"Handling Exception for folder {folder_name}...")
+            await self.handle_oom_error(folder_name, u_d, u_h, self.full_hours, self.full_hours // 2)
+
+        return status
+
+    async def handle_oom_error(self, folder_name: str, u_d: str, u_h: str, hours: int, back: int):
+        """
+        Asynchronous counterpart of handle_oom_error. The windows start at the learned size for
+        the report, capped at `back` hours, and are requested concurrently. Hours that already
+        have a successful window in the manifest are skipped.
+        """
+        reportID = self.mapping[folder_name][0]
+        upper = to_datetime(u_d, u_h)
+        gaps = self.manifest.missing_windows(folder_name, upper - timedelta(hours=hours), upper)
+        windows = [window for gap in gaps for window in self.planner.initial_windows(reportID, *gap, cap=back)]
+        await asyncio.gather(*[self.split_window(folder_name, lower, upper) for lower, upper in windows])
+
+    async def split_window(self, folder_name: str, lower: datetime, upper: datetime):
+        """
+        Asynchronous counterpart of split_window. A window answered with a 500 is split in half
+        and both halves are requested concurrently.
+        """
+        status = await self.download_folder(folder_name, *to_strings(lower), *to_strings(upper), handle=False)
+        halves = self.planner.split(lower, upper) if status == 500 else []
+        await asyncio.gather(*[self.split_window(folder_name, l, u) for l, u in halves])
+
+    async def download_all(self, jobs: List[Tuple]):
+        """
+        Runs every job through one shared session. Each job is either a
+        (folder, l_d, l_h, u_d, u_h) download or a ("oom", folder, u_d, u_h, hours, back) re-download.
+        """
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=600)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self.session = session
+            tasks = []
+
+            for job in jobs:
+                if job[0] == "oom":
+                    tasks.append(self.handle_oom_error(*job[1:]))
+                else:
+                    tasks.append(self.download_folder(*job))
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for job, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                print(f"{job} generated an exception: {result}")
+
+    def run(self, jobs: List[Tuple]):
+        """
+        Synchronous entry point for the scheduler script.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.extract_workers) as extractor:
+            self.extractor = extractor
+            asyncio.run(self.download_all(jobs))
@@ -0,0 +1,178 @@
+import os
+import json
+from typing import Dict, Tuple
+
+"""
+Cached report catalog for the MIS Scheduled Downloader.
+
+MIS_Download_Scheduler.py, Manual_Folder_Downloader.py and Error_Checker.py used to read two sheets
+of MIS_Download_210125a_v3_via_API.xlsm with pd.read_excel over the share on every start, only to
+build the folder -> (reportId, Type) mapping. ReportCatalog compiles the workbook and frequencies.txt
+once into a small JSON file and recompiles it only when either source file's modified time changes,
+so pandas and openpyxl are not even imported on a warm start.
+
+The catalog also exposes the expected frequency of every folder and, from the download manifest, its
+typical payload size, which the scheduler uses to seed the window planner for reports without history.
+"""
+
+# Reference Excel Sheet for all the web data and requirements
+excel_path = "\\\\Pzpwuplancli01\\APP-DATA\\Task Scheduler\\MIS_Download_210125a_v3_via_API.xlsm"
+
+# Expected frequency of every downloaded folder, one line per folder in folder-number order.
+frequencies_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frequencies.txt")
+
+# The compiled catalog.
+catalog_path = os.environ.get("MIS_REPORT_CATALOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_catalog.json"))
+
+# Folders listed in the workbook that are never downloaded.
+excluded_folders = ["48_3MRCR"]
+
+
+def folder_number(folder: str) -> int:
+    """
+    The numeric prefix of a folder name, i.e. 130 for '130_SSPSF'.
+    """
+    return int(folder.split("_")[0])
+
+
+def to_report_id(value):
+    """
+    Excel hands report IDs back as numbers, sometimes floats. Keep them as integers so
+    that request URLs read reportId=12345 and not reportId=12345.0.
+    """
+    try:
+        return int(value) if float(value).is_integer() else value
+    except (TypeError, ValueError):
+        return value
+
+
+def source_mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+class ReportCatalog:
+    """
+    The folder/report catalog, compiled from the workbook and cached on disk.
+
+    Inputs:
+        - excel_path: The MIS_Download workbook.
+        - cache_path: The JSON file the compiled catalog is cached in.
+        - frequencies_path: The text file of expected frequencies.
+    """
+
+    def __init__(self, excel_path: str = excel_path, cache_path: str = catalog_path, frequencies_path: str = frequencies_path):
+        self.excel_path = excel_path
+        self.cache_path = cache_path
+        self.frequencies_path = frequencies_path
+        self.reports = self.load()
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        Returns the cached catalog, recompiling it first if the workbook or frequencies.txt
+        changed since it was cached.
+        """
+        mtimes = [source_mtime(self.excel_path), source_mtime(self.frequencies_path)]
+
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                cache = json.load(cache_file)
+
+            # Keep using the cache if the share holding the workbook is unreachable.
+            if cache["mtimes"] == mtimes or mtimes[0] == 0.0:
+                return cache["reports"]
+
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+        reports = self.compile()
+
+        try:
+            with open(self.cache_path, "w") as cache_file:
+                json.dump({"mtimes": mtimes, "reports": reports}, cache_file, indent=4, sort_keys=True)
+        except OSError as exc:
+            print(f"Could not cache the report catalog at {self.cache_path}: {exc}")
+
+        return reports
+
+    def compile(self) -> Dict[str, Dict]:
+        """
+        Reads the two workbook sheets and frequencies.txt into one entry per folder.
+
+        Output:
+            - A dictionary mapping each folder name to its report_id, file_type (None if the folder is
+              missing from 'List of Webpage_complete'), description ('New Table Name') and frequency.
+        """
+        import pandas as pd
+
+        webpage_partial = pd.read_excel(self.excel_path, sheet_name="List of Webpage", usecols=['Folder Name', 'Type Id', 'New Table Name'])
+        webpage_complete = pd.read_excel(self.excel_path, sheet_name="List of Webpage_complete", usecols=['Folder Name', 'Type of file'])
+        dict_complete = dict(zip(webpage_complete['Folder Name'], webpage_complete['Type of file']))
+
+        reports = {}
+        for folder, report_id, description in zip(webpage_partial['Folder Name'], webpage_partial['Type Id'], webpage_partial['New Table Name']):
+            reports[folder] = {
+                "report_id": to_report_id(report_id),
+                "file_type": dict_complete.get(folder),
+                "description": None if pd.isna(description) else description,
+                "frequency": None,
+            }
+
+        # frequencies.txt lists one frequency per downloaded folder, in folder-number order.
+        try:
+            with open(self.frequencies_path, "r") as f:
+                frequencies = [line.strip() for line in f.read().split("\n") if line.strip() != ""]
+        except FileNotFoundError:
+            frequencies = []
+
+        downloaded = sorted(self.mapping_of(reports), key=folder_number)
+        if len(frequencies) == len(downloaded):
+            for folder, frequency in zip(downloaded, frequencies):
+                reports[folder]["frequency"] = frequency
+        else:
+            print(f"frequencies.txt lists {len(frequencies)} frequencies for {len(downloaded)} folders. Frequencies were not assigned.")
+
+        return reports
+
+    @staticmethod
+    def mapping_of(reports: Dict[str, Dict]) -> Dict[str, Tuple[str, str]]:
+        return {folder: (entry["report_id"], entry["file_type"]) for folder, entry in reports.items()
+                if entry["file_type"] is not None and entry["description"] != "" and folder not in excluded_folders}
+
+    def mapping(self) -> Dict[str, Tuple[str, str]]:
+        """
+        The folder -> (reportID, Type) mapping of every downloaded folder.
+        """
+        return self.mapping_of(self.reports)
+
+    def descriptions(self) -> Dict[str, str]:
+        """
+        The 'New Table Name' of every folder in the workbook.
+        """
+        return {folder: entry["description"] for folder, entry in self.reports.items()}
+
+    def frequency(self, folder: str) -> str:
+        """
+        The expected frequency of a folder, i.e. '5-Minute', or None if it is not known.
+        """
+        return self.reports.get(folder, {}).get("frequency")
+
+    def payload_bytes(self, manifest, runs: int = 10) -> Dict[str, float]:
+        """
+        The typical payload of each folder in one nightly run, averaged over the most recent
+        runs of the download manifest. Folders without history are left out.
+        """
+        return {folder: size for folder, (_, size) in manifest.folder_costs(runs).items() if folder in self.reports}
+
+
+if __name__ == "__main__":
+    # Recompile the cached catalog and print it.
+    if os.path.exists(catalog_path):
+        os.remove(catalog_path)
+
+    catalog = ReportCatalog()
+    for folder in sorted(catalog.reports, key=folder_number):
+        entry = catalog.reports[folder]
+        print(f"{folder}: {entry['report_id']} {entry['file_type']} {entry['frequency']} {entry['description']}")
@@ -0,0 +1,49 @@
+import os
+import sys
+import concurrent.futures
+from typing import Dict, List
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from ercot_client import ErcotClient
+
+"""
+Concurrent verification probes for the MIS Scheduled Downloader.
+
+Error_Checker.py used to re-request every suspect folder one after another and download the whole
+report body just to look at the status code. A probe here only reads the status line and headers
+(see ErcotClient.status), and all probes run concurrently on a bounded thread pool sharing one
+ErcotClient, so they keep its per-host limit, timeouts and retry policy.
+"""
+
+# Maximum number of probes in flight at once.
+max_probes = 8
+
+# Seconds to wait for the status line before giving up on a probe.
+probe_timeout = 120
+
+
+def probe_all(urls: List[str], max_workers: int = max_probes, client: ErcotClient = None) -> Dict[str, int]:
+    """
+    Probes every URL concurrently.
+
+    Inputs:
+        - urls: The request URLs to probe.
+        - max_workers: The most probes in flight at once.
+        - client: The ERCOT API client to probe through. A client limited to max_workers requests
+          per host is created (and closed) if None.
+
+    Output:
+        - A dictionary mapping each URL to its HTTP status code, or 0 if it could not be reached.
+    """
+    if len(urls) == 0:
+        return {}
+
+    owned = client is None
+    if owned:
+        client = ErcotClient(max_per_host=max_workers, timeout=(30, probe_timeout))
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(urls, executor.map(client.status, urls)))
+    finally:
+        if owned:
+            client.close()
@@ -0,0 +1,50 @@
+import os
+from datetime import datetime
+from download_manifest import DownloadManifest
+
+"""
+Behaviour tests of the download manifest. Run with pytest from this folder.
+"""
+
+day_start = datetime(2024, 6, 1, 6)
+day_end = datetime(2024, 6, 2, 6)
+
+
+def open_manifest(tmp_path) -> DownloadManifest:
+    return DownloadManifest(os.path.join(tmp_path, "download_manifest.db"))
+
+
+def test_missing_windows_of_an_empty_manifest_is_the_whole_range(tmp_path):
+    manifest = open_manifest(tmp_path)
+
+    assert manifest.missing_windows("130_SSPSF", day_start, day_end) == [(day_start, day_end)]
+
+
+def test_missing_windows_skips_successful_windows_only(tmp_path):
+    manifest = open_manifest(tmp_path)
+    manifest.record("13069", "130_SSPSF", datetime(2024, 6, 1, 6), datetime(2024, 6, 1, 12), 200)
+    manifest.record("13069", "130_SSPSF", datetime(2024, 6, 1, 12), datetime(2024, 6, 1, 18), 500)
+    manifest.record("13069", "130_SSPSF", datetime(2024, 6, 1, 20), datetime(2024, 6, 2, 0), 200)
+
+    # Another folder's windows never count.
+    manifest.record("12345", "55_DSF", day_start, day_end, 200)
+
+    assert manifest.missing_windows("130_SSPSF", day_start, day_end) == [
+        (datetime(2024, 6, 1, 12), datetime(2024, 6, 1, 20)),
+        (datetime(2024, 6, 2, 0), day_end),
+    ]
+
+
+def test_missing_windows_clips_windows_reaching_outside_the_range(tmp_path):
+    manifest = open_manifest(tmp_path)
+    manifest.record("13069", "130_SSPSF", datetime(2024, 5, 31, 0), datetime(2024, 6, 1, 9), 200)
+
+    assert manifest.missing_windows("130_SSPSF", day_start, day_end) == [(datetime(2024, 6, 1, 9), day_end)]
+
+
+def test_last_run_is_none_without_runs(tmp_path):
+    manifest = open_manifest(tmp_path)
+    assert manifest.last_run() is None
+
+    manifest.record_run(day_start, day_end, 12.5)
+    assert manifest.last_run() == (day_start, day_end, 12.5)
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+from datetime import datetime
+from download_telemetry import TelemetryStore, percentile, split_depth
+
+"""
+Behaviour tests of the download telemetry. Run with pytest from this folder.
+"""
+
+lower = datetime(2024, 6, 1, 6)
+upper = datetime(2024, 6, 2, 6)
+
+
+def record_run(path: str, started: datetime, kind: str, latencies):
+    store = TelemetryStore(path, run_started=started, run_kind=kind)
+    for latency in latencies:
+        store.record("13069", "130_SSPSF", lower, upper, 200, latency, extract_seconds=1.0)
+    store.close()
+
+
+def test_folder_costs_only_average_nightly_runs(tmp_path):
+    path = os.path.join(tmp_path, "telemetry.db")
+    record_run(path, datetime(2024, 6, 1, 6), "nightly", [9.0])
+    record_run(path, datetime(2024, 6, 2, 6), "nightly", [4.0, 5.0])
+
+    # A polling daemon stays one run for days, and a rerun repeats some windows.
+    record_run(path, datetime(2024, 6, 2, 9), "poll", [1.0] * 500)
+    record_run(path, datetime(2024, 6, 2, 10), "rerun", [30.0])
+
+    assert TelemetryStore(path).folder_costs() == {"130_SSPSF": 10.5}
+    assert TelemetryStore(path).folder_costs(runs=1) == {"130_SSPSF": 11.0}
+
+
+def test_rows_recorded_before_run_kinds_are_left_out_of_costs(tmp_path):
+    path = os.path.join(tmp_path, "telemetry.db")
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE requests (run_started TEXT NOT NULL, recorded_at TEXT NOT NULL, report_id TEXT NOT NULL,
+                          folder TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL, status INTEGER NOT NULL, latency REAL NOT NULL,
+                          bytes INTEGER NOT NULL DEFAULT 0, split_depth INTEGER NOT NULL DEFAULT 0, extract_seconds REAL NOT NULL DEFAULT 0,
+                          write_seconds REAL NOT NULL DEFAULT 0, skipped INTEGER NOT NULL DEFAULT 0)""")
+    connection.execute("INSERT INTO requests VALUES ('2024-05-01T06:00:00', '2024-05-01T06:00:05', '13069', '130_SSPSF', "
+                       "'2024-04-30T06:00:00', '2024-05-01T06:00:00', 200, 500.0, 0, 0, 0, 0, 0)")
+    connection.commit()
+    connection.close()
+
+    record_run(path, datetime(2024, 6, 1, 6), "nightly", [2.0])
+
+    assert TelemetryStore(path).folder_costs() == {"130_SSPSF": 3.0}
+    assert len(TelemetryStore(path).rows(datetime(2024, 1, 1))) == 2
+
+
+def test_split_depth_and_percentile():
+    assert [split_depth(hours, 24) for hours in (24, 12, 6, 3, 1)] == [0, 1, 2, 3, 5]
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile([], 95) == 0.0
@@ -0,0 +1,67 @@
+import os
+import zlib
+import zipfile
+from io import BytesIO
+from extract_pipeline import ExtractionPipeline, extract_zip
+
+"""
+Behaviour tests of the ZIP extraction and its unchanged-member skip. Run with pytest from this folder.
+"""
+
+
+def zip_body(members: dict) -> bytes:
+    body = BytesIO()
+    with zipfile.ZipFile(body, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in members.items():
+            zip_file.writestr(name, content)
+
+    return body.getvalue()
+
+
+def test_extract_zip_filters_by_file_type_and_returns_member_crcs(tmp_path):
+    body = zip_body({"a_csv.zip": b"one", "a_xml.zip": b"two", "errorLog.txt": b"csv"})
+
+    member_crcs, skipped = extract_zip(body, str(tmp_path), "csv")
+
+    assert member_crcs == {"a_csv.zip": zlib.crc32(b"one")}
+    assert skipped == 0
+    assert sorted(os.listdir(tmp_path)) == ["a_csv.zip"]
+
+
+def test_extract_zip_skips_identical_members_only(tmp_path):
+    extract_zip(zip_body({"a_csv.zip": b"one", "b_csv.zip": b"two"}), str(tmp_path), "all")
+    unchanged = os.path.join(tmp_path, "a_csv.zip")
+    written = os.path.getmtime(unchanged)
+    os.utime(unchanged, (written - 60, written - 60))
+
+    # Same size, different contents: only the CRC tells them apart.
+    member_crcs, skipped = extract_zip(zip_body({"a_csv.zip": b"one", "b_csv.zip": b"TWO"}), str(tmp_path), "all")
+
+    assert skipped == 1
+    assert set(member_crcs) == {"a_csv.zip", "b_csv.zip"}
+    assert os.path.getmtime(unchanged) == written - 60
+    with open(os.path.join(tmp_path, "b_csv.zip"), "rb") as changed:
+        assert changed.read() == b"TWO"
+
+
+def test_extract_zip_reads_bodies_from_disk(tmp_path):
+    path = os.path.join(tmp_path, "body.zip")
+    with open(path, "wb") as body:
+        body.write(zip_body({"a_csv.zip": b"one"}))
+
+    target = os.path.join(tmp_path, "out")
+    assert extract_zip(path, target, "csv") == ({"a_csv.zip": zlib.crc32(b"one")}, 0)
+
+
+def test_pipeline_reports_every_extracted_body(tmp_path):
+    pipeline = ExtractionPipeline(workers=2, max_pending=1)
+    results = []
+
+    for index in range(4):
+        body = zip_body({f"{index}_csv.zip": b"x" * index})
+        pipeline.submit(body, str(tmp_path), "csv", lambda member_crcs, timings: results.append((member_crcs, timings['skipped'])))
+
+    pipeline.join()
+
+    assert sorted(list(member_crcs)[0] for member_crcs, _ in results) == [f"{index}_csv.zip" for index in range(4)]
+    assert all(skipped == 0 for _, skipped in results)
@@ -0,0 +1,82 @@
+import os
+import time
+import pytest
+import pandas as pd
+from report_catalog import ReportCatalog, to_report_id
+
+"""
+Behaviour tests of the cached report catalog. The workbook is stood in for by patching pd.read_excel. Run
+with pytest from this folder.
+"""
+
+sheets = {
+    "List of Webpage": pd.DataFrame({
+        "Folder Name": ["130_SSPSF", "48_3MRCR", "55_DSF", "9_OLD"],
+        "Type Id": [13069.0, 12345, 13089, 11111],
+        "New Table Name": ["SSPSF", "3MRCR", "DSF", ""],
+    }),
+    "List of Webpage_complete": pd.DataFrame({
+        "Folder Name": ["130_SSPSF", "48_3MRCR", "55_DSF", "9_OLD"],
+        "Type of file": ["csv", "csv", "csv", "xml"],
+    }),
+}
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    reads = []
+
+    def read_excel(path, sheet_name, usecols):
+        reads.append(sheet_name)
+        return sheets[sheet_name][usecols]
+
+    monkeypatch.setattr(pd, "read_excel", read_excel)
+
+    excel_path = os.path.join(tmp_path, "MIS_Download.xlsm")
+    frequencies_path = os.path.join(tmp_path, "frequencies.txt")
+    with open(excel_path, "w") as excel:
+        excel.write("workbook")
+    with open(frequencies_path, "w") as frequencies:
+        frequencies.write("Daily\n5-Minute\n")
+
+    return {"excel_path": excel_path, "cache_path": os.path.join(tmp_path, "catalog.json"), "frequencies_path": frequencies_path}, reads
+
+
+def test_mapping_leaves_out_excluded_and_undescribed_folders(workbook):
+    paths, _ = workbook
+    catalog = ReportCatalog(**paths)
+
+    assert catalog.mapping() == {"130_SSPSF": (13069, "csv"), "55_DSF": (13089, "csv")}
+    assert catalog.frequency("55_DSF") == "Daily"
+    assert catalog.frequency("130_SSPSF") == "5-Minute"
+    assert catalog.descriptions()["130_SSPSF"] == "SSPSF"
+
+
+def test_catalog_is_only_recompiled_when_a_source_changes(workbook):
+    paths, reads = workbook
+    ReportCatalog(**paths)
+    compiled = len(reads)
+
+    assert ReportCatalog(**paths).mapping()["130_SSPSF"] == (13069, "csv")
+    assert len(reads) == compiled
+
+    later = time.time() + 60
+    os.utime(paths["frequencies_path"], (later, later))
+    ReportCatalog(**paths)
+    assert len(reads) == 2 * compiled
+
+
+def test_cache_is_used_while_the_workbook_is_unreachable(workbook):
+    paths, reads = workbook
+    ReportCatalog(**paths)
+    compiled = len(reads)
+
+    os.remove(paths["excel_path"])
+    assert ReportCatalog(**paths).mapping()["55_DSF"] == (13089, "csv")
+    assert len(reads) == compiled
+
+
+def test_report_ids_read_as_floats_become_integers():
+    assert to_report_id(13069.0) == 13069
+    assert to_report_id("13069") == 13069
+    assert to_report_id(None) is None
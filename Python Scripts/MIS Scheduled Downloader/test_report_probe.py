@@ -0,0 +1,61 @@
+import random
+import socket
+import pytest
+from Mock_ERCOT_API import MockSettings, start_server
+from report_probe import probe_all
+from ercot_client import ErcotClient
+
+"""
+Behaviour tests of the concurrent report probes, against the offline ERCOT API stand-in. Run with pytest
+from this folder.
+"""
+
+
+@pytest.fixture
+def reports_url():
+    server = start_server(MockSettings(file_kb=1, files_per_hour=1, oom_hours=12))
+    yield f"http://127.0.0.1:{server.server_address[1]}/reports"
+    server.shutdown()
+
+
+def window_url(reports_url: str, report_id: int, start: str, end: str) -> str:
+    return f"{reports_url}?reportId={report_id}&marketParticipantId=CRRAH&startTime={start}&endTime={end}&unzipFiles=false"
+
+
+def test_probe_all_returns_the_status_of_every_url(reports_url):
+    small = window_url(reports_url, 13069, "2024-06-01T06:00:00", "2024-06-01T12:00:00")
+    large = window_url(reports_url, 13069, "2024-06-01T06:00:00", "2024-06-02T06:00:00")
+    missing = reports_url.replace("/reports", "/unknown")
+
+    assert probe_all([small, large, missing]) == {small: 200, large: 500, missing: 404}
+
+
+def test_probe_all_reports_unreachable_hosts_as_zero():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+
+    url = f"http://127.0.0.1:{port}/reports?reportId=1"
+    assert probe_all([url], client=ErcotClient(retries=0)) == {url: 0}
+
+
+def test_probe_all_retries_transient_failures_only():
+    settings = MockSettings(file_kb=1, files_per_hour=1, error_rate=1.0, seed=0)
+    server = start_server(settings)
+    url = window_url(f"http://127.0.0.1:{server.server_address[1]}/reports", 13069, "2024-06-01T06:00:00", "2024-06-01T07:00:00")
+
+    # Every request fails with an injected 404 or 502, drawn from the stand-in's seeded generator. The 502s
+    # are retried, up to twice; the first 404 is final.
+    rolls = random.Random(0)
+    injected = [404 if rolls.random() < 0.5 else 502 for _ in range(3)]
+    expected = injected[:injected.index(404) + 1] if 404 in injected else injected
+
+    status = probe_all([url], client=ErcotClient(retries=2, backoff=0.01))[url]
+    server.shutdown()
+
+    assert status == expected[-1]
+    assert settings.requests == len(expected)
+
+
+def test_probe_all_of_no_urls_is_empty():
+    assert probe_all([]) == {}
@@ -0,0 +1,68 @@
+import os
+import json
+from datetime import datetime
+from window_planner import WindowPlanner
+
+"""
+Behaviour tests of the adaptive window planner. Run with pytest from this folder.
+"""
+
+lower = datetime(2024, 6, 1, 6)
+upper = datetime(2024, 6, 2, 6)
+
+
+def saved_history(planner: WindowPlanner) -> dict:
+    planner.save()
+    with open(planner.path, "r") as history_file:
+        return json.load(history_file)
+
+
+def test_initial_windows_walk_back_from_the_upper_bound(tmp_path):
+    planner = WindowPlanner(os.path.join(tmp_path, "history.json"))
+    planner.seed("13069", 10)
+
+    assert planner.initial_windows("13069", lower, upper) == [
+        (datetime(2024, 6, 1, 20), upper),
+        (datetime(2024, 6, 1, 10), datetime(2024, 6, 1, 20)),
+        (lower, datetime(2024, 6, 1, 10)),
+    ]
+    assert planner.initial_windows("13069", lower, upper, cap=12) == planner.initial_windows("13069", lower, upper)
+    assert len(planner.initial_windows("13069", lower, upper, cap=4)) == 6
+
+
+def test_split_halves_on_hour_boundaries_down_to_one_hour(tmp_path):
+    planner = WindowPlanner(os.path.join(tmp_path, "history.json"))
+
+    assert planner.split(lower, datetime(2024, 6, 1, 9)) == [(lower, datetime(2024, 6, 1, 7)), (datetime(2024, 6, 1, 7), datetime(2024, 6, 1, 9))]
+    assert planner.split(lower, datetime(2024, 6, 1, 7)) == []
+
+
+def test_small_successful_windows_do_not_shrink_the_learned_size(tmp_path):
+    planner = WindowPlanner(os.path.join(tmp_path, "history.json"))
+
+    # A polling run or manual gap fill only ever requests a few hours.
+    planner.record("13069", 2, 200)
+    planner.record("13069", 1, 200)
+
+    assert saved_history(planner)["13069"] == 24
+    assert WindowPlanner(planner.path).learned_hours("13069") == 24
+    assert WindowPlanner(planner.path).give_up({"130_SSPSF": ("13069", "csv")}) == []
+
+
+def test_success_without_a_split_grows_the_learned_size(tmp_path):
+    planner = WindowPlanner(os.path.join(tmp_path, "history.json"))
+    planner.seed("13069", 6)
+    planner.record("13069", 6, 200)
+
+    assert saved_history(planner)["13069"] == 12
+
+
+def test_out_of_memory_shrinks_to_the_largest_successful_window(tmp_path):
+    planner = WindowPlanner(os.path.join(tmp_path, "history.json"))
+    planner.record("13069", 24, 500)
+    planner.record("13069", 12, 500)
+    planner.record("13069", 6, 200)
+    planner.record("13069", 6, 200)
+
+    assert saved_history(planner)["13069"] == 6
+    assert WindowPlanner(planner.path).give_up({"130_SSPSF": ("13069", "csv")}) == ["130_SSPSF"]
@@ -0,0 +1,156 @@
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+"""
+Adaptive time-window planning for the MIS Scheduled Downloader.
+
+When the ERCOT API answers a request with a 500 (almost always a 'System.OutOfMemory' Exception),
+the window is split in half and both halves are requested concurrently. Splitting continues until
+the requests succeed or the window is a single hour.
+
+The largest window that worked for each report ID is saved to a small JSON history file so that
+later runs start at that size instead of rediscovering it. A report's size only shrinks when a request
+for it ran out of memory. If a run never needed to split a report, its starting size is doubled for
+the next run (capped at the full range), so reports whose payloads shrink again drift back to a single
+request on their own, and small successful windows (polls, manual gap fills) never lower it.
+
+The folders whose learned window is smaller than the full range replace the old hand-edited
+give_up list: they skip the doomed full-range request entirely.
+"""
+
+history_path = os.environ.get("MIS_WINDOW_HISTORY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "window_history.json"))
+
+# Format of the dates and hours used by the ERCOT API request URLs.
+date_format = "%Y-%m-%d"
+hour_format = "%H"
+
+
+def to_datetime(d: str, h: str) -> datetime:
+    """
+    Converts a ('YYYY-MM-DD', 'HH') pair into a datetime.
+    """
+    return datetime.strptime(f"{d} {h}", f"{date_format} {hour_format}")
+
+
+def to_strings(dt: datetime) -> Tuple[str, str]:
+    """
+    Converts a datetime into the ('YYYY-MM-DD', 'HH') pair used in request URLs.
+    """
+    return dt.strftime(date_format), dt.strftime(hour_format)
+
+
+def window_hours(l_d: str, l_h: str, u_d: str, u_h: str) -> int:
+    """
+    Returns the number of hours covered by the window [(l_d, l_h), (u_d, u_h)].
+    """
+    return int((to_datetime(u_d, u_h) - to_datetime(l_d, l_h)).total_seconds() // 3600)
+
+
+class WindowPlanner:
+    """
+    Plans request windows per report ID and learns from their outcomes. Safe to share
+    between the worker threads of the scheduler.
+
+    Inputs:
+        - path: The JSON file storing the learned window size (in hours) per report ID.
+        - full_hours: The length of a normal nightly request, i.e. 24 * days_back.
+        - min_hours: The smallest window that will ever be requested.
+    """
+
+    def __init__(self, path: str = history_path, full_hours: int = 24, min_hours: int = 1):
+        self.path = path
+        self.full_hours = full_hours
+        self.min_hours = min_hours
+        self.lock = threading.Lock()
+
+        # Largest successful window per report during this run, and the reports that needed a split.
+        self.run_best = {}
+        self.split_seen = set()
+
+        try:
+            with open(path, "r") as history_file:
+                self.history = json.load(history_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.history = {}
+
+    def learned_hours(self, report_id) -> int:
+        """
+        The window size, in hours, that requests for this report should start at.
+        """
+        return min(int(self.history.get(str(report_id), self.full_hours)), self.full_hours)
+
+    def seed(self, report_id, hours: int):
+        """
+        Sets the starting window of a report that has no learned window yet, i.e. from its
+        typical payload size in the report catalog.
+        """
+        with self.lock:
+            self.history.setdefault(str(report_id), max(min(hours, self.full_hours), self.min_hours))
+
+    def give_up(self, mapping: Dict[str, Tuple[str, str]]) -> List[str]:
+        """
+        Returns the folders whose learned window is smaller than the full range. Their
+        full-range request is known to fail, so it is more optimal to split immediately.
+        """
+        return [folder for folder, (report_id, _) in mapping.items() if self.learned_hours(report_id) < self.full_hours]
+
+    def initial_windows(self, report_id, lower: datetime, upper: datetime, cap: int = None) -> List[Tuple[datetime, datetime]]:
+        """
+        Splits [lower, upper] into consecutive windows of the learned size for this report,
+        walking backwards from the upper bound. An optional cap limits the window size further.
+        """
+        size = self.learned_hours(report_id)
+        if cap is not None:
+            size = min(size, cap)
+        size = max(size, self.min_hours)
+
+        windows = []
+        while upper > lower:
+            start = max(lower, upper - timedelta(hours=size))
+            windows.append((start, upper))
+            upper = start
+
+        return windows
+
+    def split(self, lower: datetime, upper: datetime) -> List[Tuple[datetime, datetime]]:
+        """
+        Splits a failed window in half on an hour boundary. Returns an empty list if the
+        window cannot be split any further.
+        """
+        hours = int((upper - lower).total_seconds() // 3600)
+        if hours <= self.min_hours:
+            return []
+
+        middle = lower + timedelta(hours=hours // 2)
+        return [(lower, middle), (middle, upper)]
+
+    def record(self, report_id, hours: int, status_code: int):
+        """
+        Records the outcome of one request of the given size.
+        """
+        key = str(report_id)
+        with self.lock:
+            if status_code == 200:
+                self.run_best[key] = max(self.run_best.get(key, 0), hours)
+            elif status_code == 500:
+                self.split_seen.add(key)
+
+    def save(self):
+        """
+        Writes the learned window sizes back to the history file.
+        """
+        with self.lock:
+            for key, best in self.run_best.items():
+                learned = self.learned_hours(key)
+
+                # Shrink only after an OutOfMemory 500, otherwise grow or keep the learned size.
+                if key in self.split_seen:
+                    self.history[key] = min(learned, best)
+                else:
+                    self.history[key] = max(learned, min(best * 2, self.full_hours))
+
+            with open(self.path, "w") as history_file:
+                json.dump(self.history, history_file, indent=4, sort_keys=True)
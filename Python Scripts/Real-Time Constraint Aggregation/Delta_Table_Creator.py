@@ -1,28 +1,35 @@
-import json
-from itertools import product
+import os
 import requests
 import pandas as pd
 from datetime import date, timedelta
 import time
 from io import StringIO
-from typing import Dict, Union
+from typing import List
+from rt_summary_store import SummaryStore
+from rt_delta_view import DeltaView, day_deltas, delta_view_root
 
 """
-This Python task aims to utilize the summary of the real-time constraint data of 2023 to generate
-a table that contains the progression of Delta data for a certain set of paths. 
+This Python task aims to utilize the summary of the real-time constraint data to generate
+a table that contains the progression of Delta data over the last thirty days for a certain set of paths.
+The deltas are kept by day in a rolling view (see rt_delta_view.py).
 
 Be sure to run RT_Constraint_Aggregator.py first before running this script in order to 
 collect the most-recent data.
 
-The outputted table is located in the Data subfolder or at \\pzpwtabapp02\Ercot\Exposure_SCED_2023.csv
+The outputted tables are located at \\pzpwtabapp02\Ercot\Exposure_SCED_Last_30.csv and, for the whole year, at
+\\pzpwtabapp02\Ercot\Exposure_SCED_{year}.csv. The yearly table only takes in the days the view computed.
 """
 
 # Global Variables and Parameters
 start_time = time.time()
-year = date.today().year
 
-json_processed = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Data/Aggregated RT Constraint Data/processed_" + str(year) + "_summary.json"
-output_path = f"\\\\pzpwtabapp02\\Ercot\\Exposure_SCED_{year}.csv"
+PORTFOLIO = 759847
+
+# How many days before today the output reaches back
+window_days = 30
+
+output_path = "\\\\pzpwtabapp02\\Ercot\\Exposure_SCED_Last_30.csv"
+yearly_output_path = "\\\\pzpwtabapp02\\Ercot\\Exposure_SCED_{year}.csv"
 
 credential_path = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/credentials.txt"
 
@@ -30,7 +37,7 @@ credential_path = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR
 with open(credential_path, "r") as credentials:
     auth = tuple(credentials.read().split())
 
-call1 = "https://services.yesenergy.com/PS/rest/ftr/portfolio/759847/paths.csv?"
+call1 = f"https://services.yesenergy.com/PS/rest/ftr/portfolio/{PORTFOLIO}/paths.csv?"
 r = requests.get(call1, auth=auth)
 df = pd.read_csv(StringIO(r.text))
 df['Path'] = df['SOURCE'] + '+' + df['SINK']
@@ -38,118 +45,68 @@ df = df[['Path', 'SOURCE', 'SINK']]
 df = df.drop_duplicates()
 
 
-def accumulate_data(mapping: Dict, source: str, sink: str) -> Union[pd.DataFrame, None]:
+
+def table_rows(deltas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduces delta rows to the rows of the output tables: only rows with a peak type, by date, hour and interval.
+    """
+    deltas = deltas[deltas['PeakType'] != ""]
+    deltas = deltas.assign(Date=pd.to_datetime(deltas["Date"], format="%m/%d/%Y"))
+    return deltas.sort_values(by=['Date', 'HourEnding', 'Interval'], kind='stable')
+
+
+def update_yearly_table(table_year: int, days: List[date], rebuild: bool):
     """
-    Accumulates data from the given mapping dictionary based on the specified source and sink.
+    Replaces the rows of the given days in the yearly table with their rows in the view.
 
-    Args:
-        mapping (Dict): Mapping dictionary containing the data.
-        source (str): Key representing the source in the mapping.
-        sink (str): Key representing the sink in the mapping.
+    Inputs:
+        - table_year: The year of the table.
+        - days: The days of table_year the view computed.
+        - rebuild: Whether the table is rebuilt from every day of the year instead, the days before the window
+          from the summary, i.e. because the portfolio changed. A missing table is rebuilt too.
 
-    Returns:
-        Union[pd.DataFrame, None]: A DataFrame containing the accumulated data,
-                    or None if either source or sink is not found in the mapping.
+    Output:
+        - Nothing, but writes the yearly table.
     """
+    yearly_path = yearly_output_path.format(year=table_year)
+
+    if rebuild or not os.path.isfile(yearly_path):
+        earlier_days = summary_store.days(date(table_year, 1, 1), min(date(table_year, 12, 31), lower_bound - timedelta(days=1)))
+        nodes = set(df['SOURCE']) | set(df['SINK'])
+        existing = [table_rows(day_deltas(summary_store.read(day, day, settlements=nodes), df)) for day in earlier_days]
+        days = delta_view.days(date(table_year, 1, 1), date(table_year, 12, 31))
+        print(f"Rebuilt {len(earlier_days) + len(days)} days of {yearly_path}")
+
+    else:
+        table = pd.read_csv(yearly_path)
+        table['Date'] = pd.to_datetime(table["Date"], format="%Y-%m-%d")
+        existing = [table[~table['Date'].dt.date.isin(days)]]
+
+    parts = existing + [table_rows(delta_view.read(day, day)) for day in days]
+    if len(parts) == 0:
+        return
+
+    yearly = pd.concat(parts, ignore_index=True)
+    yearly = yearly.sort_values(by=['Date', 'HourEnding', 'Interval'], kind='stable')
+    yearly.to_csv(yearly_path, index=False)
+
+
+# Bring the rolling view of the last thirty days up to date. Only the days that are new, or whose summary was
+# rewritten since the last run, are computed, and the days that fell out of the window are dropped.
+today = date.today()
+lower_bound = today - timedelta(days=window_days)
+
+summary_store = SummaryStore()
+delta_view = DeltaView(os.path.join(delta_view_root, str(PORTFOLIO)))
+paths_changed = delta_view.paths_changed(df)
+computed_days = delta_view.refresh(df, summary_store, today, window_days)
+
+df_merged_last_30 = table_rows(delta_view.read(lower_bound, today))
+df_merged_last_30.to_csv(output_path, index=False)
 
-    # Check if source and sink exist in the mapping
-    if source not in mapping or sink not in mapping:
-        return None
-
-    # Define column names
-    columns = ['Date', 'HourEnding', 'Interval', 'PeakType', 'Constraint', 'Contingency', 'Path', 'Source SF',
-               'Sink SF', '$ Cong MWH']
-
-    # Initialize empty lists for each column
-    data = [[] for _ in columns]
-
-    # Get the mappings for source and sink
-    source_map = mapping[source]
-    sink_map = mapping[sink]
-
-    # Iterate over each date and source item in the source mapping
-    for date, source_list in source_map.items():
-        # Check if the date exists in the sink mapping
-        if date in sink_map:
-
-            # Get the sink list for the corresponding date
-            sink_list = sink_map[date]
-
-            # Iterate over each combination of source and sink items
-            for source_item, sink_item in product(source_list, sink_list):
-                contin, constr, peak, sf, ss = source_item
-                sink_contin, sink_constr, sink_peak, sink_sf, sink_ss = sink_item
-
-                # Check if the values match for contingency, constraint, and peak type
-                if contin == sink_contin and constr == sink_constr and peak == sink_peak:
-                    if abs(sf) > 0.001 and abs(sink_sf) > 0.001:
-                        # Append the data to the respective columns
-                        data[0].append(date[:10])
-                        data[1].append(int(date[11:13]) + 1)
-                        data[2].append(int(date[14:16]) // 5 + 1)
-                        data[3].append(peak)
-                        data[4].append(constr)
-                        data[5].append(contin)
-                        data[6].append(f"{source}+{sink}")
-                        data[7].append(sf)
-                        data[8].append(sink_sf)
-                        data[9].append(ss - sink_ss)
-
-    # Create a DataFrame from the accumulated data
-    res = pd.DataFrame(dict(zip(columns, data)))
-
-    return res
-
-
-# Load the mapping file that contains a JSON of summarized data for the year
-with open(json_processed, "r") as map_file:
-    mapping = json.load(map_file)
-
-# Grab and merge together the data
-final_merge = []
-for _, row in df.iterrows():
-    source = row['SOURCE']
-    sink = row['SINK']
-
-    df_path = accumulate_data(mapping, source, sink)
-
-    if df_path is not None:
-        final_merge.append(df_path)
-        print(f"{source} to {sink} completed.")
-
-df_merged = pd.concat(final_merge, axis=0)
-
-# Do some post-processing of the data
-df_merged = df_merged.drop_duplicates(
-    subset=['Date', 'HourEnding', 'Interval', 'PeakType', 'Constraint', 'Contingency', 'Path'])
-df_merged = df_merged.sort_values(by=['Date', 'HourEnding', 'Interval'])
-df_merged = df_merged[df_merged['PeakType'] != ""]
-df_merged['Date'] = pd.to_datetime(df_merged["Date"], format="%m/%d/%Y")
-
-# Output a file for data in the last thirty days
-today = pd.to_datetime(date.today())  # Convert today to datetime object
-lower_bound = today - timedelta(days=30)
-
-# From January 1st to January 30th
-if lower_bound.year != today.year:
-    last_year = f"\\\\pzpwtabapp02\\Ercot\\Exposure_SCED_{lower_bound.year}.csv"
-    
-    try:
-        df_last = pd.read_csv(last_year)
-        df_last['Date'] = pd.to_datetime(df_last["Date"], format="%m/%d/%Y")
-        df_last = df_last[df_last["Date"] >= lower_bound]
-        df_merged_last_30 = pd.concat([df_last, df_merged])
-
-        df_merged_last_30 = df_merged_last_30.sort_values(by="Date")
-        df_merged_last_30 = df_merged_last_30.drop_duplicates()
-    except IOError:
-        print("Error in reading last year's file")
-
-# From February and Beyond
-else:
-    df_merged_last_30 = df_merged[df_merged["Date"] >= lower_bound]
-
-df_merged.to_csv(output_path, index=False)
+# Keep the yearly tables of the computed days up to date. In January, the window still reaches into last year.
+for computed_year in sorted({day.year for day in computed_days} | {today.year}):
+    update_yearly_table(computed_year, [day for day in computed_days if day.year == computed_year], paths_changed)
 
 # Output summary statistics
 end_time = time.time()
@@ -1,14 +1,22 @@
-import zipfile
 from io import StringIO, BytesIO
 import requests
 import warnings
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 import concurrent.futures
 import time
 import os
+import json
 from datetime import date
 from datetime import timedelta, datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from constraint_resolver import ConstraintResolver
+from yes_constraint_cache import YesConstraintCache
+from zip_pool import read_zip_files, hour_ending
+from sced_schema import apply_schema, concat, footprint_mb
+from sf_matrix import ShiftFactorMatrix, pivot_shift_factors
+from sf_matrix_store import SFMatrixStore
 
 warnings.simplefilter("ignore")
 PATHID = 1073125
@@ -23,13 +31,21 @@ DAYS_BACK = 365
 LIMIT = 0.005
 mis_path = "//Pzpwuplancli01/Uplan/ERCOT"
 delta_path = f"//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/10 - Studies/2024/Summer Prep/Extracts/RT Delta/Exposure_SCED_{YEAR}_{PATHID}.csv"
+
+# The year is processed SLICE_MONTHS months at a time, so peak memory depends on the slice and not on the year.
+# Each slice's exposure is written to partial_folder and the partials are combined into delta_path at the end.
+# Partials of slices that ended before the current month are reused, so an interrupted backfill resumes, as
+# long as the paths and the slice's 130_SSPSF files are the same as when they were built (see slice_stamp).
+SLICE_MONTHS = int(os.environ.get("SCED_SLICE_MONTHS", 1))
+partial_folder = os.path.join(os.path.dirname(delta_path), f"Partials_SCED_{YEAR}_{PATHID}")
 credential_path = "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/credentials.txt"
 
-yes_energy = "https://services.yesenergy.com/PS/rest/constraint/hourly/RT/ERCOT?"
  
 with open(credential_path, "r") as credentials:
     auth = tuple(credentials.read().split())
 
+yes_cache = YesConstraintCache("RT", auth)
+
 call1 = f"https://services.yesenergy.com/PS/rest/ftr/portfolio/{PATHID}/paths.csv?"
 r = requests.get(call1, auth=auth)
 paths_df = pd.read_csv(StringIO(r.text))
@@ -41,153 +57,205 @@ paths_df = paths_df.drop_duplicates()
 
 def grab_yes_data(start_date: str, end_date: str) -> pd.DataFrame:
     """
-    A helper method that queries Yes Energy to grab the ERCOT hourly constraint data in a certain date range.
+    A helper method that grabs the ERCOT hourly constraint data in a certain date range from the local
+    Yes Energy cache, which only queries Yes Energy for the days it does not have (see yes_constraint_cache.py).
     """
     relevant_columns = ["REPORTED_NAME", "DATETIME", "HOURENDING", "CONTINGENCY", "SHADOWPRICE"]
-    all_years_data = pd.DataFrame()
-    current_start_date = datetime.strptime(start_date, "%m/%d/%Y")
-    end_date_obj = datetime.strptime(end_date, "%m/%d/%Y")
+    all_years_data = yes_cache.table(datetime.strptime(start_date, "%m/%d/%Y").date(),
+                                     datetime.strptime(end_date, "%m/%d/%Y").date(), columns=relevant_columns)
+    all_years_data['DATETIME'] = all_years_data["DATETIME"].dt.strftime("%m/%d/%Y")
+    return all_years_data
 
-    while current_start_date <= end_date_obj:
-        one_year_later = current_start_date + timedelta(days=250)
-        current_end_date = min(one_year_later, end_date_obj)
+def month_zip_files(year: int, months: range) -> list:
+    """
+    The paths of the year's 130_SSPSF files posted in the given months.
+    """
+    yearly_base = os.path.join(mis_path, f"MIS {year}/130_SSPSF")
+    if not os.path.exists(yearly_base):
+        return []
 
-        formatted_start_date = current_start_date.strftime("%m/%d/%Y")
-        formatted_end_date = current_end_date.strftime("%m/%d/%Y")
+    # The month of a file is at characters 34-35 of its name, like in the other RT aggregators.
+    return [os.path.join(yearly_base, file) for file in os.listdir(yearly_base)
+            if file.endswith('_csv.zip') and file[34:36].isdigit() and int(file[34:36]) in months]
 
-        req_url = f"{yes_energy}startdate={formatted_start_date}&enddate={formatted_end_date}"
-        yes_req = requests.get(req_url, auth=auth)
-        print(req_url)  
+def slice_stamp(year: int, months: range) -> dict:
+    """
+    What a slice's partial was built from: the portfolio paths and the newest modification time of the slice's
+    130_SSPSF files, which the SF matrix store is also built from. A partial is only reused while both match.
+    """
+    zip_files = month_zip_files(year, months)
+    return {"paths": sorted(set(paths_df['PATH'].astype(str))),
+            "source_mtime": max((os.path.getmtime(zip_file) for zip_file in zip_files), default=0.0)}
 
-        if yes_req.ok and "No data" not in yes_req.text:
-            current_yes_table = pd.read_html(StringIO(yes_req.text))[0]
-            all_years_data = pd.concat([all_years_data, current_yes_table])
-        else:
-            print(f"Failed to retrieve data for {formatted_start_date} to {formatted_end_date}")
-        
-        current_start_date = current_end_date + timedelta(days=1)
-    
-    all_years_data['DATETIME'] = pd.to_datetime(all_years_data["DATETIME"]).dt.strftime("%m/%d/%Y")
-    return all_years_data[relevant_columns]
-
-def process_zip_file(zip_path: str, limit) -> pd.DataFrame:
+def aggregate_network_files(year: int, limit: float, months: range = range(1, 13)) -> pd.DataFrame:
     """
-    Process a single zip file to extract the DataFrame according to specified logic.
+    Reads the year's 130_SSPSF files of the given months on a process pool (see zip_pool.py), keeping only
+    the path nodes and the shift factors larger than limit, and adds the Hour_Ending of every file.
     """
-    with zipfile.ZipFile(zip_path, 'r') as z:
-        csv_file = [f for f in z.namelist() if f.endswith('.csv')][0]
-        with z.open(csv_file) as csv_f:
-            drop_columns = ["Constraint_ID", "Repeated_Hour_Flag"]
-            df_chunk = pd.read_csv(csv_f)
-            
-            df_chunk = df_chunk.drop(columns=drop_columns)
-            df_chunk = df_chunk[df_chunk['Settlement_Point'].isin(unique_nodes)]
-            df_chunk = df_chunk[abs(df_chunk['Shift_Factor']) > LIMIT]
-
-            # Add the HourEnding column
-            if len(df_chunk) > 0:
-                datetime_obj = datetime.strptime(df_chunk.iloc[0, 0], "%m/%d/%Y %H:%M:%S")
-                next_hour = (datetime_obj + timedelta(hours=1)).strftime("%H")
-
-                if next_hour == "00":
-                    next_hour = "24"
-
-                next_hour = next_hour.lstrip('0')
-                hourEnding = [next_hour] * len(df_chunk)
-                df_chunk.insert(1, "Hour_Ending", hourEnding)
-            
-            return df_chunk
-        
-    return pd.DataFrame()
-
-def aggregate_network_files(year: int, limit: float) -> pd.DataFrame:
     yearly_base = os.path.join(mis_path, f"MIS {year}/130_SSPSF")
     if os.path.exists(yearly_base):
-        yearly_zip_files = [os.path.join(yearly_base, file) for file in os.listdir(yearly_base) if file.endswith('_csv.zip')]
-        
-        # Use ThreadPoolExecutor to process files in parallel
-        with ThreadPoolExecutor() as executor:  # Adjust max_workers based on your environment
-            future_to_zip = {executor.submit(process_zip_file, zip_file, limit): zip_file for zip_file in yearly_zip_files}
-            
-            results = []
-            for future in as_completed(future_to_zip):
-                zip_file = future_to_zip[future]
-                try:
-                    data = future.result()
-                    results.append(data)
-                except Exception as exc:
-                    print(f'{zip_file} generated an exception: {exc}')
-                    
-            if results:
-                aggregated_data = pd.concat(results, ignore_index=True)
-                aggregated_data.sort_values(by=['SCED_Time_Stamp', 'Hour_Ending'], inplace=True)
-                print(f"Finished {year}")
-                return aggregated_data
-            else:
-                return pd.DataFrame()
+        yearly_zip_files = month_zip_files(year, months)
+
+        spec = {
+            "columns": ["SCED_Time_Stamp", "Constraint_Name", "Contingency_Name", "Settlement_Point", "Shift_Factor"],
+            "dtypes": {"Constraint_Name": "category", "Contingency_Name": "category", "Settlement_Point": "category"},
+            "filters": [("Settlement_Point", "in", set(unique_nodes)), ("Shift_Factor", "abs>", limit)],
+            "stamp_column": "SCED_Time_Stamp",
+            "time_format": "%m/%d/%Y %H:%M:%S",
+            "parse_times": True,
+        }
+
+        # Convert every batch to the compact schema as it arrives (see sced_schema.py).
+        results = [apply_schema(df) for df in read_zip_files(yearly_zip_files, spec)]
+
+        if results:
+            aggregated_data = concat(results)
+            aggregated_data.insert(1, "Hour_Ending", hour_ending(aggregated_data.pop("File_Stamp")))
+            aggregated_data.sort_values(by=['SCED_Time_Stamp', 'Hour_Ending'], inplace=True)
+            print(f"Finished {year}: {len(aggregated_data)} rows in {footprint_mb(aggregated_data):.1f} MB")
+            return aggregated_data
+        else:
+            return pd.DataFrame()
 
 def merge_paths_ercot(paths_df, ercot_df) -> pd.DataFrame:
+    """
+    Finds the source and sink shift factors of every path in one pass: the shift factors are pivoted once into an
+    (interval x constraint) x settlement point matrix and every path is a pair of its columns (see sf_matrix.py).
+    Only the rows where both the source and the sink have a shift factor are kept.
+    """
     # Assuming SCED_Time_Stamp is already a datetime in ercot_df; if not, convert it upfront
     ercot_df['SCED_Time_Stamp'] = pd.to_datetime(ercot_df['SCED_Time_Stamp'])
-    
-    # Deduplicate
+
     paths_df = paths_df[['SOURCE', 'SINK']].drop_duplicates()
-    ercot_df = ercot_df.drop_duplicates(subset=['Settlement_Point', 'SCED_Time_Stamp', 'Shift_Factor', 'Constraint_Name', 'Contingency_Name'])
-    merged_df = pd.merge(paths_df, ercot_df, left_on='SOURCE', right_on='Settlement_Point', how='inner', suffixes=('', '_source'))
-    merged_df = pd.merge(merged_df, ercot_df, left_on=['SINK', 'SCED_Time_Stamp', 'Constraint_Name', 'Contingency_Name'], right_on=['Settlement_Point', 'SCED_Time_Stamp', 'Constraint_Name', 'Contingency_Name'], how='inner', suffixes=('', '_sink'))
+    matrix = pivot_shift_factors(ercot_df, nodes=pd.unique(pd.concat([paths_df['SOURCE'], paths_df['SINK']])))
+    return path_shift_factors(paths_df, matrix)
 
-    # Clean up and select the needed columns only once, also handling duplicates and NaNs efficiently
-    merged_df = merged_df.dropna(subset=['Hour_Ending'])
-    merged_df = merged_df.drop_duplicates().sort_values(by=['SCED_Time_Stamp', 'Hour_Ending'])
+def path_shift_factors(paths_df, matrix: ShiftFactorMatrix) -> pd.DataFrame:
+    """
+    Reads the source and sink shift factors of every path out of a shift-factor matrix, either pivoted from
+    the network files or read from the SF matrix store.
+    """
+    merged_df = matrix.path_deltas(paths_df[['SOURCE', 'SINK']])
 
     # Format SCED_Time_Stamp for final output, if necessary
     merged_df['DATETIME'] = merged_df['SCED_Time_Stamp'].dt.strftime("%m/%d/%Y")
 
-    final_columns = ['SOURCE', 'SINK', 'SCED_Time_Stamp', 'DATETIME', 'Shift_Factor', 'Shift_Factor_sink', 'Constraint_Name', 'Contingency_Name', 'Hour_Ending']
-    final_df = merged_df[final_columns].rename(columns={'Shift_Factor': 'SOURCE_SF', 'Shift_Factor_sink': 'SINK_SF'})
+    final_columns = ['SOURCE', 'SINK', 'SCED_Time_Stamp', 'DATETIME', 'SOURCE_SF', 'SINK_SF', 'Constraint_Name', 'Contingency_Name', 'Hour_Ending']
+    final_df = merged_df[final_columns]
 
     return final_df
 
-lower_bound = f"01/01/{YEAR}"
-today = f"12/31/{YEAR}"
+def compute_exposure(paths_df, merged_df, yes_df) -> pd.DataFrame:
+    """
+    Matches the path shift factors of a slice of SCED intervals to the Yes Energy shadow prices and computes
+    the congestion exposure of every path, constraint and interval.
 
-yes_df = grab_yes_data(lower_bound, today)
-network_df = aggregate_network_files(YEAR, LIMIT)
-network_df = network_df[network_df['SCED_Time_Stamp'] >= lower_bound]
+    Inputs:
+        - paths_df: The portfolio paths, with PATH, SOURCE and SINK columns.
+        - merged_df: The source and sink shift factors of the slice, from path_shift_factors.
+        - yes_df: The Yes Energy constraint table, prepared once for the whole range.
 
-merged_df = merge_paths_ercot(paths_df, network_df)
-print("merged!")
+    Output:
+        - The exposure rows of the slice, in the columns of delta_path.
+    """
+    # Merge in the Shadow Prices
+    merged_df['Contingency_Name'] = merged_df['Contingency_Name'].astype(str)
+    merged_df['DATETIME'] = pd.to_datetime(merged_df['DATETIME'])
+    merged_df['Hour_Ending'] = merged_df['Hour_Ending'].astype(int)
 
-# Merge in the Shadow Prices
-merged_df['Contingency_Name'] = merged_df['Contingency_Name'].astype(str)
-merged_df['DATETIME'] = pd.to_datetime(merged_df['DATETIME']) 
-merged_df['Hour_Ending'] = merged_df['Hour_Ending'].astype(int)  
+    merged_df = pd.merge(merged_df, yes_df, left_on=['Contingency_Name', 'DATETIME', 'Hour_Ending'], right_on=['CONTINGENCY', 'DATETIME', 'HOURENDING'])
+    filtered_df = merged_df[resolver.contains(merged_df['Constraint_Name'], merged_df['REPORTED_NAME'])]
 
-#%%
-yes_df['CONTINGENCY'] = yes_df['CONTINGENCY'].astype(str)
-yes_df['DATETIME'] = pd.to_datetime(yes_df['DATETIME'])
-yes_df['HOURENDING'] = yes_df['HOURENDING'].fillna(0).astype(int)
-yes_df = yes_df.dropna()
+    filtered_df.drop(columns=['Constraint_Name', 'Contingency_Name', 'DATETIME', 'Hour_Ending'], inplace=True)
+    filtered_df['Path'] = filtered_df['SOURCE'].astype(str) + '+' + filtered_df['SINK'].astype(str)
+    filtered_df['Date'] = filtered_df['SCED_Time_Stamp'].dt.strftime("%m/%d/%Y")
+    filtered_df['Interval'] = (filtered_df['SCED_Time_Stamp'].dt.minute // 5) + 1
 
-merged_df = pd.merge(merged_df, yes_df, left_on=['Contingency_Name', 'DATETIME', 'Hour_Ending'], right_on=['CONTINGENCY', 'DATETIME', 'HOURENDING'])
-filtered_df = merged_df[merged_df.apply(lambda x: x['Constraint_Name'] in x['REPORTED_NAME'], axis=1)]
+    filtered_df.drop(columns=['SOURCE', 'SINK', 'SCED_Time_Stamp'], inplace=True, errors='ignore')
+    filtered_df = filtered_df.rename(columns={'REPORTED_NAME': 'Constraint', 'SOURCE_SF': 'Source SF', 'SINK_SF': 'Sink SF', 'CONTINGENCY': 'Contingency', 'SHADOWPRICE': 'ShadowPrice'}, errors='ignore')
+    filtered_df = filtered_df[['Date', 'HOURENDING',  'Interval', 'Path', 'Constraint', 'Contingency', 'Source SF', 'Sink SF', 'ShadowPrice']]
 
-filtered_df.drop(columns=['Constraint_Name', 'Contingency_Name', 'DATETIME', 'Hour_Ending'], inplace=True)
-filtered_df['Path'] = filtered_df['SOURCE'].astype(str) + '+' + filtered_df['SINK'].astype(str)
-filtered_df['Date'] = filtered_df['SCED_Time_Stamp'].dt.strftime("%m/%d/%Y")
-filtered_df['Interval'] = (filtered_df['SCED_Time_Stamp'].dt.minute // 5) + 1
+    filtered_df['$ Cong MWH'] = (filtered_df['Source SF'] - filtered_df['Sink SF']) * filtered_df['ShadowPrice']
+    filtered_df = filtered_df.drop_duplicates()
 
-filtered_df.drop(columns=['SOURCE', 'SINK', 'SCED_Time_Stamp'], inplace=True, errors='ignore')
-filtered_df = filtered_df.rename(columns={'REPORTED_NAME': 'Constraint', 'SOURCE_SF': 'Source SF', 'SINK_SF': 'Sink SF', 'CONTINGENCY': 'Contingency', 'SHADOWPRICE': 'ShadowPrice'}, errors='ignore')
-filtered_df = filtered_df[['Date', 'HOURENDING',  'Interval', 'Path', 'Constraint', 'Contingency', 'Source SF', 'Sink SF', 'ShadowPrice']]
+    filtered_df = filtered_df[filtered_df["Path"].isin(paths_df['PATH'])]
+    filtered_df = filtered_df[filtered_df['ShadowPrice'] > 0]
+    filtered_df = filtered_df.dropna(subset=['$ Cong MWH']).drop(columns=['ShadowPrice'])
+    return filtered_df
 
-filtered_df['$ Cong MWH'] = (filtered_df['Source SF'] - filtered_df['Sink SF']) * filtered_df['ShadowPrice']
-filtered_df = filtered_df.drop_duplicates()
+lower_bound = f"01/01/{YEAR}"
+today = f"12/31/{YEAR}"
 
-filtered_df = filtered_df[filtered_df["Path"].isin(paths_df['PATH'])]
-filtered_df = filtered_df[filtered_df['ShadowPrice'] > 0]
-filtered_df = filtered_df.dropna(subset=['$ Cong MWH']).drop(columns=['ShadowPrice'])
-filtered_df.to_csv(delta_path, index=False)
+yes_df = grab_yes_data(lower_bound, today)
+yes_df['CONTINGENCY'] = yes_df['CONTINGENCY'].astype(str)
+yes_df['DATETIME'] = pd.to_datetime(yes_df['DATETIME'])
+yes_df['HOURENDING'] = yes_df['HOURENDING'].fillna(0).astype(int)
+yes_df = yes_df.dropna()
+resolver = ConstraintResolver(yes_df['REPORTED_NAME'])
+
+sf_store = SFMatrixStore("130_SSPSF")
+path_nodes = pd.unique(pd.concat([paths_df['SOURCE'], paths_df['SINK']]))
+
+os.makedirs(partial_folder, exist_ok=True)
+current_month = (date.today().year, date.today().month)
+partial_paths = []
+
+for first_month in range(1, 13, SLICE_MONTHS):
+    months = range(first_month, min(first_month + SLICE_MONTHS, 13))
+    partial_path = os.path.join(partial_folder, f"{YEAR}-{first_month:02d}_{months[-1]:02d}.parquet")
+    stamp_path = partial_path + ".json"
+    stamp = slice_stamp(YEAR, months)
+
+    try:
+        with open(stamp_path, "r") as stamp_json:
+            partial_stamp = json.load(stamp_json)
+    except (FileNotFoundError, json.JSONDecodeError):
+        partial_stamp = None
+
+    # Finished slices only change when the portfolio or their files do, so reuse their partials otherwise.
+    if os.path.isfile(partial_path) and (YEAR, months[-1]) < current_month and partial_stamp == stamp:
+        print(f"Reusing {partial_path}")
+        partial_paths.append(partial_path)
+        continue
+
+    # Read the path nodes straight from the SF matrix store when it is current for the slice, otherwise from
+    # the network files. Months of the slice converted again since they were built are rebuilt first.
+    slice_start = datetime(YEAR, first_month, 1)
+    slice_end = datetime(YEAR + months[-1] // 12, months[-1] % 12 + 1, 1)
+    sf_store.refresh(slice_start, slice_end)
+
+    if sf_store.is_current(slice_start, slice_end):
+        matrix = sf_store.matrix(max(slice_start, datetime.strptime(lower_bound, "%m/%d/%Y")), slice_end, path_nodes)
+        matrix.values[np.abs(matrix.values) <= LIMIT] = np.nan
+        merged_df = path_shift_factors(paths_df, matrix)
+        del matrix
+
+    else:
+        network_df = aggregate_network_files(YEAR, LIMIT, months)
+        if network_df is None or len(network_df) == 0:
+            continue
+
+        network_df = network_df[network_df['SCED_Time_Stamp'] >= lower_bound]
+        merged_df = merge_paths_ercot(paths_df, network_df)
+        del network_df
+
+    slice_df = compute_exposure(paths_df, merged_df, yes_df)
+    del merged_df
+
+    # Write next to the partial first, so a partial is never half written.
+    slice_df.to_parquet(partial_path + ".tmp", engine="pyarrow", index=False)
+    os.replace(partial_path + ".tmp", partial_path)
+    with open(stamp_path, "w") as stamp_json:
+        json.dump(stamp, stamp_json)
+    partial_paths.append(partial_path)
+    print(f"Finished months {first_month}-{months[-1]}: {len(slice_df)} rows")
+    del slice_df
+
+# Combine the partials in month order. Every row belongs to the slice of its interval, so the slices
+# never hold the same row.
+with open(delta_path, "w", newline="") as delta_file:
+    for index, partial_path in enumerate(partial_paths):
+        pd.read_parquet(partial_path, engine="pyarrow").to_csv(delta_file, index=False, header=(index == 0))
 
 # Output summary statistics
 end_time = time.time()
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import pandas as pd
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple
+from rt_summary_store import SummaryStore
+from rt_delta_view import day_deltas, delta_columns
+
+"""
+Local query service for the shift-factor delta and shadow-price-weighted exposure of any path.
+
+Every new (source, sink, constraint) question used to mean copying SCED_Delta_New.py or
+Delta_Table_Creator.py and rerunning it over the whole year. PathExposureService answers it from the day
+partitions of the RT summary (see rt_summary_store.py), only opening the days of the requested range. Days
+are memory-mapped and kept warm in memory, split by settlement point, so a query over a warm range only
+joins the rows of its two nodes (see rt_delta_view.day_deltas). A partition rewritten by
+RT_Constraint_Aggregator.py is read again on its next query.
+
+From Python:
+
+    service = PathExposureService()
+    rows = service.exposure("HB_NORTH", "HB_HOUSTON", date(2024, 6, 1), date(2024, 6, 30))
+    print(service.summary("HB_NORTH", "HB_HOUSTON", date(2024, 6, 1), date(2024, 6, 30), constraint="SANDOW"))
+
+Over HTTP on localhost:
+
+    python path_exposure_service.py --port 8766 --warm-days 90
+
+    http://127.0.0.1:8766/exposure?source=HB_NORTH&sink=HB_HOUSTON&start=2024-06-01&end=2024-06-30
+        &constraint=SANDOW (optional, a part of the constraint name)
+        &format=csv (optional, the delta rows instead of the JSON summary)
+"""
+
+# Global Variables and Parameters
+day_format = "%Y-%m-%d"
+
+# How many days of the summary are kept in memory, least recently queried first out.
+default_cache_days = 400
+
+# How many constraints the summary lists, largest absolute exposure first.
+top_constraints = 20
+
+
+class PathExposureService:
+    """
+    Answers path exposure queries from the RT summary store, keeping recently queried days in memory.
+
+    Inputs:
+        - store: The summary store to read the days from.
+        - cache_days: How many days to keep in memory.
+    """
+
+    def __init__(self, store: SummaryStore = None, cache_days: int = default_cache_days):
+        self.store = store or SummaryStore()
+        self.cache_days = cache_days
+        self.lock = threading.Lock()
+
+        # day -> (partition modification time, {settlement point: rows})
+        self.cache: "OrderedDict[date, Tuple[float, Dict[str, pd.DataFrame]]]" = OrderedDict()
+
+    def day_rows(self, day: date) -> Dict[str, pd.DataFrame]:
+        """
+        The summary rows of one day by settlement point, read once per version of the partition.
+        """
+        path = self.store.day_path(day)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return {}
+
+        with self.lock:
+            cached = self.cache.get(day)
+            if cached is not None and cached[0] == modified:
+                self.cache.move_to_end(day)
+                return cached[1]
+
+        rows = pd.read_parquet(path, engine="pyarrow", memory_map=True)
+        rows = rows.astype({column: object for column in rows.select_dtypes('category').columns})
+        by_node = {node: part for node, part in rows.groupby('Settlement_Point', sort=False)}
+
+        with self.lock:
+            self.cache[day] = (modified, by_node)
+            self.cache.move_to_end(day)
+            while len(self.cache) > self.cache_days:
+                self.cache.popitem(last=False)
+
+        return by_node
+
+    def warm(self, start: date, end: date) -> int:
+        """
+        Loads the stored days within [start, end] into memory ahead of the queries.
+
+        Output:
+            - The number of days loaded.
+        """
+        days = self.store.days(start, end)
+        for day in days:
+            self.day_rows(day)
+
+        return len(days)
+
+    def exposure(self, source: str, sink: str, start: date, end: date, constraint: str = None) -> pd.DataFrame:
+        """
+        The delta rows of one path over a range of days.
+
+        Inputs:
+            - source, sink: The settlement points of the path.
+            - start, end: The inclusive range of SCED days.
+            - constraint: Only keep constraints whose name contains this, or all if None.
+
+        Output:
+            - The rows of rt_delta_view.delta_columns, oldest first. '$ Cong MWH' is the shadow-price-weighted
+              exposure, the source minus the sink shift factor times the shadow price. Like the output tables
+              of Delta_Table_Creator.py, only rows matched to a Yes Energy constraint (with a PeakType) are kept.
+        """
+        path = pd.DataFrame({'SOURCE': [source], 'SINK': [sink]})
+        merge = []
+
+        for day in self.store.days(start, end):
+            by_node = self.day_rows(day)
+            if source not in by_node or sink not in by_node:
+                continue
+
+            rows = pd.concat([by_node[source], by_node[sink]], ignore_index=True) if source != sink else by_node[source]
+            deltas = day_deltas(rows, path)
+            deltas = deltas[deltas['PeakType'] != ""]
+
+            if constraint:
+                deltas = deltas[deltas['Constraint'].astype(str).str.contains(constraint, case=False, regex=False)]
+
+            merge.append(deltas)
+
+        if len(merge) == 0:
+            return pd.DataFrame(columns=delta_columns)
+
+        return pd.concat(merge, ignore_index=True)
+
+    def summary(self, source: str, sink: str, start: date, end: date, constraint: str = None) -> Dict:
+        """
+        Totals of exposure for one path over a range of days, overall and by constraint.
+        """
+        rows = self.exposure(source, sink, start, end, constraint)
+        delta = rows['Source SF'] - rows['Sink SF']
+
+        by_constraint = rows.assign(Delta=delta).groupby('Constraint', sort=False).agg(
+            intervals=('$ Cong MWH', 'size'), cong_mwh=('$ Cong MWH', 'sum'), average_delta=('Delta', 'mean'))
+        by_constraint = by_constraint.reindex(by_constraint['cong_mwh'].abs().sort_values(ascending=False).index)
+
+        return {
+            "path": f"{source}+{sink}",
+            "start": start.strftime(day_format),
+            "end": end.strftime(day_format),
+            "constraint": constraint,
+            "rows": int(len(rows)),
+            "average_delta": float(delta.mean()) if len(rows) > 0 else None,
+            "cong_mwh": float(rows['$ Cong MWH'].sum()),
+            "by_constraint": [{"constraint": name, "intervals": int(values['intervals']), "cong_mwh": float(values['cong_mwh']),
+                               "average_delta": float(values['average_delta'])}
+                              for name, values in by_constraint.head(top_constraints).iterrows()],
+        }
+
+
+class ExposureHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /exposure. The service is set on a subclass by start_server.
+    """
+    service: PathExposureService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path != "/exposure":
+            return self.respond(404, b'{"error": "Not Found"}')
+
+        try:
+            source, sink = query["source"], query["sink"]
+            start = datetime.strptime(query["start"], day_format).date()
+            end = datetime.strptime(query["end"], day_format).date()
+        except (KeyError, ValueError):
+            return self.respond(400, b'{"error": "source, sink, start and end (YYYY-MM-DD) are required"}')
+
+        started = time.time()
+
+        # A failed query answers 500 instead of dropping the connection without a response.
+        try:
+            if query.get("format") == "csv":
+                rows = self.service.exposure(source, sink, start, end, query.get("constraint"))
+                return self.respond(200, rows.to_csv(index=False).encode(), "text/csv")
+
+            result = self.service.summary(source, sink, start, end, query.get("constraint"))
+            result["seconds"] = round(time.time() - started, 3)
+            body = json.dumps(result).encode()
+        except Exception as error:
+            return self.respond(500, json.dumps({"error": f"{type(error).__name__}: {error}"}).encode())
+
+        self.respond(200, body)
+
+
+def start_server(service: PathExposureService, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Starts the service on localhost on a background thread. Port 0 picks a free port; the chosen port
+    is available as server.server_address[1].
+    """
+    handler = type("ConfiguredExposureHandler", (ExposureHandler,), {"service": service})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local path exposure query service over the RT summary.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--warm-days", type=int, default=90, help="Load this many days before today into memory at start.")
+    parser.add_argument("--cache-days", type=int, default=default_cache_days, help="The most days kept in memory.")
+    args = parser.parse_args()
+
+    exposure_service = PathExposureService(cache_days=args.cache_days)
+    print(f"Loaded {exposure_service.warm(date.today() - timedelta(days=args.warm_days), date.today())} days")
+
+    exposure_server = start_server(exposure_service, args.port)
+    print(f"Serving path exposure at http://127.0.0.1:{exposure_server.server_address[1]}/exposure")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        exposure_server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,252 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from typing import Dict, Iterable, List
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from constraint_resolver import ConstraintResolver
+from zip_pool import hour_ending
+
+"""
+Columnar aggregation engine for RT_Constraint_Aggregator.py.
+
+convert_csv and post_process used to walk every 130_SSPSF row with iterrows, look it up in the nested
+mapping[date][hour][facility] dictionary through findDesired and push the result back into another nested
+dictionary, so one month of files took tens of minutes. ConstraintAggregator does the same work on whole
+columns instead:
+
+    - The Yes Energy table is reduced once to a typed frame (datetime Date, int Hour, categorical
+      Facility, Contingency, FacilityType and PeakType).
+    - convert joins a batch of SSPSF files to that frame on (Date, Hour, Contingency), keeps the candidates
+      whose facility contains the row's constraint name (see constraint_resolver.py) and takes, for every
+      row, the facility that findDesired would have returned first.
+    - summary_rows reduces the converted rows to one typed summary row each, which rt_summary_store.py
+      keeps by day. nest_summary sorts them by settlement point and SCED timestamp and slices them into
+      the summary[settlement][timestamp] lists of the old processed_{year}_summary.json.
+
+convert keeps the quirks of the row-by-row version (test_rt_aggregation.py compares the two): every file
+takes the hour ending of its first timestamp, hour ending 24 belongs to the day after the timestamp, and
+rows without a match keep blank names and a missing shadow price.
+
+    aggregator = ConstraintAggregator(yes_table, nodes)
+    converted = pd.concat([aggregator.convert(batch) for batch in read_zip_files(zip_paths, spec)])
+    summary_store.upsert(aggregator.summary_rows(converted))
+"""
+
+# Format of the SCED_Time_Stamp column.
+timestamp_format = "%m/%d/%Y %H:%M:%S"
+
+# Columns of the flattened mapping. FacilityRank and Position order the facilities of an hour the same
+# way findDesired visited them.
+mapping_columns = ['Date', 'Hour', 'Facility', 'Position', 'Contingency', 'ShadowPrice', 'FacilityType', 'PeakType']
+
+# Columns of one summary row, in the order of the summary tuples after the first two.
+summary_columns = ['Settlement_Point', 'SCED_Time_Stamp', 'Contingency_Name', 'Constraint_Name', 'PeakType',
+                   'Shift_Factor', 'Shadow_Shift']
+
+
+def flatten_table(yes_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduces the Yes Energy RT constraint table to one typed row per (date, hour, facility, entry), in the
+    order the old nested mapping[date][hour][facility] lists were searched: dates, then their hours, then
+    their facilities in order of first appearance, and the entries of a facility in table order.
+
+    Inputs:
+        - yes_table: The Yes Energy table, i.e. from YesConstraintCache.table, with the DATETIME, HOURENDING,
+          REPORTED_NAME, CONTINGENCY, SHADOWPRICE, FACILITYTYPE and PEAKTYPE columns.
+
+    Output:
+        - A DataFrame with the columns of mapping_columns and FacilityRank, the order in which each facility
+          first appears within its date and hour.
+    """
+    flat = pd.DataFrame({
+        'Date': pd.to_datetime(yes_table['DATETIME'], errors='coerce').dt.normalize(),
+        'Hour': pd.to_numeric(yes_table['HOURENDING'], errors='coerce').astype('Int8'),
+        'Facility': yes_table['REPORTED_NAME'].astype(object),
+        'Contingency': yes_table['CONTINGENCY'].astype(object),
+        'ShadowPrice': pd.to_numeric(yes_table['SHADOWPRICE'], errors='coerce'),
+        'FacilityType': yes_table['FACILITYTYPE'].astype(object),
+        'PeakType': yes_table['PEAKTYPE'].astype(object),
+    }).reset_index(drop=True)
+
+    # Number dates, hours within a date and facilities within an hour by first appearance, and sort by
+    # all three. Rows of the same facility keep their table order.
+    keys = ['Date', 'Hour', 'Facility']
+    codes = [flat.groupby(keys[:depth], sort=False, dropna=False).ngroup().to_numpy() for depth in range(1, 4)]
+    flat = flat.iloc[np.lexsort(codes[::-1])].reset_index(drop=True)
+    flat['Position'] = flat.groupby(keys, sort=False, dropna=False).cumcount().astype('int32')
+
+    # The rank of a facility within its hour, i.e. the order in which findDesired visited the keys of
+    # mapping[date][hour]. A facility can come first in one hour and second in the next.
+    facility_groups = flat.groupby(keys, sort=False, dropna=False).ngroup()
+    first_groups = facility_groups.groupby([flat['Date'], flat['Hour']], sort=False, dropna=False).transform('min')
+    flat['FacilityRank'] = (facility_groups - first_groups).astype('int32')
+    flat['Facility'] = pd.Categorical(flat['Facility'], categories=pd.unique(flat['Facility'].dropna()))
+
+    # findDesired compared contingencies with ==, so a missing contingency never matched anything.
+    flat = flat.dropna(subset=['Date', 'Hour', 'Facility', 'Contingency'])
+    flat['Hour'] = flat['Hour'].astype('int8')
+
+    for column in ['Contingency', 'FacilityType', 'PeakType']:
+        flat[column] = flat[column].astype('category')
+
+    return flat[mapping_columns + ['FacilityRank']].reset_index(drop=True)
+
+
+def blank_categorical(values: np.ndarray) -> pd.Categorical:
+    """
+    A categorical of string values in which missing values are blank strings.
+    """
+    return pd.Categorical(pd.Series(values, dtype=object).fillna(""))
+
+
+class ConstraintAggregator:
+    """
+    Matches SSPSF rows to the Yes Energy constraints and builds the RT summary, column by column.
+
+    Inputs:
+        - yes_table: The Yes Energy RT constraint table (see flatten_table).
+        - nodes: The settlement points to keep.
+    """
+
+    def __init__(self, yes_table: pd.DataFrame, nodes: Iterable[str]):
+        self.nodes = set(nodes)
+        self.yes = flatten_table(yes_table)
+        self.resolver = ConstraintResolver(self.yes['Facility'].cat.categories)
+
+    def convert(self, batch: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converts a batch of raw SSPSF rows in one pass:
+            1) Filters out the rows to only include the desired nodes.
+            2) Adds the Hour_Ending of every file, from the first timestamp of the file.
+            3) Matches every row to the mapping for its PeakType, Shadow_Price, Facility_Type and the
+               full Constraint_Name. The SSPSF constraint name is kept as SSPSF_Constraint_Name.
+
+        Inputs:
+            - batch: The rows of one or more CSV files, with the File_Stamp column holding the first timestamp
+              of each row's file, i.e. from zip_pool.read_zip_files.
+
+        Output:
+            - The converted rows, in the order of batch.
+        """
+        batch = batch[batch['Settlement_Point'].isin(self.nodes)].reset_index(drop=True)
+        if len(batch) == 0:
+            return pd.DataFrame()
+
+        # The hour after the first timestamp of each file. Hour ending 24 keeps the date of that next hour.
+        file_stamps = batch.pop('File_Stamp')
+        hours = hour_ending(file_stamps).to_numpy()
+        dates = (file_stamps + timedelta(hours=1)).dt.normalize().to_numpy()
+
+        rows = pd.DataFrame({
+            '_row': np.arange(len(batch)),
+            'Date': dates,
+            'Hour': hours,
+            'Contingency': pd.Categorical(batch['Contingency_Name'], categories=self.yes['Contingency'].cat.categories),
+        })
+
+        candidates = rows.merge(self.yes, on=['Date', 'Hour', 'Contingency'], how='inner', sort=False)
+
+        # Keep the candidates whose full facility name contains the row's constraint name.
+        constraints = batch['Constraint_Name'].to_numpy()[candidates['_row'].to_numpy()]
+        contained = self.resolver.contains(pd.Series(constraints), candidates['Facility'])
+        contained = contained & pd.notna(constraints)
+
+        # findDesired returned the first entry of the first facility (in mapping order) that matched.
+        matched = candidates[contained].sort_values(['_row', 'FacilityRank', 'Position'], kind='stable')
+        matched = matched.drop_duplicates(subset='_row', keep='first')
+        matched_rows = matched['_row'].to_numpy()
+
+        shadow_prices = np.full(len(batch), np.nan)
+        shadow_prices[matched_rows] = matched['ShadowPrice'].to_numpy(dtype=float)
+
+        columns = {}
+        for name, source in [('PeakType', 'PeakType'), ('Facility_Type', 'FacilityType'), ('Constraint_Name', 'Facility')]:
+            values = np.full(len(batch), None, dtype=object)
+            values[matched_rows] = matched[source].astype(object).to_numpy()
+            columns[name] = blank_categorical(values)
+
+        # Same column layout as the row-by-row convert_csv.
+        batch.insert(1, 'Hour_Ending', hours)
+        batch.insert(2, 'PeakType', columns['PeakType'])
+        batch['Shadow_Price'] = shadow_prices
+        batch['Facility_Type'] = columns['Facility_Type']
+        batch['SSPSF_Constraint_Name'] = batch['Constraint_Name']
+        batch['Constraint_Name'] = columns['Constraint_Name']
+
+        return batch
+
+    def summary_rows(self, raw_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Reduces converted rows to the columns of the RT summary (see summary_columns), keeping only the
+        desired nodes and computing the ShadowShift.
+
+        Inputs:
+            - raw_data: Converted rows, i.e. the concatenated output of convert.
+
+        Output:
+            - One summary row per converted row, in the order of raw_data.
+        """
+        data = raw_data[raw_data['Settlement_Point'].isin(self.nodes)]
+        rows = data[summary_columns[:5]].reset_index(drop=True)
+
+        shadow_prices = pd.to_numeric(data['Shadow_Price'], errors='coerce').to_numpy(dtype=float)
+        rows['Shift_Factor'] = pd.to_numeric(data['Shift_Factor'], errors='coerce').to_numpy(dtype=float)
+        rows['Shadow_Shift'] = shadow_prices * rows['Shift_Factor'].to_numpy()
+
+        return rows
+
+    def summarize(self, raw_data: pd.DataFrame) -> Dict[str, Dict[str, List]]:
+        """
+        Groups converted rows into the nested summary of RT_Constraint_Aggregator.py (see nest_summary).
+        """
+        return nest_summary(self.summary_rows(raw_data))
+
+
+def nest_summary(rows: pd.DataFrame) -> Dict[str, Dict[str, List]]:
+    """
+    Nests summary rows into the format of the old processed_{year}_summary.json.
+
+    Inputs:
+        - rows: A DataFrame with the columns of summary_columns, i.e. from summary_rows or the summary store.
+
+    Output:
+        - summary, where summary[a][b] gives a list of 5-element tuples corresponding to
+            - a: The Settlement Point (such as HB_North)
+            - b: The full date in MM/DD/YYYY HH:MM:SS format
+
+        Each tuple (v, w, x, y, z) in summary[a][b] gives
+            - v: The Contingency Name
+            - w: The Constraint Name
+            - x: The Peak Type
+            - y: The Shift Factor
+            - z: The 'ShadowShift' - the Shift Factor multiplied by the Shadow Price
+
+        Settlement points, timestamps and tuples keep the order in which they first appear in rows.
+    """
+    if len(rows) == 0:
+        return {}
+
+    # Number settlement points and (settlement point, timestamp) groups by first appearance, and sort
+    # by both. Within a settlement point, its timestamps then come in the order they first appear.
+    settlement_codes = rows.groupby('Settlement_Point', sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    group_codes = rows.groupby(['Settlement_Point', 'SCED_Time_Stamp'], sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    order = np.lexsort((group_codes, settlement_codes))
+
+    entries = list(zip(*[rows[column].astype(object).to_numpy()[order].tolist() for column in summary_columns[2:5]],
+                       rows['Shift_Factor'].to_numpy(dtype=float)[order].tolist(),
+                       rows['Shadow_Shift'].to_numpy(dtype=float)[order].tolist()))
+
+    sorted_groups = group_codes[order]
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(sorted_groups)) + 1])
+    ends = np.concatenate([starts[1:], [len(order)]])
+
+    settlements = rows['Settlement_Point'].astype(object).to_numpy()[order][starts].tolist()
+    timestamps = rows['SCED_Time_Stamp'].astype(object).to_numpy()[order][starts].tolist()
+
+    summary = {}
+    for settlement, timestamp, start, end in zip(settlements, timestamps, starts.tolist(), ends.tolist()):
+        summary.setdefault(settlement, {})[timestamp] = entries[start:end]
+
+    return summary
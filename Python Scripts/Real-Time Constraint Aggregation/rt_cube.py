@@ -0,0 +1,182 @@
+import os
+import pandas as pd
+from datetime import date
+from typing import Iterable, List
+from rt_aggregation import timestamp_format
+from rt_summary_store import SummaryStore
+
+"""
+Pre-aggregated shadow price x shift factor cube of the real-time constraints.
+
+Monthly_SF_Combine.py used to re-read a month of 130_SSPSF files and walk every hour and constraint of the
+Yes Energy JSON for every row (compute_avg_SP) to average shadow prices, and any other month, node or
+constraint meant running it again. ConstraintCube keeps the sums instead. Every converted SSPSF row (see
+ConstraintAggregator.convert) is added once, into one Parquet file per SCED day:
+
+    {cube_root}/year=YYYY/YYYY-MM-DD.parquet
+
+with one row per (Hour_Ending, Constraint_Name, Contingency_Name, Settlement_Point) of the day and the
+measures of measure_columns: the sum and count of the shift factors, and the sum, count, min and max of the
+shadow price and of the shift factor times the shadow price (SF x SP). Constraint_Name is the constraint
+name of the SSPSF file, and Facility_Name the full name of the Yes Energy constraint it was matched to, or
+an empty name without shadow prices (an SP_Count of 0) if it was not matched. Only the nodes converted by
+RT_Constraint_Aggregator.py are in the cube.
+
+Cubes written before Facility_Name was added kept the full name as Constraint_Name, so the cube moved to
+a new folder and RT_Constraint_Aggregator.py backfills it.
+
+Cells are hourly and do not keep the SCED timestamps they were added from, so a day's partition can only be
+rebuilt from every interval of the day. Runs select files by posting date, and the last interval of a day
+is posted the next day, so upsert takes the days whose files were all converted (see
+RT_Constraint_Aggregator.py::whole_days) and leaves the other days as stored.
+
+Months, hours of day, nodes and constraints are then slices of the cube, combined with rollup:
+
+    cube = ConstraintCube()
+    cube.upsert(converted, days=whole_days(posting_days))
+    monthly = cube.rollup(date(2024, 6, 1), date(2024, 8, 31), by=['Month', 'Hour_Ending', 'Constraint_Name', 'Settlement_Point'])
+"""
+
+# Global Variables and Parameters
+cube_root = os.environ.get("MIS_RT_CUBE", "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Data/Aggregated RT Constraint Data/RT Cube v2")
+
+# Columns identifying one cell of a day, the matched Yes Energy name kept with it, and the measures kept for it.
+cell_columns = ['Hour_Ending', 'Constraint_Name', 'Contingency_Name', 'Settlement_Point']
+facility_column = 'Facility_Name'
+measure_columns = ['SF_Sum', 'SF_Count', 'SP_Sum', 'SP_Count', 'SP_Min', 'SP_Max', 'SFSP_Sum', 'SFSP_Min', 'SFSP_Max']
+
+# How each measure combines across cells.
+measure_rollup = {'SF_Sum': 'sum', 'SF_Count': 'sum', 'SP_Sum': 'sum', 'SP_Count': 'sum', 'SP_Min': 'min', 'SP_Max': 'max',
+                  'SFSP_Sum': 'sum', 'SFSP_Min': 'min', 'SFSP_Max': 'max'}
+
+
+def cube_rows(converted: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates converted SSPSF rows into cells of the cube.
+
+    Inputs:
+        - converted: Rows from ConstraintAggregator.convert, with SCED_Time_Stamp, Hour_Ending, SSPSF_Constraint_Name,
+          Constraint_Name (the matched full name), Contingency_Name, Settlement_Point, Shift_Factor and Shadow_Price.
+
+    Output:
+        - One row per (Day, cell) with Facility_Name, the full name matched to the cell's rows ('' if none),
+          and the columns of measure_columns. Every row of a cell shares the date, hour and contingency the
+          match depends on, so it has a single Facility_Name. SF x SP only counts rows with a shadow price,
+          like SP_Count.
+    """
+    shift_factors = pd.to_numeric(converted['Shift_Factor'], errors='coerce').to_numpy(dtype=float)
+    shadow_prices = pd.to_numeric(converted['Shadow_Price'], errors='coerce').to_numpy(dtype=float)
+
+    frame = pd.DataFrame({
+        'Day': pd.to_datetime(converted['SCED_Time_Stamp'], format=timestamp_format).dt.normalize().to_numpy(),
+        'Hour_Ending': converted['Hour_Ending'].to_numpy(dtype='int8'),
+        'Constraint_Name': pd.Categorical(converted['SSPSF_Constraint_Name'].astype(object).fillna("")),
+        facility_column: pd.Categorical(converted['Constraint_Name'].astype(object).fillna("")),
+        'Contingency_Name': pd.Categorical(converted['Contingency_Name'].astype(object)),
+        'Settlement_Point': pd.Categorical(converted['Settlement_Point'].astype(object)),
+        'SF': shift_factors,
+        'SP': shadow_prices,
+        'SFSP': shift_factors * shadow_prices,
+    })
+
+    cells = frame.groupby(['Day'] + cell_columns + [facility_column], sort=True, observed=True).agg(
+        SF_Sum=('SF', 'sum'), SF_Count=('SF', 'count'),
+        SP_Sum=('SP', 'sum'), SP_Count=('SP', 'count'), SP_Min=('SP', 'min'), SP_Max=('SP', 'max'),
+        SFSP_Sum=('SFSP', 'sum'), SFSP_Min=('SFSP', 'min'), SFSP_Max=('SFSP', 'max'),
+    ).reset_index()
+
+    return cells.astype({'SF_Count': 'int32', 'SP_Count': 'int32'})
+
+
+class ConstraintCube(SummaryStore):
+    """
+    Reader and writer of the day partitions of the RT constraint cube. Partitions are laid out, listed
+    and written like the summary store's.
+
+    Inputs:
+        - root: The folder holding the year=YYYY partition folders.
+    """
+
+    def __init__(self, root: str = cube_root):
+        super().__init__(root)
+
+    def upsert(self, converted: pd.DataFrame, days: Iterable[date] = None) -> List[date]:
+        """
+        Aggregates converted rows and replaces the partition of every given SCED day they cover.
+
+        Inputs:
+            - converted: Rows from ConstraintAggregator.convert.
+            - days: The SCED days whose intervals are all in converted, or None if every day is whole. The
+              other days of converted are left as stored, since their cells would miss intervals.
+
+        Output:
+            - The days written.
+        """
+        if len(converted) == 0:
+            return []
+
+        days = None if days is None else set(days)
+
+        written = []
+        for day, part in cube_rows(converted).groupby('Day', sort=True):
+            if days is not None and day.date() not in days:
+                continue
+
+            self.write_day(day.date(), part.reset_index(drop=True))
+            written.append(day.date())
+
+        return written
+
+    def read(self, start: date, end: date, settlements: Iterable[str] = None, constraints: Iterable[str] = None,
+             columns: List[str] = None) -> pd.DataFrame:
+        """
+        Reads the cells of every stored day within [start, end].
+
+        Inputs:
+            - start, end: The inclusive range of SCED days.
+            - settlements: Only read these settlement points, or all if None.
+            - constraints: Only read these SSPSF constraint names, or all if None.
+            - columns: Only read these columns, or all if None.
+
+        Output:
+            - The cells of the range, day by day, or an empty DataFrame if no day is stored.
+        """
+        filters = []
+        if settlements is not None:
+            filters.append(('Settlement_Point', 'in', list(settlements)))
+        if constraints is not None:
+            filters.append(('Constraint_Name', 'in', list(constraints)))
+
+        parts = [pd.read_parquet(self.day_path(day), engine="pyarrow", columns=columns, filters=filters or None)
+                 for day in self.days(start, end)]
+
+        if len(parts) == 0:
+            return pd.DataFrame(columns=columns or ['Day'] + cell_columns + [facility_column] + measure_columns)
+
+        # Categories differ between days, so combine them as plain strings.
+        return pd.concat([part.astype({column: object for column in part.select_dtypes('category').columns}) for part in parts],
+                         ignore_index=True)
+
+    def rollup(self, start: date, end: date, by: List[str], settlements: Iterable[str] = None,
+               constraints: Iterable[str] = None) -> pd.DataFrame:
+        """
+        Combines the cells of a range into coarser cells and computes their averages.
+
+        Inputs:
+            - start, end: The inclusive range of SCED days.
+            - by: The columns to keep, from Day, Month (the 'YYYY-MM' of the day), cell_columns and Facility_Name.
+            - settlements, constraints: Only combine these settlement points and constraints, or all if None.
+
+        Output:
+            - One row per value of by, sorted by it, with the combined measures and Average_SF, Average_SP
+              and Average_SFSP. Averages without any value are NaN.
+        """
+        cells = self.read(start, end, settlements, constraints)
+        cells['Month'] = pd.to_datetime(cells['Day']).dt.strftime('%Y-%m')
+
+        combined = cells.groupby(by, sort=True).agg(measure_rollup).reset_index()
+        combined['Average_SF'] = combined['SF_Sum'] / combined['SF_Count'].where(combined['SF_Count'] > 0)
+        combined['Average_SP'] = combined['SP_Sum'] / combined['SP_Count'].where(combined['SP_Count'] > 0)
+        combined['Average_SFSP'] = combined['SFSP_Sum'] / combined['SP_Count'].where(combined['SP_Count'] > 0)
+
+        return combined
@@ -0,0 +1,171 @@
+import os
+import json
+import pandas as pd
+from datetime import date, timedelta
+from typing import List
+from rt_summary_store import SummaryStore
+
+"""
+Rolling, day-partitioned view of the path deltas of a portfolio.
+
+Delta_Table_Creator.py used to load the summary of the whole year, loop over product(source_list, sink_list)
+for every timestamp of every path, and only then cut the result down to the last 30 days, so every daily run
+paid for the whole history. DeltaView keeps the delta rows of every day of the window in their own Parquet
+file instead:
+
+    {root}/year=YYYY/YYYY-MM-DD.parquet
+
+refresh computes the days of the window that are missing, or whose summary partition was rewritten since
+(see rt_summary_store.py), joins every path of the portfolio at once for that day only, and deletes the days
+that fell out of the window. A daily run therefore costs about one day times the number of paths. The view
+remembers its paths and starts over when the portfolio changes.
+
+    view = DeltaView(os.path.join(delta_view_root, "759847"))
+    view.refresh(paths_df, SummaryStore(), date.today(), window_days=30)
+    last_30 = view.read(date.today() - timedelta(days=30), date.today())
+"""
+
+# Global Variables and Parameters
+delta_view_root = os.environ.get("MIS_RT_DELTA_VIEW", "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Data/Aggregated RT Constraint Data/RT Delta View")
+
+# Columns of the delta rows, in output order.
+delta_columns = ['Date', 'HourEnding', 'Interval', 'PeakType', 'Constraint', 'Contingency', 'Path', 'Source SF',
+                 'Sink SF', '$ Cong MWH']
+
+# Shift factors at or below this magnitude, at either end of a path, are left out.
+min_shift_factor = 0.001
+
+
+def day_deltas(rows: pd.DataFrame, paths: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes the delta rows of every path from the summary rows of one day.
+
+    Inputs:
+        - rows: Summary rows, i.e. from SummaryStore.read.
+        - paths: The paths, with SOURCE and SINK columns.
+
+    Output:
+        - One row per (path, timestamp, contingency, constraint, peak type) where both the source and the sink
+          have a shift factor above min_shift_factor, in the columns of delta_columns.
+    """
+    keys = ['SCED_Time_Stamp', 'Contingency_Name', 'Constraint_Name', 'PeakType']
+    rows = rows[rows['Shift_Factor'].abs() > min_shift_factor][['Settlement_Point'] + keys + ['Shift_Factor', 'Shadow_Shift']]
+
+    # Join all paths at once: first their sources, then their sinks on the same keys.
+    merged = paths.merge(rows, left_on='SOURCE', right_on='Settlement_Point', how='inner')
+    merged = merged.merge(rows, left_on=['SINK'] + keys, right_on=['Settlement_Point'] + keys, how='inner', suffixes=('', '_sink'))
+
+    stamps = merged['SCED_Time_Stamp'].astype(str)
+    deltas = pd.DataFrame({
+        'Date': stamps.str[:10],
+        'HourEnding': stamps.str[11:13].astype(int) + 1,
+        'Interval': stamps.str[14:16].astype(int) // 5 + 1,
+        'PeakType': merged['PeakType'],
+        'Constraint': merged['Constraint_Name'],
+        'Contingency': merged['Contingency_Name'],
+        'Path': merged['SOURCE'].astype(str) + '+' + merged['SINK'].astype(str),
+        'Source SF': merged['Shift_Factor'],
+        'Sink SF': merged['Shift_Factor_sink'],
+        '$ Cong MWH': merged['Shadow_Shift'] - merged['Shadow_Shift_sink'],
+    })
+
+    return deltas.drop_duplicates(subset=delta_columns[:7])
+
+
+class DeltaView(SummaryStore):
+    """
+    Reader and maintainer of the day partitions of a portfolio's rolling delta view. Partitions are laid out,
+    listed and written like the summary store's.
+
+    Inputs:
+        - root: The folder of this portfolio's view.
+    """
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.paths_file = os.path.join(root, "paths.json")
+
+    def stale_days(self, summary_store: SummaryStore, start: date, end: date) -> List[date]:
+        """
+        The summarized days within [start, end] whose view partition is missing or older than their summary.
+        """
+        stale = []
+        for day in summary_store.days(start, end):
+            view_path = self.day_path(day)
+            if not os.path.isfile(view_path) or os.path.getmtime(view_path) < os.path.getmtime(summary_store.day_path(day)):
+                stale.append(day)
+
+        return stale
+
+    def paths_changed(self, paths: pd.DataFrame) -> bool:
+        """
+        Whether the paths differ from those the view was built for.
+        """
+        path_names = sorted(set(paths['SOURCE'].astype(str) + '+' + paths['SINK'].astype(str)))
+
+        try:
+            with open(self.paths_file, "r") as paths_json:
+                known = json.load(paths_json)
+        except (FileNotFoundError, json.JSONDecodeError):
+            known = None
+
+        return known != path_names
+
+    def reset_paths(self, paths: pd.DataFrame):
+        """
+        Drops every partition if the paths differ from those the view was built for, and records the paths.
+        """
+        if not self.paths_changed(paths):
+            return
+
+        path_names = sorted(set(paths['SOURCE'].astype(str) + '+' + paths['SINK'].astype(str)))
+
+        for day in self.days():
+            os.remove(self.day_path(day))
+
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.paths_file, "w") as paths_json:
+            json.dump(path_names, paths_json)
+
+    def refresh(self, paths: pd.DataFrame, summary_store: SummaryStore, end: date, window_days: int = 30) -> List[date]:
+        """
+        Brings the view up to date for the window [end - window_days, end].
+
+        Inputs:
+            - paths: The portfolio paths, with SOURCE and SINK columns.
+            - summary_store: The RT summary the deltas are computed from.
+            - end: The last day of the window.
+            - window_days: How many days before end the window reaches back.
+
+        Output:
+            - The days computed.
+        """
+        start = end - timedelta(days=window_days)
+        paths = paths[['SOURCE', 'SINK']].drop_duplicates()
+        self.reset_paths(paths)
+
+        nodes = set(paths['SOURCE']) | set(paths['SINK'])
+        computed = []
+
+        for day in self.stale_days(summary_store, start, end):
+            deltas = day_deltas(summary_store.read(day, day, settlements=nodes), paths)
+            self.write_day(day, deltas.reset_index(drop=True))
+            computed.append(day)
+            print(f"Deltas computed for {day}: {len(deltas)} rows")
+
+        # Days that fell out of the window are no longer needed.
+        for day in self.days(end=start - timedelta(days=1)):
+            os.remove(self.day_path(day))
+
+        return computed
+
+    def read(self, start: date, end: date) -> pd.DataFrame:
+        """
+        Reads the delta rows of every stored day within [start, end], oldest day first.
+        """
+        parts = [pd.read_parquet(self.day_path(day), engine="pyarrow") for day in self.days(start, end)]
+
+        if len(parts) == 0:
+            return pd.DataFrame(columns=delta_columns)
+
+        return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,199 @@
+import os
+import json
+import argparse
+import pandas as pd
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+from rt_aggregation import summary_columns, nest_summary, timestamp_format
+
+"""
+Day-partitioned store of the real-time constraint summary.
+
+RT_Constraint_Aggregator.py used to load the whole processed_{year}_summary.json, replace a few days and
+write the entire file back, so every nightly run paid for parsing and serializing a year of data (and for
+holding it in memory as nested dictionaries) just to append a day. SummaryStore keeps one Parquet file per
+SCED day instead:
+
+    {summary_root}/year=YYYY/YYYY-MM-DD.parquet
+
+with one row per (settlement point, SCED timestamp, contingency, constraint) and the columns of
+rt_aggregation.summary_columns, plus the Day and Hour_Ending they are keyed by. A run only rewrites the
+days it converted, and readers only open the days they ask for. Runs select files by posting date, so the
+first SCED interval of a day is converted with the files of the next day; a run's rows are therefore merged
+into the stored day, replacing only the SCED timestamps they cover.
+
+    store = SummaryStore()
+    store.upsert(aggregator.summary_rows(converted))
+    rows = store.read(date(2024, 6, 1), date(2024, 6, 30), settlements=['HB_NORTH', 'HB_HOUSTON'])
+    mapping = nest_summary(rows)
+
+Existing JSON summaries are imported once with:
+
+    python rt_summary_store.py --import "processed_2024_summary.json"
+"""
+
+# Global Variables and Parameters
+summary_root = os.environ.get("MIS_RT_SUMMARY", "//pzpwcmfs01/CA/11_Transmission Analysis/ERCOT/101 - Misc/CRR Limit Aggregates/Data/Aggregated RT Constraint Data/RT Summary")
+
+# Format of the day in the partition file names.
+day_format = "%Y-%m-%d"
+
+
+class SummaryStore:
+    """
+    Reader and writer of the day partitions of the RT summary.
+
+    Inputs:
+        - root: The folder holding the year=YYYY partition folders.
+    """
+
+    def __init__(self, root: str = summary_root):
+        self.root = root
+
+    def day_path(self, day: date) -> str:
+        return os.path.join(self.root, f"year={day.year}", f"{day.strftime(day_format)}.parquet")
+
+    def days(self, start: date = None, end: date = None) -> List[date]:
+        """
+        The stored days within [start, end], oldest first. Missing bounds are open.
+        """
+        stored = []
+        if not os.path.isdir(self.root):
+            return stored
+
+        for year_folder in os.listdir(self.root):
+            if not year_folder.startswith("year="):
+                continue
+
+            year = int(year_folder[len("year="):])
+            if (start is not None and year < start.year) or (end is not None and year > end.year):
+                continue
+
+            for name in os.listdir(os.path.join(self.root, year_folder)):
+                if name.endswith(".parquet"):
+                    day = datetime.strptime(name[:-len(".parquet")], day_format).date()
+
+                    if (start is None or day >= start) and (end is None or day <= end):
+                        stored.append(day)
+
+        return sorted(stored)
+
+    def write_day(self, day: date, rows: pd.DataFrame):
+        """
+        Replaces the partition of one day with the given summary rows. The file is written next to the
+        partition first and then moved over it, so readers never see half a day.
+        """
+        path = self.day_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        rows.to_parquet(path + ".tmp", engine="pyarrow", index=False)
+        os.replace(path + ".tmp", path)
+
+    def merge_day(self, day: date, rows: pd.DataFrame, key: str = 'SCED_Time_Stamp'):
+        """
+        Merges rows into the partition of one day. Stored rows whose key is among the given rows' are
+        replaced, the others are kept, and the day is written back in key order.
+        """
+        path = self.day_path(day)
+
+        if os.path.isfile(path):
+            stored = pd.read_parquet(path, engine="pyarrow")
+            stored = stored[~stored[key].isin(rows[key].unique())]
+            categories = rows.select_dtypes('category').columns
+
+            # Categories differ between runs, so combine them as plain strings.
+            rows = pd.concat([part.astype({column: object for column in categories}) for part in [stored, rows]],
+                             ignore_index=True)
+            rows = rows.sort_values(key, kind='stable').astype({column: 'category' for column in categories})
+
+        self.write_day(day, rows.reset_index(drop=True))
+
+    def upsert(self, rows: pd.DataFrame) -> List[date]:
+        """
+        Splits summary rows by SCED day and merges them into the partition of every day they cover (see
+        merge_day). A run holds every row of the SCED timestamps it converted, but not always every
+        timestamp of a day, so only the timestamps present in rows are replaced.
+
+        Inputs:
+            - rows: Summary rows with the columns of summary_columns, i.e. from ConstraintAggregator.summary_rows.
+
+        Output:
+            - The days written.
+        """
+        if len(rows) == 0:
+            return []
+
+        stamps = pd.to_datetime(rows['SCED_Time_Stamp'], format=timestamp_format)
+        rows = rows[summary_columns].copy()
+        rows.insert(0, 'Day', stamps.dt.normalize())
+        rows.insert(1, 'Hour_Ending', (stamps.dt.hour + 1).astype('int8'))
+
+        for column in ['Settlement_Point', 'Contingency_Name', 'Constraint_Name', 'PeakType']:
+            rows[column] = rows[column].astype('category')
+
+        written = []
+        for day, part in rows.groupby('Day', sort=True):
+            self.merge_day(day.date(), part.reset_index(drop=True))
+            written.append(day.date())
+
+        return written
+
+    def read(self, start: date, end: date, settlements: Iterable[str] = None, columns: List[str] = None) -> pd.DataFrame:
+        """
+        Reads the summary rows of every stored day within [start, end].
+
+        Inputs:
+            - start, end: The inclusive range of SCED days.
+            - settlements: Only read these settlement points, or all if None.
+            - columns: Only read these columns, or all if None.
+
+        Output:
+            - The rows of the range, day by day, or an empty DataFrame if no day is stored.
+        """
+        filters = None if settlements is None else [('Settlement_Point', 'in', list(settlements))]
+
+        parts = [pd.read_parquet(self.day_path(day), engine="pyarrow", columns=columns, filters=filters)
+                 for day in self.days(start, end)]
+
+        if len(parts) == 0:
+            return pd.DataFrame(columns=columns or ['Day', 'Hour_Ending'] + summary_columns)
+
+        # Categories differ between days, so combine them as plain strings.
+        rows = pd.concat([part.astype({column: object for column in part.select_dtypes('category').columns}) for part in parts],
+                         ignore_index=True)
+        return rows
+
+    def read_nested(self, start: date, end: date, settlements: Iterable[str] = None) -> Dict[str, Dict[str, List]]:
+        """
+        Reads a range in the nested format of the old processed_{year}_summary.json (see nest_summary).
+        """
+        return nest_summary(self.read(start, end, settlements))
+
+    def import_json(self, json_path: str) -> List[date]:
+        """
+        Imports a processed_{year}_summary.json into the store, replacing the timestamps it covers.
+        """
+        with open(json_path, "r") as json_file:
+            summary = json.load(json_file)
+
+        records = [(settlement, stamp, *entry) for settlement, stamps in summary.items()
+                   for stamp, entries in stamps.items() for entry in entries]
+
+        return self.upsert(pd.DataFrame.from_records(records, columns=summary_columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the day-partitioned RT constraint summary.")
+    parser.add_argument("--import", dest="import_path", help="Import a processed_{year}_summary.json into the store.")
+    parser.add_argument("--days", type=int, default=30, help="List the stored days within this many days of today.")
+    args = parser.parse_args()
+
+    store = SummaryStore()
+
+    if args.import_path:
+        imported = store.import_json(args.import_path)
+        print(f"Imported {len(imported)} days from {args.import_path}.")
+
+    else:
+        for stored_day in store.days(date.today() - timedelta(days=args.days)):
+            print(stored_day.strftime(day_format))
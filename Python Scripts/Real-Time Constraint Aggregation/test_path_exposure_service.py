@@ -0,0 +1,80 @@
+import os
+import json
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from rt_aggregation import summary_columns
+from rt_summary_store import SummaryStore
+from path_exposure_service import PathExposureService, start_server
+
+"""
+Behaviour tests of the path exposure query service and its HTTP endpoint. Run with pytest from this folder.
+"""
+
+
+def summary(day: str) -> pd.DataFrame:
+    return pd.DataFrame([
+        ("HB_NORTH", f"{day} 13:05:12", "DSANMIL5", "SANDOW_MILAM_1", "WDPEAK", 0.25, 2.5),
+        ("HB_HOUSTON", f"{day} 13:05:12", "DSANMIL5", "SANDOW_MILAM_1", "WDPEAK", -0.125, -1.25),
+        ("HB_NORTH", f"{day} 13:10:12", "BASE CASE", "CEDAR_CREEK", "WDPEAK", 0.5, 1.0),
+        ("HB_HOUSTON", f"{day} 13:10:12", "BASE CASE", "CEDAR_CREEK", "WDPEAK", 0.25, 0.5),
+        # Not matched to a Yes Energy constraint, so without a peak type or shadow price.
+        ("HB_NORTH", f"{day} 13:05:12", "DCEDMIL5", "", "", 0.5, np.nan),
+        ("HB_HOUSTON", f"{day} 13:05:12", "DCEDMIL5", "", "", 0.25, np.nan),
+    ], columns=summary_columns)
+
+
+@pytest.fixture
+def service(tmp_path):
+    store = SummaryStore(os.path.join(tmp_path, "summary"))
+    store.upsert(pd.concat([summary("06/01/2024"), summary("06/02/2024")]))
+    return PathExposureService(store)
+
+
+def test_exposure_only_keeps_rows_with_a_peak_type(service):
+    rows = service.exposure("HB_NORTH", "HB_HOUSTON", date(2024, 6, 1), date(2024, 6, 1))
+
+    assert rows[['Constraint', 'Contingency', 'Path', '$ Cong MWH']].values.tolist() == [
+        ["SANDOW_MILAM_1", "DSANMIL5", "HB_NORTH+HB_HOUSTON", 3.75], ["CEDAR_CREEK", "BASE CASE", "HB_NORTH+HB_HOUSTON", 0.5]]
+    assert service.exposure("HB_NORTH", "HB_HOUSTON", date(2024, 6, 1), date(2024, 6, 2), constraint="sandow")['Date'].tolist() == [
+        "06/01/2024", "06/02/2024"]
+    assert service.exposure("HB_NORTH", "LZ_WEST", date(2024, 6, 1), date(2024, 6, 2)).empty
+
+
+def test_summary_totals_the_range_by_constraint(service):
+    result = service.summary("HB_NORTH", "HB_HOUSTON", date(2024, 6, 1), date(2024, 6, 2))
+
+    assert result["rows"] == 4
+    assert result["cong_mwh"] == 8.5
+    assert result["average_delta"] == 0.3125
+    assert [(entry["constraint"], entry["intervals"], entry["cong_mwh"]) for entry in result["by_constraint"]] == [
+        ("SANDOW_MILAM_1", 2, 7.5), ("CEDAR_CREEK", 2, 1.0)]
+
+
+def test_http_round_trip_and_errors(service, monkeypatch):
+    server = start_server(service)
+    base = f"http://127.0.0.1:{server.server_address[1]}/exposure"
+
+    try:
+        with urlopen(f"{base}?source=HB_NORTH&sink=HB_HOUSTON&start=2024-06-01&end=2024-06-02") as response:
+            assert response.status == 200
+            assert json.loads(response.read())["cong_mwh"] == 8.5
+
+        with pytest.raises(HTTPError) as bad_request:
+            urlopen(f"{base}?source=HB_NORTH&sink=HB_HOUSTON&start=June")
+        assert bad_request.value.code == 400
+
+        def fail(*args, **kwargs):
+            raise OSError("summary store unavailable")
+
+        monkeypatch.setattr(service, "exposure", fail)
+        with pytest.raises(HTTPError) as failed:
+            urlopen(f"{base}?source=HB_NORTH&sink=HB_HOUSTON&start=2024-06-01&end=2024-06-02")
+        assert failed.value.code == 500
+        assert json.loads(failed.value.read()) == {"error": "OSError: summary store unavailable"}
+    finally:
+        server.shutdown()
+        server.server_close()
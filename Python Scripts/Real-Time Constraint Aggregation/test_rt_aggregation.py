@@ -0,0 +1,119 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from datetime import datetime, timedelta
+from rt_aggregation import ConstraintAggregator
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MIS Common"))
+from constraint_resolver import ConstraintResolver
+
+"""
+Behaviour tests of the columnar RT conversion, against the row-by-row findDesired/convert_csv it replaced.
+Run with pytest from this folder.
+"""
+
+nodes = ["HB_NORTH", "HB_HOUSTON"]
+
+# XYZ_A comes first in hour 13 and XYZ_B in hour 14, so the facility findDesired visits first changes
+# from one hour to the next.
+yes_table = pd.DataFrame([
+    ("06/01/2024 00:00:00", 13, "XYZ_A", "DSANMIL5", 40.0, "LINE", "WDPEAK"),
+    ("06/01/2024 00:00:00", 13, "XYZ_B", "DSANMIL5", 30.0, "LINE", "WDPEAK"),
+    ("06/01/2024 00:00:00", 14, "XYZ_B", "DSANMIL5", 30.0, "LINE", "WDPEAK"),
+    ("06/01/2024 00:00:00", 14, "XYZ_A", "DSANMIL5", 40.0, "LINE", "WDPEAK"),
+    ("06/01/2024 00:00:00", 14, "XYZ_A", "BASE CASE", 45.0, "LINE", "WDPEAK"),
+    ("06/01/2024 00:00:00", 14, "SANDOW_MILAM_1", "DSANMIL5", 12.5, "XFMR", "WDPEAK"),
+    ("06/01/2024 00:00:00", 14, "SANDOW_MILAM_1", "DSANMIL5", 99.0, "XFMR", "WDPEAK"),
+    ("06/02/2024 00:00:00", 24, "SANDOW_MILAM_1", "DSANMIL5", 7.0, "XFMR", "WEPEAK"),
+], columns=["DATETIME", "HOURENDING", "REPORTED_NAME", "CONTINGENCY", "SHADOWPRICE", "FACILITYTYPE", "PEAKTYPE"])
+
+
+def sspsf_file(stamp: str, rows) -> pd.DataFrame:
+    df = pd.DataFrame([(stamp, constraint, contingency, settlement, shift_factor)
+                       for constraint, contingency, settlement, shift_factor in rows],
+                      columns=["SCED_Time_Stamp", "Constraint_Name", "Contingency_Name", "Settlement_Point", "Shift_Factor"])
+    df["File_Stamp"] = pd.to_datetime(df["SCED_Time_Stamp"].iloc[0], format="%m/%d/%Y %H:%M:%S")
+    return df
+
+
+files = [
+    sspsf_file("06/01/2024 12:05:12", [("XYZ", "DSANMIL5", "HB_NORTH", 0.25), ("XYZ_B", "DSANMIL5", "HB_NORTH", 0.5)]),
+    sspsf_file("06/01/2024 13:05:12", [
+        ("XYZ", "DSANMIL5", "HB_NORTH", 0.25),
+        ("XYZ", "BASE CASE", "HB_HOUSTON", -0.125),
+        ("SANDOW", "DSANMIL5", "HB_NORTH", 0.75),
+        ("CEDAR", "DSANMIL5", "HB_NORTH", 0.1),
+        ("XYZ", "DSANMIL5", "LZ_WEST", 0.3),
+    ]),
+    sspsf_file("06/01/2024 23:05:12", [("SANDOW", "DSANMIL5", "HB_HOUSTON", 0.5)]),
+]
+
+
+def old_mapping(table: pd.DataFrame):
+    """
+    process_mapping's nested mapping[date][hour][facility] lists.
+    """
+    res = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    for _, row in table.iterrows():
+        res[row['DATETIME'][:10]][str(row['HOURENDING'])][row['REPORTED_NAME']].append(
+            (row['CONTINGENCY'], row['SHADOWPRICE'], row['FACILITYTYPE'], row['PEAKTYPE']))
+    return res
+
+
+def old_find_desired(mapping, row):
+    for facilityName in mapping:
+        if row['Constraint_Name'] in facilityName:
+            for contingency, shadow, fac_type, peak_type in mapping[facilityName]:
+                if row['Contingency_Name'] == contingency:
+                    return shadow, fac_type, peak_type, facilityName
+
+    return "", "", "", ""
+
+
+def old_convert_csv(df: pd.DataFrame, mapping) -> list:
+    """
+    The rows of the row-by-row convert_csv, as (Hour_Ending, PeakType, Shadow_Price, Facility_Type,
+    Constraint_Name) with blank shadow prices as NaN.
+    """
+    filtered_df = df[df['Settlement_Point'].isin(nodes)]
+    next_stamp = datetime.strptime(filtered_df.iloc[0, 0], "%m/%d/%Y %H:%M:%S") + timedelta(hours=1)
+    next_hour = next_stamp.strftime("%H").replace("00", "24").lstrip('0')
+    hour_mapping = mapping[next_stamp.strftime("%m/%d/%Y")].get(next_hour, {})
+
+    rows = []
+    for _, row in filtered_df.iterrows():
+        shadow, fac_type, peak_type, facility = old_find_desired(hour_mapping, row)
+        rows.append((int(next_hour), peak_type, np.nan if shadow == "" else shadow, fac_type, facility))
+    return rows
+
+
+def aggregator() -> ConstraintAggregator:
+    aggregator = ConstraintAggregator(yes_table, nodes)
+    aggregator.resolver = ConstraintResolver(aggregator.yes['Facility'].cat.categories, cache_folder=None)
+    return aggregator
+
+
+def test_convert_matches_the_row_by_row_find_desired():
+    converted = aggregator().convert(pd.concat(files, ignore_index=True))
+    mapping = old_mapping(yes_table)
+
+    expected = [row for df in files for row in old_convert_csv(df, mapping)]
+    actual = list(zip(converted['Hour_Ending'].tolist(), converted['PeakType'].astype(object).tolist(),
+                      converted['Shadow_Price'].tolist(), converted['Facility_Type'].astype(object).tolist(),
+                      converted['Constraint_Name'].astype(object).tolist()))
+
+    assert len(actual) == len(expected) == 7
+    for actual_row, expected_row in zip(actual, expected):
+        assert actual_row[:2] == expected_row[:2]
+        assert actual_row[2] == expected_row[2] or (np.isnan(actual_row[2]) and np.isnan(expected_row[2]))
+        assert actual_row[3:] == expected_row[3:]
+
+
+def test_the_first_facility_is_taken_per_hour():
+    converted = aggregator().convert(pd.concat(files[:2], ignore_index=True))
+
+    # Hour 13 visits XYZ_A first, hour 14 XYZ_B.
+    assert converted['Constraint_Name'].astype(object).tolist()[:3] == ["XYZ_A", "XYZ_B", "XYZ_B"]
+    assert converted['SSPSF_Constraint_Name'].tolist()[:3] == ["XYZ", "XYZ_B", "XYZ"]
+    assert converted['Shadow_Price'].tolist()[:3] == [40.0, 30.0, 30.0]
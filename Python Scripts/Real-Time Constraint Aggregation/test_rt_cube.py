@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from rt_cube import ConstraintCube, cube_rows
+
+"""
+Behaviour tests of the shadow price x shift factor cube. Run with pytest from this folder.
+"""
+
+
+def converted(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['SCED_Time_Stamp', 'Hour_Ending', 'SSPSF_Constraint_Name', 'Constraint_Name',
+                                       'Contingency_Name', 'Settlement_Point', 'Shift_Factor', 'Shadow_Price'])
+
+
+june_first = converted([
+    ("06/01/2024 13:05:12", 14, "SANDOW", "SANDOW_MILAM_1", "DSANMIL5", "HB_NORTH", 0.25, 10.0),
+    ("06/01/2024 13:10:12", 14, "SANDOW", "SANDOW_MILAM_1", "DSANMIL5", "HB_NORTH", 0.75, 30.0),
+    ("06/01/2024 14:05:12", 15, "SANDOW", None, "DSANMIL5", "HB_NORTH", 0.5, np.nan),
+    ("06/01/2024 13:05:12", 14, "CEDAR", None, "BASE CASE", "HB_NORTH", 0.1, np.nan),
+    ("06/01/2024 13:05:12", 14, "MILAM", None, "BASE CASE", "HB_NORTH", 0.3, np.nan),
+])
+
+
+def test_cube_rows_keep_every_sspsf_constraint_with_its_matched_name():
+    cells = cube_rows(june_first)
+
+    assert cells[['Hour_Ending', 'Constraint_Name', 'Facility_Name']].astype(object).values.tolist() == [
+        [14, "CEDAR", ""], [14, "MILAM", ""], [14, "SANDOW", "SANDOW_MILAM_1"], [15, "SANDOW", ""]]
+    assert cells['SF_Count'].tolist() == [1, 1, 2, 1]
+    assert cells['SP_Count'].tolist() == [0, 0, 2, 0]
+    assert cells['SFSP_Sum'].tolist() == [0.0, 0.0, 25.0, 0.0]
+
+
+def test_rollup_averages_and_leaves_averages_without_shadow_prices_missing(tmp_path):
+    cube = ConstraintCube(str(tmp_path))
+    cube.upsert(june_first)
+
+    combined = cube.rollup(date(2024, 6, 1), date(2024, 6, 30), by=['Month', 'Constraint_Name'])
+
+    assert combined['Month'].tolist() == ["2024-06", "2024-06", "2024-06"]
+    assert combined['Constraint_Name'].tolist() == ["CEDAR", "MILAM", "SANDOW"]
+    assert combined['Average_SF'].tolist() == [0.1, 0.3, 0.5]
+    assert np.isnan(combined['Average_SP'].iloc[0])
+    assert combined['Average_SP'].iloc[2] == 20.0
+    assert combined['Average_SFSP'].iloc[2] == 12.5
+
+
+def test_upsert_only_replaces_whole_days(tmp_path):
+    cube = ConstraintCube(str(tmp_path))
+    cube.upsert(june_first)
+
+    # The next night converts the files posted on June 2nd, which hold the last interval of June 1st.
+    next_night = converted([
+        ("06/01/2024 23:55:12", 24, "SANDOW", "SANDOW_MILAM_1", "DSANMIL5", "HB_NORTH", 0.5, 40.0),
+        ("06/02/2024 00:05:12", 1, "SANDOW", "SANDOW_MILAM_1", "DSANMIL5", "HB_NORTH", 0.5, 40.0),
+    ])
+
+    assert cube.upsert(next_night, days=[date(2024, 6, 2)]) == [date(2024, 6, 2)]
+    assert cube.days() == [date(2024, 6, 1), date(2024, 6, 2)]
+    assert cube.read(date(2024, 6, 1), date(2024, 6, 1))['SF_Count'].sum() == 5
@@ -0,0 +1,59 @@
+import os
+import time
+import pandas as pd
+from datetime import date
+from rt_aggregation import summary_columns
+from rt_summary_store import SummaryStore
+from rt_delta_view import DeltaView, day_deltas
+
+"""
+Behaviour tests of the rolling path delta view. Run with pytest from this folder.
+"""
+
+paths = pd.DataFrame({"SOURCE": ["HB_NORTH", "HB_NORTH"], "SINK": ["HB_HOUSTON", "LZ_WEST"]})
+
+
+def summary(day: str = "06/01/2024") -> pd.DataFrame:
+    return pd.DataFrame([
+        ("HB_NORTH", f"{day} 13:05:12", "DSANMIL5", "SANDOW_MILAM_1", "WDPEAK", 0.25, 2.5),
+        ("HB_HOUSTON", f"{day} 13:05:12", "DSANMIL5", "SANDOW_MILAM_1", "WDPEAK", -0.125, -1.25),
+        ("LZ_WEST", f"{day} 13:05:12", "DSANMIL5", "SANDOW_MILAM_1", "WDPEAK", 0.0005, 0.005),
+        ("HB_HOUSTON", f"{day} 13:05:12", "BASE CASE", "SANDOW_MILAM_1", "WDPEAK", 0.5, 5.0),
+    ], columns=summary_columns)
+
+
+def test_day_deltas_join_sources_and_sinks_on_the_same_keys():
+    deltas = day_deltas(summary(), paths)
+
+    assert deltas.values.tolist() == [["06/01/2024", 14, 2, "WDPEAK", "SANDOW_MILAM_1", "DSANMIL5", "HB_NORTH+HB_HOUSTON",
+                                       0.25, -0.125, 3.75]]
+
+
+def test_refresh_computes_new_and_rewritten_days_and_drops_old_ones(tmp_path):
+    summary_store = SummaryStore(os.path.join(tmp_path, "summary"))
+    view = DeltaView(os.path.join(tmp_path, "view"))
+    summary_store.upsert(pd.concat([summary("05/01/2024"), summary("06/01/2024"), summary("06/02/2024")]))
+
+    view.refresh(paths, summary_store, date(2024, 5, 1), window_days=0)
+    assert view.refresh(paths, summary_store, date(2024, 6, 2), window_days=5) == [date(2024, 6, 1), date(2024, 6, 2)]
+    assert view.days() == [date(2024, 6, 1), date(2024, 6, 2)]
+    assert view.refresh(paths, summary_store, date(2024, 6, 2), window_days=5) == []
+
+    time.sleep(0.01)
+    summary_store.upsert(summary("06/02/2024"))
+    assert view.refresh(paths, summary_store, date(2024, 6, 2), window_days=5) == [date(2024, 6, 2)]
+    assert len(view.read(date(2024, 6, 1), date(2024, 6, 2))) == 2
+
+
+def test_a_changed_portfolio_starts_the_view_over(tmp_path):
+    summary_store = SummaryStore(os.path.join(tmp_path, "summary"))
+    view = DeltaView(os.path.join(tmp_path, "view"))
+    summary_store.upsert(summary())
+    view.refresh(paths, summary_store, date(2024, 6, 1))
+
+    other_paths = pd.DataFrame({"SOURCE": ["HB_HOUSTON"], "SINK": ["HB_NORTH"]})
+    assert not view.paths_changed(paths)
+    assert view.paths_changed(other_paths)
+
+    assert view.refresh(other_paths, summary_store, date(2024, 6, 1)) == [date(2024, 6, 1)]
+    assert view.read(date(2024, 6, 1), date(2024, 6, 1))["Path"].tolist() == ["HB_HOUSTON+HB_NORTH"]
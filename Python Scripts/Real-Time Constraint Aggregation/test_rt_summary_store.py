@@ -0,0 +1,55 @@
+import pandas as pd
+from datetime import date
+from rt_aggregation import summary_columns
+from rt_summary_store import SummaryStore
+
+"""
+Behaviour tests of the day-partitioned RT summary store. Run with pytest from this folder.
+"""
+
+
+def summary(stamps, settlement: str = "HB_NORTH", shift_factor: float = 0.25) -> pd.DataFrame:
+    return pd.DataFrame([(settlement, stamp, "DSANMIL5", "SANDOW_MILAM_1", "WDPEAK", shift_factor, shift_factor * 10)
+                         for stamp in stamps], columns=summary_columns)
+
+
+def test_upsert_splits_rows_by_sced_day(tmp_path):
+    store = SummaryStore(str(tmp_path))
+
+    written = store.upsert(summary(["06/01/2024 23:55:12", "06/02/2024 00:00:12", "06/02/2024 13:05:12"]))
+
+    assert written == [date(2024, 6, 1), date(2024, 6, 2)]
+    assert store.days() == [date(2024, 6, 1), date(2024, 6, 2)]
+
+    rows = store.read(date(2024, 6, 2), date(2024, 6, 2))
+    assert rows["SCED_Time_Stamp"].tolist() == ["06/02/2024 00:00:12", "06/02/2024 13:05:12"]
+    assert rows["Hour_Ending"].tolist() == [1, 14]
+
+
+def test_upsert_keeps_the_timestamps_of_a_day_it_does_not_cover(tmp_path):
+    store = SummaryStore(str(tmp_path))
+    store.upsert(summary(["06/01/2024 00:00:12", "06/01/2024 12:00:12", "06/01/2024 23:50:12"]))
+
+    # The next night's files only hold the last interval of the day, with a new shift factor.
+    store.upsert(summary(["06/01/2024 23:50:12", "06/01/2024 23:55:12"], shift_factor=0.5))
+
+    rows = store.read(date(2024, 6, 1), date(2024, 6, 1))
+    assert rows["SCED_Time_Stamp"].tolist() == ["06/01/2024 00:00:12", "06/01/2024 12:00:12",
+                                                "06/01/2024 23:50:12", "06/01/2024 23:55:12"]
+    assert rows["Shift_Factor"].tolist() == [0.25, 0.25, 0.5, 0.5]
+
+
+def test_read_filters_settlement_points_and_nests_like_the_json(tmp_path):
+    store = SummaryStore(str(tmp_path))
+    store.upsert(pd.concat([summary(["06/01/2024 13:05:12"]), summary(["06/01/2024 13:05:12"], "HB_HOUSTON")]))
+
+    assert store.read(date(2024, 6, 1), date(2024, 6, 1), settlements=["HB_HOUSTON"])["Settlement_Point"].tolist() == ["HB_HOUSTON"]
+    assert store.read_nested(date(2024, 6, 1), date(2024, 6, 1), settlements=["HB_NORTH"]) == {
+        "HB_NORTH": {"06/01/2024 13:05:12": [("DSANMIL5", "SANDOW_MILAM_1", "WDPEAK", 0.25, 2.5)]}}
+
+
+def test_nothing_is_written_without_rows(tmp_path):
+    store = SummaryStore(str(tmp_path))
+
+    assert store.upsert(summary([])) == []
+    assert store.read(date(2024, 6, 1), date(2024, 6, 30)).empty